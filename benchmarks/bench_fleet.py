@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Benchmark discovery, termination and the live monitor against a fake fleet.
+
+No Node.js install is needed. The fleet is made of Python interpreters
+started through a symlink named `node`, running a script named server.js,
+so they look like Node.js servers to every discovery path (comm, argv[0]
+and the exe basename). The fleet mixes four kinds of process:
+
+* plain     -- exits on SIGTERM
+* stubborn  -- ignores SIGTERM, so only SIGKILL gets rid of it
+* slow      -- takes SLOW_EXIT seconds to shut down after SIGTERM
+* forking   -- forks FORK_CHILDREN children that are Node.js processes too
+
+Measured:
+
+* get_node_processes() latency: with a fresh matcher, steady state, and
+  with resources (CPU, RSS, ports)
+* kill-all wall time, in one batch through terminate_processes() (what `k`
+  and menu option 1 do) and one by one through terminate_process()
+* cost of one live monitoring frame for the fleet, full and differential
+* CPU used by an idle live monitor (stop_node_servers.py in a pty)
+
+Only processes belonging to the fleet are ever signalled. Results can be
+written as JSON with --json and compared against an earlier run with
+--compare, e.g. one file per commit:
+
+    python benchmarks/bench_fleet.py --json base.json
+    git checkout my-branch
+    python benchmarks/bench_fleet.py --compare base.json
+
+Linux only.
+"""
+import argparse
+import contextlib
+import ctypes
+import io
+import json
+import os
+import platform
+import pty
+import select
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'stop_node_servers.py')
+sys.path.insert(0, ROOT)
+import stop_node_servers  # noqa: E402
+
+KINDS = ('plain', 'stubborn', 'slow', 'forking')
+MIX = ('plain',) * 7 + ('stubborn', 'slow', 'forking')  # one in ten of each special kind
+SLOW_EXIT = 0.3
+FORK_CHILDREN = 2
+PR_SET_CHILD_SUBREAPER = 36
+
+# Runs under the fake `node`: python -S server.js <kind> <ready fd>
+SERVER_JS = """
+import os, signal, sys, time
+kind, ready = sys.argv[1], int(sys.argv[2])
+if kind == 'stubborn':
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+elif kind == 'slow':
+    def shutdown(signum, frame):
+        time.sleep(%(slow)r)
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, shutdown)
+elif kind == 'forking':
+    for _ in range(%(children)d):
+        if os.fork() == 0:
+            os.close(ready)
+            while True:
+                signal.pause()
+os.write(ready, b'.')
+os.close(ready)
+while True:
+    signal.pause()
+""" % {'slow': SLOW_EXIT, 'children': FORK_CHILDREN}
+
+
+class Fleet:
+    """A set of fake Node.js processes started from a temp directory."""
+
+    def __init__(self, size, workdir):
+        self.size = size
+        self.node = os.path.join(workdir, 'node')
+        self.server = os.path.join(workdir, 'server.js')
+        if not os.path.exists(self.node):
+            os.symlink(os.path.realpath(sys.executable), self.node)
+            with open(self.server, 'w') as f:
+                f.write(SERVER_JS)
+        self.roots = []
+
+    def start(self):
+        """Spawn the fleet and wait until every process has set itself up."""
+        reader, writer = os.pipe()
+        os.set_inheritable(writer, True)
+        for i in range(self.size):
+            kind = MIX[i % len(MIX)]
+            self.roots.append(os.posix_spawn(
+                self.node, [self.node, '-S', self.server, kind, str(writer)], os.environ))
+        os.close(writer)
+        received = 0
+        while received < self.size:
+            chunk = os.read(reader, self.size)
+            if not chunk:
+                raise RuntimeError("a fake node process died during startup")
+            received += len(chunk)
+        os.close(reader)
+
+    def pids(self):
+        """PIDs of every live fleet member, forked children included."""
+        roots = set(self.roots)
+        # Children whose parent has exited are reparented to us (see main())
+        return {info.pid for info in stop_node_servers.scan_processes(read_cmdline=False)
+                if info.pid in roots or info.ppid in roots or (info.ppid == os.getpid() and info.comm == 'node')}
+
+    def records(self):
+        """get_node_processes() entries that belong to the fleet."""
+        members = self.pids()
+        return [entry for entry in stop_node_servers.get_node_processes() if int(entry[0]) in members]
+
+    def stop(self):
+        """SIGKILL whatever is left and reap it."""
+        for pid in self.pids():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+        reap()
+        self.roots = []
+
+
+def reap():
+    """Reap every exited child, orphaned grandchildren included."""
+    while True:
+        try:
+            pid, _ = os.waitpid(-1, 0)
+        except ChildProcessError:
+            return
+
+
+def percentiles(samples):
+    """Return (p50, p95) of a list of samples."""
+    ordered = sorted(samples)
+    return statistics.median(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+def time_ms(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return percentiles(timings)
+
+
+def bench_scan(fleet, repeat):
+    """get_node_processes() latency with the fleet running."""
+    results = {}
+    fresh_matcher = lambda: stop_node_servers.set_process_matcher(stop_node_servers.ProcessMatcher())
+    results['scan_cold_ms_p50'], results['scan_cold_ms_p95'] = time_ms(
+        stop_node_servers.get_node_processes, repeat, fresh_matcher)
+    stop_node_servers.get_node_processes()
+    results['scan_ms_p50'], results['scan_ms_p95'] = time_ms(stop_node_servers.get_node_processes, repeat)
+    stop_node_servers.get_node_processes(with_resources=True)
+    results['scan_resources_ms_p50'], results['scan_resources_ms_p95'] = time_ms(
+        lambda: stop_node_servers.get_node_processes(with_resources=True), repeat)
+    results['scan_matched'] = len(fleet.records())
+    return results
+
+
+def bench_kill(fleet, grace, kill_timeout):
+    """Kill-all wall time, batched and one process at a time."""
+    results = {}
+    for name in ('batch', 'serial'):
+        fleet.start()
+        targets = fleet.records()
+        # The progress lines are still built and written, just not shown
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            start = time.perf_counter()
+            if name == 'batch':
+                outcome = stop_node_servers.terminate_processes(targets, grace, kill_timeout)
+            else:
+                outcome = [stop_node_servers.terminate_process(pid, command, grace, kill_timeout)
+                           for pid, command in targets]
+            results[f'kill_{name}_s'] = time.perf_counter() - start
+        results[f'kill_{name}_failed'] = sum(1 for r in outcome if r['status'] in ('failed', 'error'))
+        results['kill_targets'] = len(targets)
+        fleet.stop()
+    return results
+
+
+def bench_render(fleet, repeat):
+    """Time to build and draw one monitor frame for the fleet."""
+    members = fleet.pids()
+    records = [info for info in stop_node_servers.ProcessMatcher().scan() if info.pid in members]
+    sampler = stop_node_servers.ResourceSampler()
+    sampler.sample(records)
+    records = sampler.sample(records)
+    sampler.collect_details(records)
+    height = len(records) + 100  # draw the whole table, no clipping
+    renderer = stop_node_servers.ScreenRenderer(stream=io.StringIO())
+
+    def draw():
+        lines = stop_node_servers.monitor_frame_lines(records, {}, set(), "", "")
+        renderer.render(lines, height=height)
+
+    results = {}
+    results['frame_full_ms_p50'], results['frame_full_ms_p95'] = time_ms(draw, repeat, renderer.invalidate)
+    draw()
+    before = renderer.bytes_written
+    results['frame_diff_ms_p50'], results['frame_diff_ms_p95'] = time_ms(draw, repeat)
+    results['frame_diff_bytes'] = (renderer.bytes_written - before) / repeat
+    sampler.close()
+    return results
+
+
+def process_cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat', 'rb') as f:
+        fields = f.read().rsplit(b')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def bench_idle(seconds):
+    """CPU used by the live monitor while nothing changes."""
+    pid, fd = pty.fork()
+    if pid == 0:
+        os.execv(sys.executable, [sys.executable, SCRIPT])
+    output = []
+
+    def drain(duration):
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            if select.select([fd], [], [], max(0, end - time.monotonic()))[0]:
+                try:
+                    output.append(os.read(fd, 65536))
+                except OSError:
+                    return
+
+    try:
+        drain(1.0)
+        os.write(fd, b'3\n')
+        drain(1.5)  # let startup and the first frames settle
+        cpu_before, wall_before = process_cpu_seconds(pid), time.monotonic()
+        drain(seconds)
+        cpu = process_cpu_seconds(pid) - cpu_before
+        wall = time.monotonic() - wall_before
+        os.write(fd, b'q\n')
+        drain(0.5)
+    finally:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+        os.waitpid(pid, 0)
+        os.close(fd)
+    return {'monitor_idle_cpu_percent': cpu / wall * 100}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ''
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'kernel': platform.release(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def format_value(value):
+    return f"{value:>12.3f}" if isinstance(value, float) else f"{value:>12}"
+
+
+def compare(results, baseline):
+    """Print each metric next to the baseline and the change in percent."""
+    print(f"\n{'metric':<28} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, value in results.items():
+        old = baseline.get(name)
+        if old is None:
+            print(f"{name:<28} {'-':>12} {format_value(value)}")
+            continue
+        change = f"{(value - old) / old * 100:+.1f}%" if old else ''
+        print(f"{name:<28} {format_value(old)} {format_value(value)} {change:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark against a fleet of fake Node.js processes.")
+    parser.add_argument('--processes', type=int, default=50, help="fleet size, before forked children (default 50)")
+    parser.add_argument('--repeat', type=int, default=20, help="samples per latency measurement (default 20)")
+    parser.add_argument('--grace', type=float, default=0.5, help="grace period for the kill runs (default 0.5)")
+    parser.add_argument('--kill-timeout', type=float, default=0.5, help="SIGKILL timeout for the kill runs (default 0.5)")
+    parser.add_argument('--idle-seconds', type=float, default=5.0, help="how long to measure the idle monitor (default 5)")
+    parser.add_argument('--json', metavar='FILE', help="write the results to FILE")
+    parser.add_argument('--compare', metavar='FILE', help="compare against results written by --json")
+    args = parser.parse_args()
+    if not stop_node_servers._use_proc_scanner():
+        sys.exit("bench_fleet.py needs Linux /proc")
+
+    # Orphaned children of the forking kind are reparented to us, so they can be reaped
+    ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+    workdir = tempfile.mkdtemp(prefix='nodefleet-')
+    fleet = Fleet(args.processes, workdir)
+    results = {}
+    try:
+        fleet.start()
+        results.update(bench_scan(fleet, args.repeat))
+        results.update(bench_render(fleet, args.repeat))
+        results.update(bench_idle(args.idle_seconds))
+        fleet.stop()
+        results.update(bench_kill(fleet, args.grace, args.kill_timeout))
+    finally:
+        fleet.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    kinds = {kind: sum(1 for i in range(args.processes) if MIX[i % len(MIX)] == kind) for kind in KINDS}
+    print(f"fleet: {args.processes} processes ({', '.join(f'{n} {kind}' for kind, n in kinds.items())}), "
+          f"{kinds['forking'] * FORK_CHILDREN} forked children")
+    print(f"{'metric':<28} {'value':>12}")
+    for name, value in results.items():
+        print(f"{name:<28} {format_value(value)}")
+
+    parameters = dict(vars(args), mix=kinds, slow_exit=SLOW_EXIT, fork_children=FORK_CHILDREN)
+    del parameters['json'], parameters['compare']
+    if args.json:
+        document = {'environment': environment(), 'parameters': parameters, 'results': results}
+        with open(args.json, 'w') as f:
+            json.dump(document, f, indent=2)
+            f.write('\n')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['parameters'] != parameters:
+            print("\nwarning: the baseline was run with different parameters")
+        compare(results, baseline['results'])
+
+
+if __name__ == '__main__':
+    main()
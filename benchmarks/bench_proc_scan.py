@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark the /proc scanner against the ps | grep pipeline.
+
+Both paths are fed the same synthetic process table, a fake procfs tree
+built in a temp directory:
+
+* the /proc scanner reads the fake tree directly
+* the ps path runs the real shell pipeline with a stand-in `ps` on PATH.
+  procps refuses to read anything that is not a real procfs mount, so the
+  stand-in reads stat, status and cmdline for every PID (what procps reads
+  for `-eo pid,command`) and prints the table. Shell, fork/exec, both greps
+  and the Python parsing are the real thing.
+
+The /proc scanner is timed twice: "cold" with a fresh ProcessMatcher for
+every scan, and "memo" reusing one, so cmdline is only read for processes
+it has not seen before (the steady state of a refreshing monitor).
+
+Pass --live to compare both paths against this host's real /proc and ps.
+
+Usage: python benchmarks/bench_proc_scan.py [--live] [1000 10000 50000]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stop_node_servers  # noqa: E402
+
+NODE_EVERY = 20  # one in twenty synthetic processes is a node server
+STAT_TEMPLATE = ("{pid} ({comm}) S 1 {pid} {pid} 0 -1 4194560 1000 0 0 0 "
+                 "15 3 0 0 20 0 1 0 {start} 12345678 2048 18446744073709551615 "
+                 "1 1 0 0 0 0 0 4096 0 0 0 0 17 0 0 0 0 0 0\n")
+
+
+def synthetic_processes(count):
+    """Yield (pid, comm, argv) tuples for a synthetic process table."""
+    for i in range(count):
+        pid = 1000 + i
+        if i % NODE_EVERY == 0:
+            yield pid, 'node', ['node', f'/srv/app{i}/server.js', '--port', str(3000 + i % 1000)]
+        else:
+            yield pid, 'worker', ['/usr/bin/worker', '--id', str(i)]
+
+
+def build_fake_proc(root, count):
+    """Create a fake procfs tree with stat and cmdline for each process."""
+    for pid, comm, argv in synthetic_processes(count):
+        pid_dir = os.path.join(root, str(pid))
+        os.mkdir(pid_dir)
+        with open(os.path.join(pid_dir, 'stat'), 'w') as f:
+            f.write(STAT_TEMPLATE.format(pid=pid, comm=comm, start=pid * 10))
+        with open(os.path.join(pid_dir, 'status'), 'w') as f:
+            f.write(f"Name:\t{comm}\nState:\tS (sleeping)\nTgid:\t{pid}\nPid:\t{pid}\n"
+                    f"PPid:\t1\nUid:\t1000\t1000\t1000\t1000\nThreads:\t1\n")
+        with open(os.path.join(pid_dir, 'cmdline'), 'wb') as f:
+            f.write(b'\0'.join(a.encode() for a in argv) + b'\0')
+
+
+FAKE_PS = """#!{python} -S
+import os
+root = {root!r}
+out = ["    PID COMMAND"]
+for name in os.listdir(root):
+    if not name.isdigit():
+        continue
+    base = root + "/" + name
+    fields = {{}}
+    for part in ("stat", "status", "cmdline"):
+        with open(base + "/" + part, "rb") as f:
+            fields[part] = f.read()
+    argv = fields["cmdline"].rstrip(b"\\0").split(b"\\0")
+    out.append("%7s %s" % (name, b" ".join(argv).decode()))
+print("\\n".join(out))
+"""
+
+
+def build_fake_ps(bin_dir, proc_root):
+    """Create a stand-in `ps` that reads the fake procfs tree."""
+    ps = os.path.join(bin_dir, 'ps')
+    with open(ps, 'w') as f:
+        f.write(FAKE_PS.format(python=sys.executable, root=proc_root))
+    os.chmod(ps, 0o755)
+
+
+def time_call(func, repeat):
+    """Return the median wall time of func() in milliseconds and its result."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def bench(count, repeat=5):
+    """Run both discovery paths against `count` synthetic processes."""
+    tmp = tempfile.mkdtemp(prefix='nodebench-')
+    old_path = os.environ.get('PATH', '')
+    try:
+        proc_root = os.path.join(tmp, 'proc')
+        bin_dir = os.path.join(tmp, 'bin')
+        os.mkdir(proc_root)
+        os.mkdir(bin_dir)
+        build_fake_proc(proc_root, count)
+        build_fake_ps(bin_dir, proc_root)
+
+        proc_ms, records = time_call(
+            lambda: stop_node_servers.ProcessMatcher().scan(proc_root), repeat)
+        matcher = stop_node_servers.ProcessMatcher()
+        matcher.scan(proc_root)
+        memo_ms, _ = time_call(lambda: matcher.scan(proc_root), repeat)
+
+        os.environ['PATH'] = bin_dir + os.pathsep + old_path
+        ps_ms, tuples = time_call(stop_node_servers._get_node_processes_ps, repeat)
+    finally:
+        os.environ['PATH'] = old_path
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    assert len(records) == len(tuples), (len(records), len(tuples))
+    return proc_ms, memo_ms, ps_ms, len(records)
+
+
+def bench_live(repeat=5):
+    """Run both discovery paths against this host's real process table."""
+    proc_ms, records = time_call(lambda: stop_node_servers.ProcessMatcher().scan(), repeat)
+    matcher = stop_node_servers.ProcessMatcher()
+    matcher.scan()
+    memo_ms, _ = time_call(matcher.scan, repeat)
+    ps_ms, _ = time_call(stop_node_servers._get_node_processes_ps, repeat)
+    total = sum(1 for name in os.listdir('/proc') if name.isdigit())
+    return total, proc_ms, memo_ms, ps_ms, len(records)
+
+
+def main():
+    args = sys.argv[1:]
+    print(f"{'processes':>10} {'matched':>8} {'cold ms':>10} {'memo ms':>10} {'ps ms':>10} {'speedup':>8}")
+    if '--live' in args:
+        count, proc_ms, memo_ms, ps_ms, matched = bench_live()
+        print(f"{count:>10} {matched:>8} {proc_ms:>10.1f} {memo_ms:>10.1f} {ps_ms:>10.1f} "
+              f"{ps_ms / proc_ms:>7.1f}x  (live)")
+        return
+    counts = [int(arg) for arg in args] or [1000, 10000, 50000]
+    for count in counts:
+        proc_ms, memo_ms, ps_ms, matched = bench(count)
+        print(f"{count:>10} {matched:>8} {proc_ms:>10.1f} {memo_ms:>10.1f} {ps_ms:>10.1f} {ps_ms / proc_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Benchmark bytes written per live monitoring frame.
+
+Draws an unchanged 500-process table repeatedly, once the way the monitor
+used to (`clear` subprocess, then every line printed) and once through
+ScreenRenderer, and reports bytes and time per frame for each.
+
+Usage: python benchmarks/bench_render.py [processes] [frames]
+"""
+import io
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stop_node_servers  # noqa: E402
+
+
+def fake_processes(count):
+    records = []
+    for i in range(count):
+        info = stop_node_servers.ProcessInfo(
+            10000 + i, 1, 'node', ['node', f'/srv/app{i}/server.js', '--port', str(3000 + i)], i)
+        info.cpu_percent, info.rss, info.threads, info.fds, info.uptime = 0.5, 80 << 20, 11, 24, 3600 + i
+        records.append(info)
+    return records
+
+
+def frame(processes):
+    return stop_node_servers.monitor_frame_lines(processes, {}, set(), "", "")
+
+
+def legacy_frame(lines, stream):
+    """Draw a frame the old way: fork `clear`, then print line by line."""
+    clear = subprocess.run(['clear'], capture_output=True).stdout if os.name != 'nt' else b''
+    stream.write(clear.decode())
+    for line in lines:
+        print(line, file=stream)
+    stream.flush()
+    return len(clear) + sum(len(line.encode()) + 1 for line in lines)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    processes = fake_processes(count)
+    height = count + 100  # draw the whole table, no clipping
+
+    legacy_bytes = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        legacy_bytes += legacy_frame(frame(processes), io.StringIO())
+    legacy_ms = (time.perf_counter() - start) * 1000 / frames
+
+    renderer = stop_node_servers.ScreenRenderer(stream=io.StringIO())
+    renderer.render(frame(processes), height=height)  # first frame is always a full draw
+    first_frame = renderer.bytes_written
+    start = time.perf_counter()
+    for _ in range(frames):
+        renderer.render(frame(processes), height=height)
+    diff_ms = (time.perf_counter() - start) * 1000 / frames
+    diff_bytes = renderer.bytes_written - first_frame
+
+    print(f"{count} processes, {frames} unchanged frames")
+    print(f"{'':<22} {'bytes/frame':>12} {'ms/frame':>10}")
+    print(f"{'clear + print':<22} {legacy_bytes / frames:>12.0f} {legacy_ms:>10.2f}")
+    print(f"{'ScreenRenderer first':<22} {first_frame:>12.0f} {'':>10}")
+    print(f"{'ScreenRenderer':<22} {diff_bytes / frames:>12.0f} {diff_ms:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Benchmark cold start of the headless commands.
+
+Runs a fresh interpreter for each sample and reports the median wall time
+of a bare `python -c pass`, of importing stop_node_servers, and of the
+`list` and `--help` commands run the documented way, as
+`python stop_node_servers.py ...`. The import is also run under
+`python -X importtime` to get the module's own cumulative import time and
+to check that none of the interactive-only modules are loaded.
+
+node_server_manager is byte-compiled first, so the numbers are for a warm
+__pycache__, which Python writes on the first run. The script itself is
+compiled from source every time, which is why it only imports the module.
+
+The budget is for what the tool adds to a bare interpreter: the median
+of `stop_node_servers.py list` minus that of `python -c pass`, sampled
+in turns so a change in machine load hits both. The interpreter's own
+startup, site-packages included, differs a lot between machines and is
+not ours to cut; about 15 ms of it plus the default 35 ms budget makes
+the 50 ms cold start this was written for.
+
+Exits with status 1 when the script takes longer than the budget, or when
+an interactive-only module gets loaded on import.
+
+Usage: python benchmarks/bench_startup.py [samples] [budget_ms]
+"""
+import importlib.util
+import os
+import py_compile
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCRIPT = os.path.join(ROOT, 'stop_node_servers.py')
+MODULE = os.path.join(ROOT, 'node_server_manager.py')
+# Modules only the interactive UI should pull in
+TUI_MODULES = ('termios', 'tty', 'msvcrt', 'threading', 'socket', 'subprocess', 'argparse', 'json', 'asyncio')
+
+
+def run_ms(args):
+    """Wall time of running a fresh interpreter with args."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def wall_ms(args, samples):
+    """Median wall time of running a fresh interpreter with args."""
+    return statistics.median(run_ms(args) for _ in range(samples))
+
+
+def paired_ms(args, samples):
+    """Median wall times of args and of a bare interpreter, run in turns."""
+    pairs = [(run_ms(['-c', 'pass']), run_ms(args)) for _ in range(samples)]
+    return statistics.median(bare for bare, _ in pairs), statistics.median(ms for _, ms in pairs)
+
+
+def importtime(samples):
+    """Median cumulative import time of stop_node_servers and the modules it loaded."""
+    times = []
+    for _ in range(samples):
+        stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import stop_node_servers'],
+                                cwd=ROOT, capture_output=True, text=True).stderr
+        modules = {}
+        for line in stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, name = line.split('|')
+                if cumulative.strip().isdigit():
+                    modules[name.strip()] = int(cumulative)
+        times.append(modules['stop_node_servers'] / 1000)
+    return statistics.median(times), modules
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 35.0
+    # Compiled explicitly, as PYTHONDONTWRITEBYTECODE would leave the cache cold
+    py_compile.compile(MODULE, cfile=importlib.util.cache_from_source(MODULE))
+
+    import_ms, modules = importtime(samples)
+    bare_ms, list_ms = paired_ms([SCRIPT, 'list'], samples)
+    rows = [
+        ('python -c pass', bare_ms),
+        ('import stop_node_servers', wall_ms(['-c', 'import stop_node_servers'], samples)),
+        ('stop_node_servers.py list', list_ms),
+        ('stop_node_servers.py --help', wall_ms([SCRIPT, '--help'], samples)),
+        ('-m stop_node_servers list', wall_ms(['-m', 'stop_node_servers', 'list'], samples)),
+    ]
+
+    print(f"{samples} samples, median wall time per fresh interpreter")
+    print(f"{'':<30} {'ms':>8}")
+    for name, ms in rows:
+        print(f"{name:<30} {ms:>8.1f}")
+    added = list_ms - bare_ms
+    print(f"\ncold start (stop_node_servers.py list): {list_ms:.1f} ms")
+    print(f"added to a bare interpreter: {added:.1f} ms, budget {budget:.0f} ms")
+    print(f"-X importtime, stop_node_servers cumulative: {import_ms:.1f} ms")
+    loaded = [name for name in TUI_MODULES if name in modules]
+    print(f"interactive-only modules loaded on import: {', '.join(loaded) or 'none'}")
+    if added > budget or loaded:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5134 @@
+#!/usr/bin/env python3
+import os
+import sys
+import time
+import signal
+import re
+
+# Everything else is imported where it is used, so the headless commands
+# start quickly and the terminal modules (termios, tty, msvcrt) are only
+# loaded by the interactive UI.
+
+# Color constants for terminal output
+class Colors:
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+    REVERSE = '\033[7m'
+
+def header_lines():
+    """Return the boxed title banner as a list of lines."""
+    # Define the content lines
+    content_lines = [
+        "Nodejs Server Killer by techcow2",
+        "https://github.com/techcow2",
+        "copyright 2025 MIT License"
+    ]
+    
+    # Find the longest line to determine box width
+    max_line_length = max(len(line) for line in content_lines)
+    box_width = max_line_length + 10  # Add padding on both sides
+    
+    # Ensure minimum width for aesthetics
+    box_width = max(box_width, 60)
+    
+    # Create box components
+    top_border = Colors.HEADER + "╔" + "═" * (box_width) + "╗" + Colors.ENDC
+    bottom_border = Colors.HEADER + "╚" + "═" * (box_width) + "╝" + Colors.ENDC
+    
+    # Create empty line with padding
+    empty_line = Colors.HEADER + "║" + " " * (box_width) + "║" + Colors.ENDC
+    
+    # Create content lines with padding
+    content_box_lines = []
+    for line in content_lines:
+        # Calculate padding to center the text
+        padding = (box_width - len(line)) // 2
+        padded_line = Colors.HEADER + "║" + " " * padding + Colors.BOLD + Colors.OKCYAN + line + Colors.ENDC + Colors.HEADER + " " * (box_width - len(line) - padding) + "║" + Colors.ENDC
+        content_box_lines.append(padded_line)
+    
+    # Combine all parts
+    return [
+        top_border,
+        empty_line,
+        *content_box_lines,
+        empty_line,
+        bottom_border
+    ]
+
+def display_header():
+    print("\n".join(header_lines()))
+
+class _Phase:
+    """Times one phase for PhaseProfiler.phase()."""
+    def __init__(self, profiler, name, track):
+        self.profiler = profiler
+        self.name = name
+        self.track = track
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter(), self.track)
+
+class _NoPhase:
+    """Shared do-nothing stand-in for _Phase while profiling is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_PHASE = _NoPhase()
+
+class PhaseProfiler:
+    """Time the phases of scanning, drawing and terminating.
+
+    Code marks a phase with `with profiler.phase('scan'):`. While the
+    profiler is disabled that returns a shared no-op context manager, so a
+    hook costs one method call. Enabled, the last WINDOW durations of each
+    phase are kept for the p50/p99 overlay of the live monitor, and every
+    span is kept (up to MAX_EVENTS) for dump() to write as a Chrome trace.
+    """
+    PHASES = ('scan', 'match', 'diff', 'events', 'sample', 'render', 'draw', 'signal', 'wait')
+    TRACKS = ('main', 'termination')  # trace rows; waits on an event loop overlap the main row
+    WINDOW = 500
+    MAX_EVENTS = 200000
+
+    def __init__(self):
+        self.enabled = False
+        self.samples = {}  # phase -> deque of recent durations in seconds
+        self.events = []   # (phase, start, end, track)
+        self.origin = time.perf_counter()
+
+    def enable(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    def phase(self, name, track='main'):
+        """Context manager that records how long its block takes."""
+        if not self.enabled:
+            return _NO_PHASE
+        return _Phase(self, name, track)
+
+    def record(self, name, start, end, track='main'):
+        """Record a span measured with time.perf_counter()."""
+        samples = self.samples.get(name)
+        if samples is None:
+            import collections
+            samples = self.samples[name] = collections.deque(maxlen=self.WINDOW)
+        samples.append(end - start)
+        if len(self.events) < self.MAX_EVENTS:
+            self.events.append((name, start, end, track))
+
+    def percentiles(self, name):
+        """Return (p50, p99) in seconds over the recent durations of a phase."""
+        ordered = sorted(self.samples[name])
+        return ordered[len(ordered) // 2], ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)]
+
+    def overlay_lines(self):
+        """Build the p50/p99 table shown in the live monitor."""
+        lines = [f"{Colors.OKBLUE}{'PHASE':<8} {'COUNT':>7} {'P50 MS':>8} {'P99 MS':>8}{Colors.ENDC}"]
+        for name in self.PHASES:
+            if name in self.samples:
+                p50, p99 = self.percentiles(name)
+                count = len(self.samples[name])
+                lines.append(f"{Colors.OKBLUE}{name:<8} {count:>7} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}{Colors.ENDC}")
+        return lines
+
+    def dump(self, path):
+        """Write the recorded spans as a Chrome trace-event JSON file."""
+        import json
+        pid = os.getpid()
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': track}}
+                  for tid, track in enumerate(self.TRACKS)]
+        for name, start, end, track in self.events:
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': self.TRACKS.index(track),
+                           'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)})
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+# Off unless --profile is given
+profiler = PhaseProfiler()
+
+PROC_ROOT = '/proc'
+PF_KTHREAD = 0x00200000  # kernel thread bit in the flags field of /proc/<pid>/stat
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+class ProcessInfo:
+    """Structured record for a single process read from /proc.
+
+    Records use __slots__ and intern their comm and command strings, so a
+    fleet of identical servers shares one copy of each command, across
+    records and across scans.
+    """
+    __slots__ = ('pid', 'ppid', 'comm', 'argv', 'start_time', 'exe', '_command', 'cpu_ticks', 'threads',
+                 'rss', 'cpu_percent', 'fds', 'uptime', 'ports', 'cgroup', 'host')
+
+    def __init__(self, pid, ppid, comm, argv, start_time, exe=None):
+        self.pid = pid
+        self.ppid = ppid
+        self.comm = sys.intern(comm)
+        self.argv = argv
+        self._command = None
+        self.start_time = start_time  # clock ticks since boot (field 22 of /proc/<pid>/stat)
+        self.exe = exe
+        # Resource usage, filled from stat and by ResourceSampler when available
+        self.cpu_ticks = None
+        self.threads = None
+        self.rss = None  # bytes
+        self.cpu_percent = None
+        self.fds = None
+        self.uptime = None  # seconds
+        self.ports = None  # listening TCP ports, filled by PortIndex
+        self.cgroup = None  # cgroup v2 path, filled by group_by_cgroup()
+        self.host = None  # agent name for records received by FleetMonitor
+
+    @property
+    def command(self):
+        """Command line as a single string, the way ps prints it."""
+        if self._command is None:
+            self._command = sys.intern(' '.join(self.argv) if self.argv else f"[{self.comm}]")
+        return self._command
+
+    @property
+    def key(self):
+        """The PID, or "host/pid" for a record from an agent; unique across a fleet."""
+        return self.pid if self.host is None else f"{self.host}/{self.pid}"
+
+    @property
+    def identity(self):
+        """(pid, start_time), which stays unique even when the kernel reuses the PID."""
+        return (self.pid, self.start_time)
+
+    def as_tuple(self):
+        """Return the legacy (pid, command) tuple used by the menus."""
+        return (str(self.pid), self.command)
+
+    def __repr__(self):
+        return f"ProcessInfo(pid={self.pid}, ppid={self.ppid}, comm={self.comm!r})"
+
+def _use_proc_scanner():
+    """Return True when processes can be read straight from /proc."""
+    return sys.platform.startswith('linux') and os.path.isdir(PROC_ROOT)
+
+def _read_proc_file(path, table=False):
+    """Read a /proc file with a single open/read/close where possible.
+
+    Set table for files listing many records, e.g. /proc/net/tcp or
+    cgroup.procs: those return about a page per read, so they are read
+    until EOF.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        data = os.read(fd, 65536)
+        # Single-record files return everything they have in one read, so a short read means EOF
+        if len(data) < 65536 and not table:
+            return data
+        chunks = [data]
+        while True:
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+
+def _parse_stat(data):
+    """Split /proc/<pid>/stat into comm and the fields following it."""
+    # comm may contain spaces and parentheses, so split on the last ')'
+    rparen = data.rfind(b')')
+    comm = data[data.find(b'(') + 1:rparen].decode(errors='replace')
+    return comm, data[rparen + 2:].split()
+
+def _parse_cmdline(data):
+    """Turn a NUL-separated /proc/<pid>/cmdline into an argv list."""
+    if not data:
+        return []
+    return data.rstrip(b'\0').decode(errors='replace').split('\0')
+
+def read_process_info(pid, proc_root=PROC_ROOT, argv=None, read_exe=False):
+    """Read a ProcessInfo record for one PID, or None if it has gone away."""
+    base = f"{proc_root}/{pid}"
+    try:
+        if argv is None:
+            argv = _parse_cmdline(_read_proc_file(base + '/cmdline'))
+        comm, fields = _parse_stat(_read_proc_file(base + '/stat'))
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+    exe = None
+    if read_exe:
+        try:
+            exe = os.readlink(base + '/exe')
+        except OSError:
+            pass
+    info = ProcessInfo(pid, int(fields[1]), comm, argv, int(fields[19]), exe)
+    _apply_stat_fields(info, fields)
+    return info
+
+def process_start_time(pid, proc_root=PROC_ROOT):
+    """Start time of a PID in clock ticks since boot, or None if it is gone."""
+    try:
+        return int(_parse_stat(_read_proc_file(f"{proc_root}/{pid}/stat"))[1][19])
+    except (FileNotFoundError, ProcessLookupError, PermissionError):
+        return None
+
+def _apply_stat_fields(info, fields):
+    """Copy CPU time, thread count and RSS from parsed stat fields into a record."""
+    info.cpu_ticks = int(fields[11]) + int(fields[12])  # utime + stime
+    info.threads = int(fields[17])
+    info.rss = int(fields[21]) * PAGE_SIZE
+
+def scan_processes(proc_root=PROC_ROOT, read_exe=False, read_cmdline=True):
+    """Return a ProcessInfo record for every process listed in /proc.
+
+    With read_cmdline unset only stat is read, which is enough for the
+    process tree; argv is then left empty.
+    """
+    records = []
+    argv = None if read_cmdline else []
+    with os.scandir(proc_root) as entries:
+        for entry in entries:
+            if entry.name.isdigit():
+                info = read_process_info(int(entry.name), proc_root, argv=argv, read_exe=read_exe)
+                if info is not None:
+                    records.append(info)
+    return records
+
+class ResourceSampler:
+    """Fills CPU%, RSS, thread, fd and uptime figures into ProcessInfo records.
+
+    CPU% is the change in utime+stime between two samples; a process seen
+    for the first time gets its lifetime average. Each PID's stat file is
+    kept open between samples and re-read with pread(), so a refresh costs
+    one syscall per process. Open-fd counts need a directory listing and
+    are only collected for the rows passed to collect_details().
+    """
+    MAX_HANDLES = 1024
+
+    def __init__(self, proc_root=PROC_ROOT):
+        self.proc_root = proc_root
+        self.handles = {}   # pid -> open fd on /proc/<pid>/stat
+        self.previous = {}  # (pid, start_time) -> (cpu_ticks, time.monotonic())
+        self.boot_time = None
+
+    def _boot_time(self):
+        """Seconds since the epoch at which the system booted (btime in /proc/stat)."""
+        if self.boot_time is None:
+            for line in _read_proc_file(f"{self.proc_root}/stat").splitlines():
+                if line.startswith(b'btime '):
+                    self.boot_time = int(line.split()[1])
+                    break
+            else:
+                self.boot_time = 0
+        return self.boot_time
+
+    def _read_stat(self, pid):
+        """Re-read /proc/<pid>/stat through a cached handle."""
+        fd = self.handles.get(pid)
+        if fd is None:
+            if len(self.handles) >= self.MAX_HANDLES:
+                return _read_proc_file(f"{self.proc_root}/{pid}/stat")
+            fd = os.open(f"{self.proc_root}/{pid}/stat", os.O_RDONLY)
+            self.handles[pid] = fd
+        return os.pread(fd, 4096, 0)
+
+    def _drop(self, pid):
+        fd = self.handles.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+
+    def sample(self, records):
+        """Refresh resource usage for every record, returning those still alive."""
+        now = time.monotonic()
+        boot_time = self._boot_time() if records else 0
+        alive = []
+        seen = set()
+        for info in records:
+            if info.start_time is None:
+                alive.append(info)  # no /proc data for this record
+                continue
+            try:
+                _, fields = _parse_stat(self._read_stat(info.pid))
+            except OSError:
+                self._drop(info.pid)
+                continue
+            if int(fields[19]) != info.start_time:
+                self._drop(info.pid)  # the PID now belongs to a different process
+                continue
+            _apply_stat_fields(info, fields)
+            key = (info.pid, info.start_time)
+            seen.add(key)
+            info.uptime = max(time.time() - boot_time - info.start_time / CLOCK_TICKS, 0)
+            previous = self.previous.get(key)
+            if previous is not None and now > previous[1]:
+                info.cpu_percent = (info.cpu_ticks - previous[0]) / CLOCK_TICKS / (now - previous[1]) * 100
+            elif info.uptime > 0:
+                info.cpu_percent = info.cpu_ticks / CLOCK_TICKS / info.uptime * 100
+            self.previous[key] = (info.cpu_ticks, now)
+            alive.append(info)
+
+        # Forget processes that have gone away
+        for key in [key for key in self.previous if key not in seen]:
+            del self.previous[key]
+        live_pids = {pid for pid, _ in seen}
+        for pid in [pid for pid in self.handles if pid not in live_pids]:
+            self._drop(pid)
+        return alive
+
+    def collect_details(self, records):
+        """Count open file descriptors for the given (visible) records."""
+        for info in records:
+            try:
+                info.fds = len(os.listdir(f"{self.proc_root}/{info.pid}/fd"))
+            except OSError:
+                info.fds = None
+
+    def close(self):
+        for pid in list(self.handles):
+            self._drop(pid)
+
+TCP_LISTEN = '0A'
+TCP_ESTABLISHED = '01'
+
+class PortIndex:
+    """Maps listening TCP ports to the processes that hold them (Linux only).
+
+    Each update() parses /proc/net/tcp and /proc/net/tcp6 once to find the
+    inodes of listening sockets, then matches them against the socket
+    inodes in each PID's fd directory. A PID's fds are only readlink()ed
+    again when its list of fd numbers changes or one of its known listening
+    sockets disappears, so steady-state refreshes cost one directory
+    listing per process.
+    """
+    def __init__(self, proc_root=PROC_ROOT):
+        self.proc_root = proc_root
+        self.sockets = {}  # pid -> (fd names, socket inodes, the listening ones among them), all frozensets
+        self.by_port = {}  # port -> set of pids
+
+    def _tcp_sockets(self, states=(TCP_LISTEN,)):
+        """Return {inode: (state, local port)} for every TCP socket in one of the given states."""
+        sockets = {}
+        for name in ('tcp', 'tcp6'):
+            try:
+                data = _read_proc_file(f"{self.proc_root}/net/{name}", table=True).decode()
+            except OSError:
+                continue
+            for line in data.splitlines()[1:]:
+                fields = line.split()
+                if len(fields) > 9 and fields[3] in states:
+                    sockets[fields[9]] = (fields[3], int(fields[1].rsplit(':', 1)[1], 16))
+        return sockets
+
+    def _listening_inodes(self):
+        """Return {inode: port} for every listening TCP socket."""
+        return {inode: port for inode, (_, port) in self._tcp_sockets().items()}
+
+    def _read_socket_inodes(self, pid, names):
+        fd_dir = f"{self.proc_root}/{pid}/fd"
+        inodes = set()
+        for name in names:
+            try:
+                target = os.readlink(f"{fd_dir}/{name}")
+            except OSError:
+                continue
+            if target.startswith('socket:['):
+                inodes.add(target[8:-1])
+        return frozenset(inodes)
+
+    def _socket_inodes(self, pid, listening):
+        """Return the socket inodes held by a PID, reusing the cached set when unchanged."""
+        fd_dir = f"{self.proc_root}/{pid}/fd"
+        names = frozenset(os.listdir(fd_dir))
+        cached = self.sockets.get(pid)
+        if cached is not None and cached[0] == names:
+            held = cached[1]
+            # An fd number can be reused for a different socket, so a vanished listener forces a re-read
+            if all(inode in listening for inode in held if inode in cached[2]):
+                return held
+        held = self._read_socket_inodes(pid, names)
+        self.sockets[pid] = (names, held, frozenset(inode for inode in held if inode in listening))
+        return held
+
+    def update(self, records):
+        """Rebuild the index for the given ProcessInfo records and set their .ports."""
+        listening = self._listening_inodes()
+        by_port = {}
+        alive = set()
+        for info in records:
+            try:
+                inodes = self._socket_inodes(info.pid, listening)
+            except OSError:
+                info.ports = None  # gone, or not ours to inspect
+                continue
+            alive.add(info.pid)
+            info.ports = sorted({listening[inode] for inode in inodes if inode in listening})
+            for port in info.ports:
+                by_port.setdefault(port, set()).add(info.pid)
+        for pid in [pid for pid in self.sockets if pid not in alive]:
+            del self.sockets[pid]
+        self.by_port = by_port
+
+    def pids_for_port(self, port):
+        """PIDs listening on a port as of the last update()."""
+        return sorted(self.by_port.get(port, ()))
+
+    def connections(self, pids, ports):
+        """Count the established TCP connections each PID holds on one of the given local ports.
+
+        Returns {pid: count}, leaving out PIDs whose fds cannot be read
+        (e.g. because they have exited). fds are read afresh every time,
+        as connections come and go between calls.
+        """
+        sockets = self._tcp_sockets((TCP_LISTEN, TCP_ESTABLISHED))
+        counts = {}
+        for pid in pids:
+            try:
+                names = os.listdir(f"{self.proc_root}/{pid}/fd")
+            except OSError:
+                continue
+            if not names:
+                continue  # exiting; its fds are already closed
+            counts[pid] = sum(1 for inode in self._read_socket_inodes(pid, names)
+                              if sockets.get(inode, ('', 0))[0] == TCP_ESTABLISHED and sockets[inode][1] in ports)
+        return counts
+
+def parse_port(text):
+    """Parse a ':3000' style port reference into a port number, or None."""
+    text = text.strip()
+    if text.startswith(':') and text[1:].isdigit() and 0 < int(text[1:]) < 65536:
+        return int(text[1:])
+    return None
+
+# Matcher configuration is read from this JSON file when it exists
+CONFIG_PATH = os.environ.get('NODE_SERVER_MANAGER_CONFIG',
+                             os.path.join(os.path.expanduser('~'), '.node_server_manager.json'))
+
+def load_config(path=None):
+    """Read the JSON config file, returning {} when no path is given and CONFIG_PATH does not exist."""
+    if path is None:
+        if not os.path.exists(CONFIG_PATH):
+            return {}
+        path = CONFIG_PATH
+    import json
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"cannot read config {path}: {e}")
+    if not isinstance(config, dict):
+        raise ValueError(f"config {path} must hold a JSON object")
+    return config
+
+class ProcessMatcher:
+    """Decides which processes count as Node.js servers.
+
+    A process matches when the name of its executable (argv[0], comm, or the
+    /proc/<pid>/exe target with read_exe set) fully matches one of the
+    `executables` patterns, or its command line matches one of the `include`
+    patterns, and its command line matches none of the `exclude` patterns.
+    Each list is compiled into a single regex.
+
+    Decisions are memoized per (pid, start_time) together with the comm
+    they were made for; exec() changes comm, so an exec'd process is
+    matched again while a long-lived one is only read once.
+    """
+    DEFAULT_EXECUTABLES = ['node', 'nodejs', r'node\d+', 'bun', 'deno', 'next-server']
+
+    def __init__(self, executables=None, include=(), exclude=(), read_exe=False):
+        if executables is None:
+            executables = self.DEFAULT_EXECUTABLES
+        self.executables = self._compile(executables)
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+        self.read_exe = read_exe
+        self.memo = {}  # (pid, start_time) -> (comm, argv if matched else None)
+
+    @staticmethod
+    def _compile(patterns):
+        """Join patterns into one alternation, or None when there are none."""
+        patterns = list(patterns)
+        if not patterns:
+            return None
+        try:
+            return re.compile('|'.join(f"(?:{pattern})" for pattern in patterns))
+        except re.error as e:
+            raise ValueError(f"invalid pattern in {patterns}: {e}")
+
+    @classmethod
+    def from_config(cls, path=None):
+        """Build a matcher from the "match" section of a JSON config file.
+
+        The defaults are used for anything the file does not set, or when
+        no path is given and CONFIG_PATH does not exist.
+        """
+        rules = load_config(path).get('match', {})
+        unknown = set(rules) - {'executables', 'include', 'exclude', 'read_exe'}
+        if unknown:
+            raise ValueError(f"unknown match settings in {path or CONFIG_PATH}: {', '.join(sorted(unknown))}")
+        return cls(rules.get('executables'), rules.get('include', ()),
+                   rules.get('exclude', ()), rules.get('read_exe', False))
+
+    def match(self, argv, comm=None, exe=None):
+        """Check an argv list (and optionally comm and exe path) against the rules."""
+        if not argv:
+            return False  # kernel threads and zombies have no command line
+        command = ' '.join(argv)
+        if self.exclude is not None and self.exclude.search(command):
+            return False
+        if self.include is not None and self.include.search(command):
+            return True
+        if self.executables is None:
+            return False
+        # process.title (e.g. next-server) can turn argv[0] into "name (details)"
+        names = [os.path.basename(argv[0].split(' ', 1)[0])]
+        if comm:
+            names.append(comm)
+        if exe:
+            names.append(os.path.basename(exe))
+        return any(self.executables.fullmatch(name) for name in names)
+
+    def match_command(self, command):
+        """Check a command line string, e.g. from ps, against the rules."""
+        return self.match(command.split())
+
+    def scan(self, proc_root=PROC_ROOT, read_exe=False):
+        """Scan /proc and return ProcessInfo records for the matching processes.
+
+        One stat read per process; cmdline (and exe) are only read for
+        processes whose (pid, start_time, comm) has not been seen before.
+        """
+        read_exe = read_exe or self.read_exe
+        memo = {}
+        records = []
+        with os.scandir(proc_root) as entries:
+            for entry in entries:
+                name = entry.name
+                if not name.isdigit():
+                    continue
+                base = f"{proc_root}/{name}"
+                try:
+                    comm, fields = _parse_stat(_read_proc_file(base + '/stat'))
+                except (FileNotFoundError, ProcessLookupError, PermissionError):
+                    continue
+                pid = int(name)
+                key = (pid, int(fields[19]))
+                cached = self.memo.get(key)
+                if cached is not None and cached[0] == comm:
+                    argv = cached[1]
+                elif int(fields[6]) & PF_KTHREAD:
+                    argv = None  # kernel threads have no cmdline to read
+                else:
+                    try:
+                        argv = _parse_cmdline(_read_proc_file(base + '/cmdline'))
+                    except (FileNotFoundError, ProcessLookupError, PermissionError):
+                        continue
+                    exe = None
+                    if read_exe:
+                        try:
+                            exe = os.readlink(base + '/exe')
+                        except OSError:
+                            pass
+                    if not self.match(argv, comm, exe):
+                        argv = None
+                memo[key] = (comm, argv)
+                if argv is not None:
+                    info = ProcessInfo(pid, int(fields[1]), comm, argv, key[1])
+                    _apply_stat_fields(info, fields)
+                    records.append(info)
+        self.memo = memo  # only processes that still exist are kept
+        return records
+
+_process_matcher = None
+
+def get_process_matcher():
+    """Return the shared matcher, loading CONFIG_PATH on first use."""
+    global _process_matcher
+    if _process_matcher is None:
+        _process_matcher = ProcessMatcher.from_config()
+    return _process_matcher
+
+def set_process_matcher(matcher):
+    """Replace the shared matcher, e.g. with one built from a --config file."""
+    global _process_matcher
+    _process_matcher = matcher
+
+def is_node_command(command):
+    """Check whether a command line looks like a Node.js process."""
+    return get_process_matcher().match_command(command)
+
+def find_node_processes(proc_root=PROC_ROOT, read_exe=False):
+    """Scan /proc for Node.js processes and return ProcessInfo records."""
+    return get_process_matcher().scan(proc_root, read_exe)
+
+def _get_node_processes_ps():
+    """Find Node.js processes by parsing `ps` output (non-Linux Unix)."""
+    import subprocess
+    matcher = get_process_matcher()
+    result = subprocess.run(['ps', '-eo', 'pid,command'], capture_output=True, text=True)
+    processes = []
+    for line in result.stdout.strip().split('\n')[1:]:
+        if line.strip():
+            parts = line.strip().split(maxsplit=1)
+            if len(parts) >= 2:
+                pid = parts[0]
+                command = parts[1]
+                if matcher.match_command(command):
+                    processes.append((pid, command))
+    return processes
+
+_resource_sampler = None
+_port_index = None
+
+def get_node_processes(with_resources=False):
+    """Retrieve running Node.js processes with PID and command line.
+
+    With with_resources set, each entry is a (pid, command, info) triple where
+    info is a ProcessInfo carrying CPU%, RSS, thread count, uptime and
+    listening ports, or None on platforms without /proc. Open-fd counts are
+    left to collect_details(), for the rows that are actually shown.
+    """
+    global _resource_sampler, _port_index
+    try:
+        if with_resources and not _use_proc_scanner():
+            return [(pid, command, None) for pid, command in get_node_processes()]
+        if sys.platform == 'win32':
+            # Windows: Use tasklist command
+            import subprocess
+            matcher = get_process_matcher()
+            cmd = 'tasklist /FO CSV /NH'
+            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            processes = []
+            for line in result.stdout.strip().split('\n'):
+                if line:
+                    parts = line.split('","')
+                    if len(parts) >= 2:
+                        pid = parts[1].strip('"')
+                        name = parts[0].strip('"')
+                        # tasklist only shows image names, so match those without .exe
+                        if matcher.match([name[:-4] if name.lower().endswith('.exe') else name]):
+                            processes.append((pid, name))
+            return processes
+        elif _use_proc_scanner():
+            # Linux: read /proc directly instead of forking ps and grep
+            with profiler.phase('scan'):
+                records = find_node_processes()
+            if not with_resources:
+                return [info.as_tuple() for info in records]
+            if _resource_sampler is None:
+                _resource_sampler = ResourceSampler()
+                _port_index = PortIndex()
+            with profiler.phase('sample'):
+                records = _resource_sampler.sample(records)
+                _port_index.update(records)
+            return [info.as_tuple() + (info,) for info in records]
+        else:
+            # Other Unix-like systems: Use ps command
+            return _get_node_processes_ps()
+    except Exception as e:
+        print(f"{Colors.FAIL}Error finding processes: {e}{Colors.ENDC}")
+        return []
+
+def collect_details(records):
+    """Fill in the details get_node_processes() leaves out (open fds) for the records about to be shown."""
+    if _resource_sampler is not None:
+        with profiler.phase('sample'):
+            _resource_sampler.collect_details(records)
+
+async def get_node_processes_async(with_resources=False):
+    """Coroutine version of get_node_processes().
+
+    Reading /proc takes a few milliseconds and runs on the loop itself; the
+    ps and tasklist fallbacks wait on a child process, so they run in the
+    loop's default executor.
+    """
+    if _use_proc_scanner():
+        return get_node_processes(with_resources)
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, get_node_processes, with_resources)
+
+# How long a process snapshot is reused before the process table is scanned again
+SNAPSHOT_TTL = 1.0
+
+class ProcessSnapshot:
+    """Shared, short-lived cache of the Node.js process table.
+
+    Records are ProcessInfo objects indexed by PID, so lookups are O(1) and
+    every caller within the TTL sees the same scan. On platforms without
+    /proc the records only carry a PID and command and start_time is None.
+    """
+    def __init__(self, ttl=SNAPSHOT_TTL):
+        self.ttl = ttl
+        self.by_pid = {}      # pid -> ProcessInfo
+        self.taken_at = None  # time.monotonic() of the last scan or update()
+
+    def is_stale(self):
+        return self.taken_at is None or time.monotonic() - self.taken_at > self.ttl
+
+    def refresh(self):
+        """Rescan the process table, ignoring the TTL."""
+        records = []
+        for pid, command, info in get_node_processes(with_resources=True):
+            if info is None:
+                info = ProcessInfo(int(pid), None, command.split(' ', 1)[0], [command], None)
+            records.append(info)
+        self.update(records)
+        return records
+
+    def update(self, records):
+        """Replace the contents with records scanned elsewhere, e.g. by the live monitor."""
+        self.by_pid = {info.pid: info for info in records}
+        self.taken_at = time.monotonic()
+
+    def records(self):
+        """All records, rescanning first if the snapshot is older than the TTL."""
+        if self.is_stale():
+            self.refresh()
+        return list(self.by_pid.values())
+
+    def get(self, pid):
+        """The record for a PID (int or digit string), or None if it is not a Node.js process."""
+        if self.is_stale():
+            self.refresh()
+        try:
+            return self.by_pid.get(int(pid))
+        except (TypeError, ValueError):
+            return None
+
+    def discard(self, pid):
+        """Forget a PID, e.g. after it has been terminated."""
+        self.by_pid.pop(int(pid), None)
+
+    def invalidate(self):
+        """Make the next lookup rescan."""
+        self.taken_at = None
+
+process_snapshot = ProcessSnapshot()
+
+# Process events are appended to this file when a command runs with --journal
+JOURNAL_PATH = os.environ.get('NODE_SERVER_MANAGER_JOURNAL',
+                              os.path.join(os.path.expanduser('~'), '.node_server_manager.journal'))
+
+class EventJournal:
+    """Append-only binary log of process starts, exits and terminations.
+
+    Every event is one fixed-size record: time, pid, ppid, start time,
+    event, termination status and the first COMMAND_BYTES of the command
+    line. Appending is a single write(), and reading maps the file and
+    indexes it by record number, so a query only touches the records it
+    looks at. read() finds a time range by binary search as long as the
+    records are in time order. Several commands can append to one journal,
+    though, and a clock step can go backwards, so each writer compares its
+    record with the one it landed after. If its record is the older of the
+    two, it marks the file unsorted in the header, and read() then scans
+    every record for the range instead. When a file reaches max_records it is
+    renamed to PATH.1, replacing the previous one, so the journal never
+    takes more than twice that on disk.
+    """
+    MAGIC = b'NSMJRNL1'
+    RECORD_FORMAT = '<dIIQBB2x100s'  # 128 bytes; the header record is MAGIC padded to the same size
+    RECORD_SIZE = 128
+    COMMAND_BYTES = 100
+    EVENTS = ('running', 'start', 'exit', 'kill')
+    STATUSES = ('', 'success', 'success_force', 'already_terminated', 'failed', 'error')
+    MAX_RECORDS = 1 << 20  # 128 MiB per file
+    UNSORTED = len(MAGIC)  # header byte set to 1 once a record is older than the one before it
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.fd = None
+        self.count = 0
+        self.max_records = self.MAX_RECORDS
+        self.record_struct = None
+        self.lock = None
+        self.unsorted = False
+
+    def open(self, path=JOURNAL_PATH, max_records=MAX_RECORDS):
+        """Start appending to the journal at path, creating it if needed."""
+        import struct
+        import threading
+        self.record_struct = struct.Struct(self.RECORD_FORMAT)
+        self.lock = threading.Lock()  # `agent` records kills from its server threads
+        self.path = path
+        self.max_records = max_records
+        self._open_file()
+        self.enabled = True
+
+    def _open_file(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o600)
+        size = os.fstat(fd).st_size
+        if size == 0:
+            os.write(fd, self.MAGIC.ljust(self.RECORD_SIZE, b'\0'))
+            size = self.RECORD_SIZE
+            self.unsorted = False
+        else:
+            header = os.read(fd, self.UNSORTED + 1)
+            if header[:self.UNSORTED] != self.MAGIC:
+                os.close(fd)
+                raise ValueError(f"{self.path} is not a process journal")
+            self.unsorted = header[self.UNSORTED:] == b'\1'
+            if size % self.RECORD_SIZE:
+                # A write cut short by a crash; drop it so later records stay aligned
+                size -= size % self.RECORD_SIZE
+                os.ftruncate(fd, size)
+        self.fd = fd
+        self.count = size // self.RECORD_SIZE - 1
+
+    def _rotate(self):
+        try:
+            # Another process writing the same journal may have rotated it already
+            current = os.path.samestat(os.fstat(self.fd), os.stat(self.path))
+        except FileNotFoundError:
+            current = False
+        os.close(self.fd)
+        if current:
+            os.replace(self.path, self.path + '.1')
+        self._open_file()
+
+    def record(self, event, pid, command=None, ppid=None, start_time=None, status=''):
+        """Append one event; does nothing unless the journal is open."""
+        if not self.enabled:
+            return
+        status = self.STATUSES.index(status) if status in self.STATUSES else 0
+        with self.lock:
+            if self.count >= self.max_records:
+                self._rotate()
+            when = time.time()
+            os.write(self.fd, self.record_struct.pack(
+                when, pid, ppid or 0, start_time or 0, self.EVENTS.index(event), status,
+                (command or '').encode(errors='replace')[:self.COMMAND_BYTES]))
+            self.count += 1
+            if not self.unsorted:
+                self._check_order(when)
+
+    def _check_order(self, when):
+        """Mark the file unsorted if the record just appended is older than the one before it."""
+        # O_APPEND leaves the offset just past our record, wherever other writers put theirs
+        previous = os.lseek(self.fd, 0, os.SEEK_CUR) - 2 * self.RECORD_SIZE
+        if previous < self.RECORD_SIZE:
+            return  # the first record
+        os.lseek(self.fd, previous, os.SEEK_SET)
+        if self.record_struct.unpack_from(os.read(self.fd, self.RECORD_SIZE))[0] <= when:
+            return
+        self.unsorted = True
+        # Appends ignore the offset, so the header needs a descriptor without O_APPEND
+        fd = os.open(self.path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            if os.path.samestat(os.fstat(fd), os.fstat(self.fd)):  # not rotated away meanwhile
+                os.lseek(fd, self.UNSORTED, os.SEEK_SET)
+                os.write(fd, b'\1')
+        finally:
+            os.close(fd)
+
+    def record_processes(self, event, records):
+        """Append an event for each ProcessInfo record."""
+        if self.enabled:
+            for info in records:
+                self.record(event, info.pid, info.command, info.ppid, info.start_time)
+
+    def record_results(self, results):
+        """Append a 'kill' event for each termination result dict."""
+        if self.enabled:
+            for result in results:
+                if isinstance(result['pid'], int):
+                    self.record('kill', result['pid'], result['command'], status=result['status'])
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+        self.enabled = False
+        self.fd = None
+
+    @classmethod
+    def read(cls, path=JOURNAL_PATH, pid=None, pattern=None, since=None, until=None, events=None):
+        """Yield the recorded events as dicts, oldest first, including the rotated PATH.1.
+
+        pid, a compiled regex searched in the command, a [since, until]
+        range of Unix times and a collection of event names narrow it down.
+        """
+        import mmap
+        import struct
+        record_struct = struct.Struct(cls.RECORD_FORMAT)
+        for name in (path + '.1', path):
+            try:
+                with open(name, 'rb') as f:
+                    header = f.read(cls.UNSORTED + 1)
+                    if header[:cls.UNSORTED] != cls.MAGIC:
+                        raise ValueError(f"{name} is not a process journal")
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except FileNotFoundError:
+                continue
+            with data:
+                count = len(data) // cls.RECORD_SIZE - 1
+                start, end = 0, count
+                if header[cls.UNSORTED:] != b'\1':
+                    if since is not None:
+                        start = cls._bisect(data, count, since)
+                    if until is not None:
+                        end = cls._bisect(data, count, until, after=True)
+                indexes = range(start, end) if pid is None else cls._find_pid(data, start, end, pid)
+                try:
+                    for index in indexes:
+                        offset = (index + 1) * cls.RECORD_SIZE
+                        when, record_pid, ppid, start_time, event, status, command = record_struct.unpack_from(data, offset)
+                        if (since is not None and when < since) or (until is not None and when > until):
+                            continue  # only possible in an unsorted file
+                        event = cls.EVENTS[event]
+                        if events and event not in events:
+                            continue
+                        command = command.rstrip(b'\0').decode(errors='ignore')
+                        if pattern is not None and not pattern.search(command):
+                            continue
+                        record = {'event': event, 'time': round(when, 3), 'pid': record_pid}
+                        if ppid:
+                            record['ppid'] = ppid
+                        record['command'] = command
+                        if start_time:
+                            record['start_time'] = start_time
+                        if event == 'kill':
+                            record['status'] = cls.STATUSES[status] or None
+                        yield record
+                finally:
+                    if pid is not None:
+                        indexes.close()  # releases its view of the map before the map is closed
+
+    @classmethod
+    def _find_pid(cls, data, start, end, pid):
+        """Yield the indexes of a PID's records, reading only the pid column a chunk at a time."""
+        import struct
+        words = cls.RECORD_SIZE // 4
+        native = struct.unpack('=I', struct.pack('<I', pid))[0]  # the column is read in native byte order
+        with memoryview(data) as view, view.cast('I') as column:
+            for chunk in range(start, end, 65536):
+                stop = min(chunk + 65536, end)
+                pids = column[(chunk + 1) * words + 2:(stop + 1) * words:words].tolist()
+                position = -1
+                while True:
+                    try:
+                        position = pids.index(native, position + 1)
+                    except ValueError:
+                        break
+                    yield chunk + position
+
+    @classmethod
+    def _bisect(cls, data, count, when, after=False):
+        """Index of the first record at or after when (after it, with after set)."""
+        import struct
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            value = struct.unpack_from('<d', data, (middle + 1) * cls.RECORD_SIZE)[0]
+            if value < when or (after and value == when):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+# Off unless --journal is given
+journal = EventJournal()
+
+def termination_targets(records):
+    """(pid, command, start_time) targets for terminate_processes()."""
+    return [(info.pid, info.command, info.start_time) for info in records]
+
+# Default time to wait for a graceful exit after SIGTERM, and after SIGKILL
+GRACE_PERIOD = 2.0
+KILL_TIMEOUT = 1.0
+
+def terminate_process(pid, command=None, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, start_time=None):
+    """Terminate a process by PID with graceful shutdown attempt, returning status information.
+
+    With start_time given, the process is only signalled if the PID still
+    has that start time, i.e. it has not exited and been reused.
+    """
+    return terminate_processes([(pid, command, start_time)], grace_period, kill_timeout)[0]
+
+def _open_pidfds(pids):
+    """Open a pidfd for each PID where the kernel supports it, returning {pid: fd}."""
+    pidfds = {}
+    if not hasattr(os, 'pidfd_open'):
+        return pidfds
+    for pid in pids:
+        try:
+            pidfds[pid] = os.pidfd_open(pid)
+        except ProcessLookupError:
+            pass  # already gone; process_exists() reports it
+        except OSError:
+            break  # pidfd_open unsupported here, fall back to polling
+    return pidfds
+
+def _close_pidfds(pidfds):
+    """Close every pidfd opened by _open_pidfds()."""
+    for fd in pidfds.values():
+        os.close(fd)
+    pidfds.clear()
+
+def _send_signal(pids, force=False, pidfds=None):
+    """Send SIGTERM (or SIGKILL when force is set) to each PID, returning {pid: error}."""
+    errors = {}
+    if sys.platform == 'win32':
+        # taskkill accepts many /PID arguments, so one call covers the whole batch
+        import subprocess
+        args = ['taskkill'] + (['/F'] if force else [])
+        for pid in pids:
+            args += ['/PID', str(pid)]
+        subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return errors
+    sig = signal.SIGKILL if force else signal.SIGTERM
+    pidfds = pidfds or {}
+    for pid in pids:
+        try:
+            if pid in pidfds:
+                # Signalling through the pidfd cannot hit a recycled PID
+                signal.pidfd_send_signal(pidfds[pid], sig)
+            else:
+                os.kill(pid, sig)
+        except ProcessLookupError:
+            pass  # exited in the meantime; the exit check picks it up
+        except Exception as e:
+            errors[pid] = e
+    return errors
+
+def _signal_all(pids, sig):
+    """Send a signal to every PID, ignoring processes that have already gone."""
+    for pid in pids:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+def _wait_for_exits(pids, deadline, pidfds=None):
+    """Wait until every PID has exited or the deadline passes.
+
+    PIDs with a pidfd are waited on with poll(), which wakes as soon as the
+    process exits. The rest are checked with process_exists() at an
+    exponentially growing interval. Returns (survivors, {pid: exit_time})
+    where exit_time is the time.monotonic() value the exit was seen at.
+    """
+    import select
+    remaining = set(pids)
+    exited = {}
+    polled = {}  # pidfd -> pid
+    if pidfds and hasattr(select, 'poll'):
+        poller = select.poll()
+        for pid in remaining:
+            if pid in pidfds:
+                poller.register(pidfds[pid], select.POLLIN)
+                polled[pidfds[pid]] = pid
+    unpolled = remaining - set(polled.values())
+
+    interval = 0.001
+    while remaining:
+        now = time.monotonic()
+        for pid in list(unpolled):
+            if not process_exists(pid):
+                unpolled.discard(pid)
+                remaining.discard(pid)
+                exited[pid] = now
+        if not remaining or now >= deadline:
+            break
+
+        # With only pidfds left, block until one fires; otherwise back off
+        wait = deadline - now if not unpolled else min(deadline - now, interval)
+        if polled:
+            for fd, _ in poller.poll(wait * 1000):
+                pid = polled.pop(fd)
+                poller.unregister(fd)
+                remaining.discard(pid)
+                exited[pid] = time.monotonic()
+        else:
+            time.sleep(wait)
+        interval = min(interval * 2, 0.1)
+    return remaining, exited
+
+async def _wait_for_exits_async(pids, deadline, pidfds=None):
+    """Coroutine version of _wait_for_exits().
+
+    The pidfds are watched with the running loop's add_reader(), so waiting
+    costs the loop nothing; PIDs without one are polled the same way.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    remaining = set(pids)
+    exited = {}
+    woken = asyncio.Event()
+    watched = {}  # pidfd -> pid
+
+    def on_exit(fd):
+        loop.remove_reader(fd)
+        pid = watched.pop(fd)
+        remaining.discard(pid)
+        exited[pid] = time.monotonic()
+        woken.set()
+
+    try:
+        for pid in remaining:
+            if pidfds and pid in pidfds:
+                try:
+                    loop.add_reader(pidfds[pid], on_exit, pidfds[pid])
+                except NotImplementedError:
+                    break  # the loop cannot watch descriptors, e.g. Windows' proactor
+                watched[pidfds[pid]] = pid
+        unpolled = remaining - set(watched.values())
+
+        interval = 0.001
+        while remaining:
+            now = time.monotonic()
+            for pid in list(unpolled):
+                if not process_exists(pid):
+                    unpolled.discard(pid)
+                    remaining.discard(pid)
+                    exited[pid] = now
+            if not remaining or now >= deadline:
+                break
+
+            woken.clear()
+            try:
+                await asyncio.wait_for(woken.wait(), deadline - now if not unpolled else min(deadline - now, interval))
+            except asyncio.TimeoutError:
+                pass
+            interval = min(interval * 2, 0.1)
+    finally:
+        for fd in watched:
+            loop.remove_reader(fd)
+    return remaining, exited
+
+# The MetricsExporter of a --metrics run; every termination result is fed to it
+metrics_exporter = None
+
+def terminate_processes(targets, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, frozen=False, cgroup=None,
+                        drain=None, verbose=True):
+    """Terminate many processes at once, sharing one grace deadline between them.
+
+    Every target gets SIGTERM up front, then all of them are watched against a
+    single deadline. Only the survivors are escalated to SIGKILL. Returns the
+    same per-PID result dicts as terminate_process(), in the order given, with
+    'exit_time' holding the seconds from SIGTERM until the exit was seen and
+    'exited_at' the time.monotonic() value it was seen at.
+
+    Targets are (pid, command) or (pid, command, start_time) tuples. A target
+    with a start time is skipped as already terminated when its PID now
+    belongs to a different process.
+
+    With frozen set, the targets have already been stopped with SIGSTOP;
+    they are sent SIGCONT right after SIGTERM so they can act on it.
+
+    With cgroup set to the directory of a frozen cgroup v2 that holds only
+    the targets, the cgroup is thawed right after SIGTERM, and at the
+    deadline everything left in it is killed through its cgroup.kill.
+
+    With drain set to a number of seconds (Linux only), servers are not
+    escalated by the grace period but once their client connections have
+    closed, or after drain seconds at the latest; their results report
+    'connections', 'drain_time' and 'dropped'. See _drain_steps().
+
+    Progress is printed on stdout unless verbose is False.
+    """
+    steps = _termination_steps(targets, grace_period, kill_timeout, frozen, verbose, cgroup, drain)
+    try:
+        wait = next(steps)
+        while True:
+            with profiler.phase('wait'):
+                exits = _wait_for_exits(*wait)
+            wait = steps.send(exits)
+    except StopIteration as done:
+        return _count_outcomes(done.value)
+    finally:
+        steps.close()
+
+async def terminate_processes_async(targets, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT,
+                                    frozen=False, verbose=False, cgroup=None, drain=None):
+    """Coroutine version of terminate_processes() for use inside an event loop.
+
+    The exits are awaited on the running loop instead of blocking it, so
+    other tasks keep going during the grace period. Progress is only printed
+    with verbose set. Cancelling the task stops the waiting; signals already
+    sent are not taken back.
+    """
+    steps = _termination_steps(targets, grace_period, kill_timeout, frozen, verbose, cgroup, drain)
+    try:
+        wait = next(steps)
+        while True:
+            # Other tasks run during the wait, so it goes on its own trace row
+            with profiler.phase('wait', 'termination'):
+                exits = await _wait_for_exits_async(*wait)
+            wait = steps.send(exits)
+    except StopIteration as done:
+        return _count_outcomes(done.value)
+    finally:
+        steps.close()
+
+def _count_outcomes(results):
+    if metrics_exporter is not None:
+        metrics_exporter.record_terminations(results)
+    journal.record_results(results)
+    return results
+
+def _termination_steps(targets, grace_period, kill_timeout, frozen, verbose=True, cgroup=None, drain=None):
+    """Signal the targets, handing every wait back to the caller.
+
+    This generator yields (pids, deadline, pidfds) whenever it needs to wait
+    for exits and expects (survivors, {pid: exit_time}) to be sent back, so
+    the same steps run blocking or on an event loop. Its return value is the
+    list of result dicts.
+
+    With drain set (Linux only), servers are escalated by their connections
+    instead of the clock; see _drain_steps().
+    """
+    def say(text):
+        if verbose:
+            print(text)
+
+    results = {}
+    order = []
+    commands = {}
+    start_times = {}
+    for target in targets:
+        pid, command = target[0], target[1]
+        try:
+            pid = int(pid)
+        except (TypeError, ValueError) as e:
+            order.append(pid)
+            results[pid] = {
+                'pid': pid,
+                'command': command,
+                'status': 'error',
+                'message': f"Error terminating process {pid}: {e}"
+            }
+            continue
+        if pid in commands:
+            continue
+        order.append(pid)
+        commands[pid] = command
+        if len(target) > 2 and target[2] is not None:
+            start_times[pid] = target[2]
+
+        # Check if process is already dead
+        if not process_exists(pid):
+            results[pid] = {
+                'pid': pid,
+                'command': command,
+                'status': 'already_terminated',
+                'message': f"Process {pid} was already terminated"
+            }
+            continue
+
+    def cmd_display(pid):
+        return f" ({commands[pid]})" if commands[pid] else ""
+
+    def record(pid, status, message, exit_time=None):
+        results[pid] = {'pid': pid, 'command': commands[pid], 'status': status, 'message': message}
+        if exit_time is not None:
+            results[pid]['exit_time'] = round(exit_time - signalled_at, 4)
+            results[pid]['exited_at'] = exit_time
+
+    def record_error(pid, error):
+        # After exception, check if process is dead
+        if not process_exists(pid):
+            record(pid, 'success', f"Process {pid}{cmd_display(pid)} terminated (with exception)")
+        else:
+            record(pid, 'error', f"Error terminating process {pid}{cmd_display(pid)}: {error}")
+
+    def escalate(survivors, whole_cgroup=True):
+        """SIGKILL the survivors, returning those that could be signalled."""
+        with profiler.phase('signal'):
+            if cgroup is not None and whole_cgroup:
+                # One write SIGKILLs everything in the cgroup, including anything forked since;
+                # the known survivors are still signalled in case the write did not take
+                _write_cgroup(cgroup, 'cgroup.kill', '1')
+            errors = _send_signal(survivors, force=True, pidfds=pidfds)
+        for pid, error in errors.items():
+            record_error(pid, error)
+        return [pid for pid in survivors if pid not in results]
+
+    pending = [pid for pid in commands if pid not in results]
+    pidfds = _open_pidfds(pending)
+    try:
+        if not pending:
+            return [results[pid] for pid in order]
+        # Make sure each PID is still the process that was selected. Once its
+        # pidfd is open the PID cannot be reused, so this check cannot race.
+        for pid in pending:
+            if pid in start_times and _use_proc_scanner():
+                start_time = process_start_time(pid)
+                if start_time is None:
+                    record(pid, 'already_terminated', f"Process {pid} was already terminated")
+                elif start_time != start_times[pid]:
+                    record(pid, 'already_terminated',
+                           f"Process {pid}{cmd_display(pid)} was already terminated; its PID now belongs to another process")
+        pending = [pid for pid in pending if pid not in results]
+        if not pending:
+            return [results[pid] for pid in order]
+        # Announced only now, so a recycled PID is never reported as being terminated
+        for pid in pending:
+            say(f"{Colors.WARNING}Terminating process {pid}{cmd_display(pid)}...{Colors.ENDC}")
+
+        if drain is not None and _use_proc_scanner():
+            # Ports to watch have to be taken now; a draining server usually closes its listener first
+            port_index = PortIndex()
+            port_index.update([ProcessInfo(pid, None, '', None, None) for pid in pending])
+            drain_ports = set(port_index.by_port)
+            connections = port_index.connections(pending, drain_ports)
+            servers = set().union(*port_index.by_port.values()) | {pid for pid in connections if connections[pid]}
+
+        # Try graceful termination first, signalling every target at once
+        say(f"{Colors.OKCYAN}  Attempting graceful shutdown of {len(pending)} process(es)...{Colors.ENDC}")
+        signalled_at = time.monotonic()
+        with profiler.phase('signal'):
+            errors = _send_signal(pending, pidfds=pidfds)
+            if frozen:
+                _signal_all(pending, signal.SIGCONT)
+            if cgroup is not None:
+                _write_cgroup(cgroup, 'cgroup.freeze', '0')
+        for pid, error in errors.items():
+            record_error(pid, error)
+        pending = [pid for pid in pending if pid not in results]
+
+        if drain is not None and _use_proc_scanner():
+            yield from _drain_steps(pending, signalled_at, grace_period, kill_timeout, drain, pidfds, port_index,
+                                    drain_ports, servers, connections, results, record, escalate, cmd_display, say)
+            return [results[pid] for pid in order]
+
+        # Wait for all of them against one shared deadline
+        survivors, exited = yield pending, signalled_at + grace_period, pidfds
+        for pid in pending:
+            if pid in exited:
+                record(pid, 'success', f"Process {pid}{cmd_display(pid)} terminated gracefully", exited[pid])
+        survivors = [pid for pid in pending if pid in survivors]
+
+        if survivors:
+            # Escalate only the processes that are still running
+            say(f"{Colors.WARNING}  Graceful shutdown failed for {len(survivors)} process(es), attempting force kill...{Colors.ENDC}")
+            survivors = escalate(survivors)
+
+            still_running, exited = yield survivors, time.monotonic() + kill_timeout, pidfds
+            for pid in survivors:
+                if pid in still_running:
+                    record(pid, 'failed', f"Failed to terminate process {pid}{cmd_display(pid)}")
+                else:
+                    record(pid, 'success_force', f"Process {pid}{cmd_display(pid)} terminated forcefully", exited[pid])
+    finally:
+        _close_pidfds(pidfds)
+        if cgroup is not None:
+            # Thawed right after SIGTERM normally, but never left frozen when nothing was signalled
+            _write_cgroup(cgroup, 'cgroup.freeze', '0')
+
+    return [results[pid] for pid in order]
+
+DRAIN_SETTLE = 0.5  # time a drained server gets to exit by itself before SIGKILL
+DRAIN_POLL = 0.1    # how often connections are counted while servers drain
+
+def _drain_steps(pending, signalled_at, grace_period, kill_timeout, drain, pidfds, port_index, ports, servers,
+                 connections, results, record, escalate, cmd_display, say):
+    """The wait-and-escalate part of _termination_steps() for a connection-draining shutdown.
+
+    servers are the targets that listened on one of `ports`, or had
+    connections to one, when they got SIGTERM. Their established
+    connections on those ports are counted every DRAIN_POLL seconds. A
+    server is SIGKILLed once it has had none for DRAIN_SETTLE seconds, or
+    when `drain` seconds have passed since SIGTERM, whichever comes first.
+    Other targets get the usual grace period. Each process is escalated on
+    its own, so a busy server does not hold back an idle one.
+
+    Server results get 'connections' (open at SIGTERM), 'drain_time'
+    (seconds until none were left) and 'dropped' (open when it was
+    SIGKILLed). A server that exits by itself has dropped none: whatever
+    it still had open, it closed itself. Its drain_time runs to the count
+    that first found it idle, or to its exit if no count did. A SIGKILLed
+    server that never got idle has drain_time None.
+    """
+    open_connections = {pid: connections.get(pid, 0) for pid in servers}
+    drained_at = {}  # server pid -> time.monotonic() its last connection closed
+    killed = {}      # pid -> SIGKILL deadline
+    say(f"{Colors.OKCYAN}  Draining {sum(open_connections.values())} connection(s) "
+        f"of {len(servers)} server(s)...{Colors.ENDC}")
+
+    def deadline(pid):
+        return signalled_at + (drain if pid in servers else grace_period)
+
+    def finish(pid, status, message, exit_time=None):
+        record(pid, status, message, exit_time)
+        if pid in servers:
+            if pid in killed:
+                drained, dropped = drained_at.get(pid), open_connections[pid]
+            else:
+                drained, dropped = drained_at.get(pid, exit_time), 0
+            results[pid].update({'connections': connections.get(pid, 0),
+                                 'drain_time': round(drained - signalled_at, 4) if drained is not None else None,
+                                 'dropped': dropped})
+
+    while pending:
+        now = time.monotonic()
+        counts = port_index.connections([pid for pid in pending if pid in servers and pid not in killed], ports)
+        for pid, count in counts.items():
+            open_connections[pid] = count
+            if count:
+                drained_at.pop(pid, None)
+            else:
+                drained_at.setdefault(pid, now)
+        due = [pid for pid in pending if pid not in killed and (
+            now >= deadline(pid) or (pid in drained_at and now - drained_at[pid] >= DRAIN_SETTLE))]
+        if due:
+            say(f"{Colors.WARNING}  Force killing {len(due)} process(es)...{Colors.ENDC}")
+            signalled = escalate(due, whole_cgroup=len(due) == len(pending))
+            for pid in signalled:
+                killed[pid] = time.monotonic() + kill_timeout
+            pending = [pid for pid in pending if pid not in due or pid in killed]
+            if not pending:
+                break
+
+        # Wake for the next count, deadline or SIGKILL timeout, or as soon as everything has exited
+        wake = [killed[pid] if pid in killed else deadline(pid) for pid in pending]
+        if any(pid in servers and pid not in killed for pid in pending):
+            wake.append(now + DRAIN_POLL)
+        survivors, exited = yield pending, min(wake), pidfds
+        now = time.monotonic()
+        for pid in pending:
+            if pid in exited and pid in killed:
+                finish(pid, 'success_force', f"Process {pid}{cmd_display(pid)} terminated forcefully", exited[pid])
+            elif pid in exited:
+                finish(pid, 'success', f"Process {pid}{cmd_display(pid)} terminated gracefully", exited[pid])
+            elif pid in killed and now >= killed[pid]:
+                finish(pid, 'failed', f"Failed to terminate process {pid}{cmd_display(pid)}")
+        pending = [pid for pid in pending if pid not in results]
+
+def build_process_tree(records):
+    """Group ProcessInfo records by parent PID, returning {ppid: [children]}."""
+    children = {}
+    for info in records:
+        children.setdefault(info.ppid, []).append(info)
+    return children
+
+def process_tree_members(root_pid, records):
+    """Return the root record and all of its descendants, parents before children."""
+    by_pid = {info.pid: info for info in records}
+    if root_pid not in by_pid:
+        return []
+    children = build_process_tree(records)
+    members = [by_pid[root_pid]]
+    index = 0
+    while index < len(members):
+        members.extend(children.get(members[index].pid, ()))
+        index += 1
+    return members
+
+def tree_order(records, sort_column='pid', reverse=False):
+    """Order records so children follow their parent, returning [(info, depth)].
+
+    Records whose parent is not among the given records are roots; siblings
+    are sorted by sort_column.
+    """
+    pids = {info.pid for info in records}
+    children = build_process_tree(records)
+    ordered = []
+    stack = [(info, 0) for info in reversed(sort_processes(
+        [info for info in records if info.ppid not in pids], sort_column, reverse))]
+    while stack:
+        info, depth = stack.pop()
+        ordered.append((info, depth))
+        for child in reversed(sort_processes(children.get(info.pid, []), sort_column, reverse)):
+            stack.append((child, depth + 1))
+    return ordered
+
+def kill_process_tree(root_pid, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, proc_root=PROC_ROOT,
+                      start_time=None):
+    """Tear down a process and all of its descendants in one pass.
+
+    The whole tree is frozen with SIGSTOP from the top down, rescanning
+    until no new children appear, so a supervisor (cluster, pm2, nodemon)
+    cannot respawn workers. Every member then gets SIGTERM from the bottom
+    up, followed by SIGCONT, and all of them share one grace deadline.
+    Returns (result dicts, seconds the teardown took).
+
+    With start_time given, nothing is signalled when the root PID now
+    belongs to a different process; it is reported as already terminated.
+    A tree that holds the calling process is refused with an error result,
+    as freezing it would stop the caller.
+    """
+    started = time.monotonic()
+    try:
+        targets, frozen = _freeze_process_tree(int(root_pid), proc_root, start_time)
+    except ValueError as e:
+        return [{'pid': root_pid, 'command': None, 'status': 'error', 'message': str(e)}], time.monotonic() - started
+    results = terminate_processes(targets, grace_period, kill_timeout, frozen=frozen)
+    return results, time.monotonic() - started
+
+async def kill_process_tree_async(root_pid, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, proc_root=PROC_ROOT,
+                                  start_time=None):
+    """Coroutine version of kill_process_tree()."""
+    started = time.monotonic()
+    try:
+        targets, frozen = _freeze_process_tree(int(root_pid), proc_root, start_time)
+    except ValueError as e:
+        return [{'pid': root_pid, 'command': None, 'status': 'error', 'message': str(e)}], time.monotonic() - started
+    results = await terminate_processes_async(targets, grace_period, kill_timeout, frozen=frozen)
+    return results, time.monotonic() - started
+
+def _freeze_process_tree(root_pid, proc_root, start_time=None):
+    """SIGSTOP a process tree, returning (targets bottom up, whether it was frozen).
+
+    Raises ValueError when the tree holds this process. A root that is gone,
+    or whose start time is not start_time, is returned unfrozen as the only
+    target, so terminate_processes() reports it without signalling it.
+    """
+    if not _use_proc_scanner() and proc_root == PROC_ROOT:
+        # No ppid data here, so only the root itself can be terminated
+        return [(root_pid, None, start_time)], False
+
+    # Held open until the root is stopped, so its PID cannot be reused after the check
+    pidfds = _open_pidfds([root_pid]) if proc_root == PROC_ROOT else {}
+    frozen = {}
+    try:
+        while True:
+            members = process_tree_members(root_pid, scan_processes(proc_root, read_cmdline=False))
+            if not frozen:
+                if not members or start_time is not None and members[0].start_time != start_time:
+                    return [(root_pid, None, start_time)], False
+                if os.getpid() in {info.pid for info in members}:
+                    raise ValueError(f"Process tree {root_pid} contains this process ({os.getpid()}); not terminating it")
+            new_members = [info for info in members if info.pid not in frozen]
+            if not new_members:
+                break
+            for info in new_members:
+                if info.pid in pidfds:
+                    try:
+                        signal.pidfd_send_signal(pidfds[info.pid], signal.SIGSTOP)
+                    except ProcessLookupError:
+                        pass
+                else:
+                    _signal_all([info.pid], signal.SIGSTOP)
+                frozen[info.pid] = info
+    finally:
+        _close_pidfds(pidfds)
+
+    targets = []
+    for info in reversed(list(frozen.values())):
+        try:
+            argv = _parse_cmdline(_read_proc_file(f"{proc_root}/{info.pid}/cmdline"))
+        except OSError:
+            argv = []
+        targets.append((info.pid, ' '.join(argv) if argv else f"[{info.comm}]", info.start_time))
+    return targets, True
+
+def cgroup2_root():
+    """Where the cgroup v2 hierarchy is mounted (/sys/fs/cgroup, or .../unified on hybrid systems)."""
+    try:
+        with open('/proc/self/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) > 2 and fields[2] == 'cgroup2':
+                    return fields[1]
+    except OSError:
+        pass
+    return '/sys/fs/cgroup'
+
+def read_cgroup(pid, proc_root=PROC_ROOT):
+    """The cgroup v2 path of a process, e.g. /system.slice/app.service, or None."""
+    try:
+        data = _read_proc_file(f"{proc_root}/{pid}/cgroup")
+    except OSError:
+        return None
+    for line in data.decode(errors='replace').splitlines():
+        if line.startswith('0::'):
+            return line[3:]
+    return None
+
+def group_by_cgroup(records, proc_root=PROC_ROOT):
+    """Fill in .cgroup on ProcessInfo records and return {cgroup path or None: [records]}."""
+    groups = {}
+    for info in records:
+        info.cgroup = read_cgroup(info.pid, proc_root)
+        groups.setdefault(info.cgroup, []).append(info)
+    return groups
+
+def _write_cgroup(directory, name, value):
+    """Write a cgroup control file, returning False when that is not possible."""
+    try:
+        fd = os.open(f"{directory}/{name}", os.O_WRONLY)
+    except OSError:
+        return False
+    try:
+        os.write(fd, value.encode())
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+def _cgroup_members(directory):
+    """PIDs in a cgroup and all of its descendants."""
+    members = set()
+    for path, _, files in os.walk(directory):
+        if 'cgroup.procs' in files:
+            try:
+                members.update(int(pid) for pid in _read_proc_file(path + '/cgroup.procs', table=True).split())
+            except OSError:
+                pass  # removed while walking
+    return members
+
+def _cgroup_directory(path, proc_root, cgroup_root):
+    """The directory of a cgroup that may be frozen and killed by us, or None."""
+    if not path or path == '/':
+        return None
+    # Never the cgroup this script runs in, or one above it
+    own = read_cgroup(os.getpid(), proc_root)
+    if own is not None and (own + '/').startswith(path.rstrip('/') + '/'):
+        return None
+    directory = cgroup_root.rstrip('/') + path
+    if all(os.access(f"{directory}/{name}", os.W_OK) for name in ('cgroup.freeze', 'cgroup.kill')):
+        return directory
+    return None
+
+async def _freeze_cgroup(directory, timeout=0.1):
+    """Freeze a cgroup and wait (up to timeout) for the kernel to report it frozen."""
+    import asyncio
+    if not _write_cgroup(directory, 'cgroup.freeze', '1'):
+        return False
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if 'frozen 1' in _read_proc_file(directory + '/cgroup.events').decode():
+                break
+        except OSError:
+            break  # no events file to wait on
+        await asyncio.sleep(0.002)
+    return True
+
+async def terminate_cgroups_async(records, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, verbose=False,
+                                  proc_root=PROC_ROOT, cgroup_root=None, drain=None):
+    """Terminate ProcessInfo records, taking down whole cgroups where that is safe.
+
+    A cgroup v2 (with its descendants) is used when it holds nothing but
+    the given processes, is writable and does not contain this script.
+    It is frozen so nothing can fork while its member list is read, every
+    member gets SIGTERM, and it is thawed; whatever is left at the grace
+    deadline is killed with one write to cgroup.kill. Everything else is
+    terminated PID by PID. All groups run concurrently. Results come in
+    the order of records, with 'cgroup' set on those handled by a cgroup.
+    drain is passed on to terminate_processes_async().
+    """
+    import asyncio
+    cgroup_root = cgroup2_root() if cgroup_root is None else cgroup_root
+    by_pid = {info.pid: info for info in records}
+    selected = set(by_pid)
+    covered = set()
+    jobs = []
+    paths = []
+    for path in sorted(group_by_cgroup(records, proc_root), key=lambda path: (path is None, len(path or ''))):
+        directory = _cgroup_directory(path, proc_root, cgroup_root)
+        if directory is None or any((path + '/').startswith(used.rstrip('/') + '/') for used in paths):
+            continue  # not usable, or inside a cgroup that is already being taken down
+        if not await _freeze_cgroup(directory):
+            continue
+        # Frozen, the member list cannot change while it is read
+        members = _cgroup_members(directory)
+        if not members or not members <= selected:
+            _write_cgroup(directory, 'cgroup.freeze', '0')
+            continue
+        if verbose:
+            print(f"{Colors.OKCYAN}Froze cgroup {path} ({len(members)} processes){Colors.ENDC}")
+        covered |= members
+        paths.append(path)
+        jobs.append(terminate_processes_async(termination_targets(by_pid[pid] for pid in sorted(members)),
+                                              grace_period, kill_timeout, verbose=verbose, cgroup=directory,
+                                              drain=drain))
+    rest = [info for info in records if info.pid not in covered]
+    if rest:
+        jobs.append(terminate_processes_async(termination_targets(rest), grace_period, kill_timeout, verbose=verbose,
+                                              drain=drain))
+    results = {}
+    for index, group_results in enumerate(await asyncio.gather(*jobs)):
+        for result in group_results:
+            if index < len(paths):
+                result['cgroup'] = paths[index]
+            results[result['pid']] = result
+    return [results[info.pid] for info in records]
+
+def terminate_cgroups(records, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, proc_root=PROC_ROOT,
+                      cgroup_root=None, drain=None):
+    """Blocking version of terminate_cgroups_async(), printing progress."""
+    return _run_async(terminate_cgroups_async(records, grace_period, kill_timeout, True, proc_root, cgroup_root,
+                                              drain))
+
+# How long restart_processes() waits for relaunched servers to be ready
+READY_TIMEOUT = 30.0
+# A server with no ports and no ready pattern counts as up once it has run this long
+READY_SETTLE = 1.0
+
+def capture_process(info, proc_root=PROC_ROOT):
+    """Record what is needed to start a process again, read from /proc.
+
+    Returns a dict with its argv, cwd, environment, listening ports (from
+    info.ports) and the files its stdout and stderr were writing to, if
+    they were regular files. Raises OSError when the process is gone or
+    not ours to inspect.
+    """
+    base = f"{proc_root}/{info.pid}"
+    argv = _parse_cmdline(_read_proc_file(base + '/cmdline'))
+    if not argv:
+        raise OSError(f"process {info.pid} has no command line")
+    # surrogateescape keeps bytes that are not UTF-8 intact for the relaunch
+    environ = _read_proc_file(base + '/environ').decode(errors='surrogateescape')
+    spec = {
+        'pid': info.pid,
+        'command': info.command,
+        'start_time': info.start_time,
+        'argv': argv,
+        'cwd': os.readlink(base + '/cwd'),
+        'environ': dict(entry.split('=', 1) for entry in environ.split('\0') if '=' in entry),
+        'ports': list(info.ports or []),
+    }
+    for fd, name in ((1, 'stdout'), (2, 'stderr')):
+        try:
+            target = os.readlink(f"{base}/fd/{fd}")
+        except OSError:
+            target = None
+        if target != os.devnull and not (target and target.startswith('/') and os.path.isfile(target)):
+            target = None  # a terminal, pipe or deleted file
+        spec[name] = target
+    return spec
+
+def _open_log(path):
+    """Open a file to append a relaunched server's output to, without following a symlink."""
+    return os.fdopen(os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_NOFOLLOW, 0o666), 'ab')
+
+class _Relaunch:
+    """A server started again by restart_processes(), waiting to become ready."""
+    def __init__(self, spec):
+        import subprocess
+        import tempfile
+        self.spec = spec
+        self.tail = ""
+        stdout = stderr = None
+        try:
+            # Output goes back to the files it went to before, or to a new log file only we can read;
+            # a fixed name in the shared temp directory could be planted as a symlink by another user
+            if spec['stdout']:
+                self.log = spec['stdout']
+                stdout = _open_log(self.log)
+            else:
+                fd, self.log = tempfile.mkstemp(prefix=f"node-server-{spec['pid']}-", suffix='.log')
+                stdout = os.fdopen(fd, 'ab')
+            stderr = stdout if spec['stderr'] in (None, spec['stdout']) else _open_log(spec['stderr'])
+            self.position = stdout.tell()
+            self.process = subprocess.Popen(spec['argv'], cwd=spec['cwd'], env=spec['environ'],
+                                            stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr,
+                                            start_new_session=True)  # outlives this script
+        finally:
+            if stderr is not None and stderr is not stdout:
+                stderr.close()
+            if stdout is not None:
+                stdout.close()
+        self.launched_at = time.monotonic()
+
+    def ready(self, listening, pattern=None):
+        """How the server showed it is ready ('port', 'log' or 'running'), or None."""
+        if self.spec['ports']:
+            return 'port' if listening.issuperset(self.spec['ports']) else None
+        if pattern is not None:
+            if self.log == os.devnull:
+                return None
+            with open(self.log, 'rb') as f:
+                f.seek(self.position)
+                data = f.read()
+            self.position += len(data)
+            # Keep the unfinished last line so a match split across reads is still found
+            lines = (self.tail + data.decode(errors='replace')).split('\n')
+            self.tail = lines.pop()
+            return 'log' if any(pattern.search(line) for line in lines) else None
+        return 'running' if time.monotonic() - self.launched_at >= READY_SETTLE else None
+
+def restart_processes(records, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, ready_timeout=READY_TIMEOUT,
+                      ready_pattern=None, proc_root=PROC_ROOT):
+    """Terminate processes and start them again the way they were running (Linux only).
+
+    Each process is captured first (see capture_process()), then all of
+    them are terminated together. A server is relaunched as soon as its
+    ports are released, and counts as ready once it listens on all of
+    them again, or, for servers without ports, once ready_pattern (a
+    compiled regex) shows up in its output. Returns one result dict per
+    record with 'new_pid' and 'downtime', the seconds from the old
+    process's exit to the new one being ready.
+    """
+    results = {}
+    specs = []
+    for info in records:
+        try:
+            specs.append(capture_process(info, proc_root))
+        except OSError as e:
+            results[info.pid] = {'pid': info.pid, 'command': info.command, 'status': 'capture_failed',
+                                 'message': f"Could not capture process {info.pid}: {e}"}
+    if not specs:
+        return [results[info.pid] for info in records]
+
+    print(f"{Colors.OKCYAN}Restarting {len(specs)} process(es)...{Colors.ENDC}")
+    down_at = {}
+    for result in terminate_processes([(spec['pid'], spec['command'], spec['start_time']) for spec in specs],
+                                      grace_period, kill_timeout):
+        if result['status'] in ('success', 'success_force', 'already_terminated'):
+            # A process that was gone before it could be signalled has no exit time; count from now
+            down_at[result['pid']] = result.get('exited_at', time.monotonic())
+        else:
+            results[result['pid']] = dict(result, status='kill_failed')
+
+    pending = [spec for spec in specs if spec['pid'] in down_at]
+    launched = []
+    port_index = PortIndex(proc_root)
+    deadline = time.monotonic() + ready_timeout
+    while pending or launched:
+        listening = set(port_index._listening_inodes().values())
+        # Relaunch every server whose ports are free, all in the same pass
+        for spec in [spec for spec in pending if listening.isdisjoint(spec['ports'])]:
+            pending.remove(spec)
+            try:
+                launched.append(_Relaunch(spec))
+            except OSError as e:
+                results[spec['pid']] = {'pid': spec['pid'], 'command': spec['command'], 'status': 'launch_failed',
+                                        'message': f"Could not start {spec['command']}: {e}"}
+        now = time.monotonic()
+        for relaunch in list(launched):
+            spec = relaunch.spec
+            result = {'pid': spec['pid'], 'command': spec['command'], 'new_pid': relaunch.process.pid,
+                      'ports': spec['ports'], 'log': relaunch.log}
+            ready = relaunch.ready(listening, ready_pattern) if relaunch.process.poll() is None else None
+            see = f"; see {relaunch.log}" if relaunch.log != os.devnull else ""
+            if ready is not None:
+                downtime = round(now - down_at[spec['pid']], 3)
+                result.update(status='restarted', ready=ready, downtime=downtime,
+                              message=f"Process {spec['pid']} restarted as {relaunch.process.pid} ({downtime:.2f}s down)")
+            elif relaunch.process.returncode is not None:
+                result.update(status='exited', message=f"Restarted process {relaunch.process.pid} exited with "
+                                                       f"status {relaunch.process.returncode}{see}")
+            elif now >= deadline:
+                result.update(status='not_ready', message=f"Restarted process {relaunch.process.pid} was not "
+                                                          f"ready after {ready_timeout:g}s{see}")
+            else:
+                continue
+            results[spec['pid']] = result
+            launched.remove(relaunch)
+        if now >= deadline:
+            for spec in pending:
+                results[spec['pid']] = {'pid': spec['pid'], 'command': spec['command'], 'status': 'port_busy',
+                                        'message': f"Port {', '.join(map(str, spec['ports']))} was not released; "
+                                                   f"process {spec['pid']} was not started again"}
+            break
+        if pending or launched:
+            time.sleep(0.05)
+    return [results[info.pid] for info in records]
+
+def process_exists(pid):
+    """Check if a process with given PID exists."""
+    try:
+        if sys.platform == 'win32':
+            import subprocess
+            cmd = f'tasklist /FI "PID eq {pid}" /FO CSV /NH'
+            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            return str(pid) in result.stdout
+        else:
+            os.kill(pid, 0)  # Signal 0 doesn't kill but checks existence
+            if _use_proc_scanner():
+                # A zombie has already exited and is only waiting to be reaped
+                _, fields = _parse_stat(_read_proc_file(f"{PROC_ROOT}/{pid}/stat"))
+                return fields[0] != b'Z'
+            return True
+    except:
+        return False
+
+def _drain_summary(result):
+    """The connection counts of a draining shutdown's result, as a suffix for its report line."""
+    if 'connections' not in result:
+        return ""
+    text = f", {result['connections']} connection(s) open at SIGTERM"
+    if result['drain_time'] is not None:
+        text += f", drained in {result['drain_time']:.2f}s"
+    if result['dropped']:
+        text += f", {result['dropped']} dropped by SIGKILL"
+    return text
+
+def termination_report_lines(results):
+    """Build the termination report as a list of lines."""
+    lines = []
+    if not results:
+        lines.append(f"{Colors.WARNING}No processes were terminated.{Colors.ENDC}")
+        return lines
+    
+    lines += ["", f"{Colors.BOLD}{Colors.HEADER}=== TERMINATION REPORT ==={Colors.ENDC}"]
+    
+    # Count results by status
+    success_count = sum(1 for r in results if r['status'] in ['success', 'success_force'])
+    failed_count = sum(1 for r in results if r['status'] in ['failed', 'error'])
+    already_terminated_count = sum(1 for r in results if r['status'] == 'already_terminated')
+    
+    # Show summary
+    lines.append(f"{Colors.OKCYAN}Total processes: {len(results)}{Colors.ENDC}")
+    lines.append(f"{Colors.OKGREEN}Successfully terminated: {success_count}{Colors.ENDC}")
+    lines.append(f"{Colors.FAIL}Failed to terminate: {failed_count}{Colors.ENDC}")
+    lines.append(f"{Colors.WARNING}Already terminated: {already_terminated_count}{Colors.ENDC}")
+    
+    # Show successful terminations
+    successful = [r for r in results if r['status'] in ['success', 'success_force']]
+    if successful:
+        lines += ["", f"{Colors.BOLD}{Colors.OKGREEN}SUCCESSFULLY TERMINATED:{Colors.ENDC}"]
+        for result in successful:
+            cmd_display = f" ({result['command']})" if result['command'] else ""
+            status_msg = "gracefully" if result['status'] == 'success' else "forcefully"
+            exit_display = f" in {result['exit_time'] * 1000:.0f} ms" if result.get('exit_time') is not None else ""
+            lines.append(f"{Colors.OKGREEN}  PID {result['pid']}{cmd_display} - terminated {status_msg}{exit_display}"
+                         f"{_drain_summary(result)}{Colors.ENDC}")
+    
+    # Show failed terminations
+    failed = [r for r in results if r['status'] in ['failed', 'error']]
+    if failed:
+        lines += ["", f"{Colors.BOLD}{Colors.FAIL}FAILED TO TERMINATE:{Colors.ENDC}"]
+        for result in failed:
+            cmd_display = f" ({result['command']})" if result['command'] else ""
+            lines.append(f"{Colors.FAIL}  PID {result['pid']}{cmd_display} - {result['message']}"
+                         f"{_drain_summary(result)}{Colors.ENDC}")
+    
+    # Show already terminated
+    already = [r for r in results if r['status'] == 'already_terminated']
+    if already:
+        lines += ["", f"{Colors.BOLD}{Colors.WARNING}ALREADY TERMINATED:{Colors.ENDC}"]
+        for result in already:
+            cmd_display = f" ({result['command']})" if result['command'] else ""
+            lines.append(f"{Colors.WARNING}  PID {result['pid']}{cmd_display} - was already terminated{Colors.ENDC}")
+    return lines
+
+def display_termination_report(results):
+    """Display a report of termination results."""
+    print("\n".join(termination_report_lines(results)))
+
+_ANSI_ESCAPE = re.compile(r'\033\[[0-9;?]*[A-Za-z]')
+
+def visible_len(text):
+    """Length of a string as shown on screen, ignoring ANSI escape codes."""
+    return len(_ANSI_ESCAPE.sub('', text))
+
+class ScreenRenderer:
+    """Draws full-screen frames, sending only the lines that changed since the last one.
+
+    Each frame goes out as a single buffered write using ANSI cursor
+    movement, so no `clear` subprocess is needed and an unchanged frame
+    writes nothing at all.
+    """
+    CLEAR = '\033[H\033[2J'
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.previous = None  # lines of the frame currently on screen
+        self.bytes_written = 0
+        if sys.platform == 'win32':
+            os.system('')  # turns on ANSI escape processing in the Windows console
+
+    def invalidate(self):
+        """Force the next frame to be drawn in full, e.g. after other output."""
+        self.previous = None
+
+    def fit(self, lines, footer=0, height=None):
+        """Clip a frame to the terminal height, always keeping the last `footer` lines."""
+        if height is None:
+            import shutil
+            height = shutil.get_terminal_size().lines
+        if len(lines) <= height:
+            return lines
+        keep = max(height - footer - 1, 0)
+        hidden = len(lines) - footer - keep
+        return lines[:keep] + [f"{Colors.WARNING}... {hidden} more lines{Colors.ENDC}"] + lines[len(lines) - footer:]
+
+    def frame_output(self, lines):
+        """Return the escape sequence that turns the previous frame into `lines`."""
+        if self.previous is None:
+            return self.CLEAR + '\n'.join(lines)
+        previous = self.previous
+        out = []
+        for row, line in enumerate(lines):
+            if row >= len(previous) or previous[row] != line:
+                out.append(f"\033[{row + 1};1H{line}\033[K")
+        if len(lines) < len(previous):
+            out.append(f"\033[{len(lines) + 1};1H\033[J")
+        if out and lines:
+            # Leave the cursor at the end of the last line, where the prompt is
+            out.append(f"\033[{len(lines)};{visible_len(lines[-1]) + 1}H")
+        return ''.join(out)
+
+    def render(self, lines, footer=0, height=None):
+        """Draw a frame, clipped to the terminal, with one write and flush."""
+        lines = self.fit(lines, footer, height)
+        output = self.frame_output(lines)
+        self.previous = lines
+        if output:
+            self.stream.write(output)
+            self.stream.flush()
+            self.bytes_written += len(output.encode())
+        return len(output)
+
+class InputHandler:
+    """Handles keyboard input for both Windows and Unix-like systems.
+
+    On Unix the terminal is put into cbreak mode (no line buffering, no echo)
+    once for the whole session, and stdin itself is the descriptor the main
+    loop select()s on. Windows consoles cannot be select()ed, so a reader
+    thread polls msvcrt and wakes the main loop through a socket pair.
+
+    Arrow, Page Up/Down, Home and End keys do not go into the typed command;
+    they are collected in `keys` by name for the caller to act on.
+    """
+    # ANSI sequences (after ESC) of the navigation keys
+    ESCAPE_KEYS = {'[A': 'up', '[B': 'down', '[5~': 'pgup', '[6~': 'pgdn',
+                   '[H': 'home', '[1~': 'home', 'OH': 'home', '[F': 'end', '[4~': 'end', 'OF': 'end'}
+    # msvcrt scan codes of the same keys, sent after a b'\xe0' or b'\x00' prefix
+    WINDOWS_KEYS = {b'H': '[A', b'P': '[B', b'I': '[5~', b'Q': '[6~', b'G': '[H', b'O': '[F'}
+
+    def __init__(self):
+        import codecs
+        import collections
+        self.pending = collections.deque()
+        self.keys = collections.deque()
+        self.escape = None  # escape sequence read so far
+        self.current_input = ""
+        self.running = True
+        self.old_settings = None
+        self.wakeup_reader = None
+        self.wakeup_writer = None
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        
+    def fileno(self):
+        """Descriptor that becomes readable when there is input to process."""
+        if sys.platform == 'win32':
+            return self.wakeup_reader.fileno()
+        return sys.stdin.fileno()
+    
+    def _get_char_windows(self):
+        """Get a single character on Windows."""
+        import msvcrt
+        if msvcrt.kbhit():
+            char = msvcrt.getch()
+            # Handle special keys
+            if char in (b'\xe0', b'\x00'):  # Special key prefix
+                char = msvcrt.getch()  # Get the actual key code
+                sequence = self.WINDOWS_KEYS.get(char)
+                return '\x1b' + sequence if sequence else None
+            return char.decode('utf-8')
+        return None
+    
+    def input_thread(self):
+        """Thread function to handle user input on Windows."""
+        while self.running:
+            char = self._get_char_windows()
+            if char:
+                self.pending.extend(char)
+                self.wakeup_writer.send(b'\0')
+            else:
+                time.sleep(0.02)  # msvcrt offers no way to block on the console
+    
+    def start(self):
+        """Switch the terminal to cbreak mode, or start the Windows input thread."""
+        if sys.platform == 'win32':
+            import socket
+            import threading
+            self.wakeup_reader, self.wakeup_writer = socket.socketpair()
+            self.wakeup_reader.setblocking(False)
+            self.thread = threading.Thread(target=self.input_thread)
+            self.thread.daemon = True
+            self.thread.start()
+        elif os.isatty(sys.stdin.fileno()):
+            import termios
+            import tty
+            self.old_settings = termios.tcgetattr(sys.stdin)
+            tty.setcbreak(sys.stdin.fileno())
+    
+    def stop(self):
+        """Restore the terminal settings and stop the input thread."""
+        self.running = False
+        if self.old_settings is not None:
+            import termios
+            termios.tcsetattr(sys.stdin, termios.TCSADRAIN, self.old_settings)
+            self.old_settings = None
+        if hasattr(self, 'thread') and self.thread.is_alive():
+            self.thread.join(timeout=1)
+        for sock in (self.wakeup_reader, self.wakeup_writer):
+            if sock is not None:
+                sock.close()
+    
+    def _read_available(self):
+        """Move whatever input is waiting into the pending characters."""
+        if sys.platform == 'win32':
+            try:
+                while self.wakeup_reader.recv(4096):
+                    pass
+            except BlockingIOError:
+                pass
+            return
+        import select
+        fd = sys.stdin.fileno()
+        if select.select([fd], [], [], 0)[0]:
+            data = os.read(fd, 4096)
+            if not data:
+                self.pending.append('\x04')  # stdin closed
+            self.pending.extend(self.decoder.decode(data))
+    
+    def process_input(self):
+        """Process input characters and update current_input."""
+        try:
+            self._read_available()
+            while self.pending:
+                char = self.pending.popleft()
+                
+                if self.escape is not None:
+                    # Inside an escape sequence: collect it up to its final character
+                    self.escape += char
+                    if len(self.escape) == 2 and char in '[O':
+                        continue
+                    if len(self.escape) > 2 and not (char.isalpha() or char == '~'):
+                        continue
+                    key = self.ESCAPE_KEYS.get(self.escape[1:])
+                    if key:
+                        self.keys.append(key)
+                    self.escape = None
+                
+                elif char in ('\r', '\n'):  # Enter key
+                    # Return the current input and clear it
+                    cmd = self.current_input
+                    self.current_input = ""
+                    return cmd
+                
+                elif char in ('\x03', '\x04'):  # Ctrl+C, or end of input
+                    return 'q'  # Treat as quit
+                
+                elif char == '\x08' or char == '\x7f':  # Backspace or Delete
+                    # Remove last character
+                    if self.current_input:
+                        self.current_input = self.current_input[:-1]
+                
+                elif char == '\x1b':  # Escape sequence (arrow keys, etc.)
+                    self.escape = char
+                
+                elif ord(char) >= 32:  # Printable characters
+                    # Add character to current input
+                    self.current_input += char
+        except Exception as e:
+            print(f"Error processing input: {e}")
+        
+        return None
+
+class PollingProcessMonitor:
+    """Track Node.js processes by diffing the process table between polls.
+
+    On Linux only the PIDs that appeared since the last poll have their
+    cmdline read; everything else is a cheap directory listing. Other
+    platforms fall back to a full get_node_processes() scan.
+    """
+    # Freshly forked children still carry their parent's cmdline until they
+    # exec, so non-matching PIDs are re-checked for this many seconds
+    RECHECK_WINDOW = 5
+
+    def __init__(self, proc_root=PROC_ROOT):
+        self.proc_root = proc_root
+        self.use_proc = _use_proc_scanner() or proc_root != PROC_ROOT
+        self.tracked = {}      # pid -> ProcessInfo for matching processes
+        self.seen = set()      # every PID present at the last poll
+        self.recheck = {}      # non-matching pid -> time first seen
+
+    def fileno(self):
+        """Polling has no descriptor to wait on."""
+        return None
+
+    def start(self):
+        """Take the initial snapshot and return {pid: ProcessInfo}."""
+        self._rescan()
+        journal.record_processes('running', self.tracked.values())
+        return self.tracked
+
+    def _list_pids(self):
+        with os.scandir(self.proc_root) as entries:
+            return {int(entry.name) for entry in entries if entry.name.isdigit()}
+
+    def _check(self, pid, now):
+        """Read a single PID and start tracking it if it is a Node.js process."""
+        matcher = get_process_matcher()
+        info = read_process_info(pid, self.proc_root, read_exe=matcher.read_exe)
+        if info is not None and matcher.match(info.argv, info.comm, info.exe):
+            self.tracked[pid] = info
+            self.recheck.pop(pid, None)
+            return info
+        if info is not None:
+            self.recheck.setdefault(pid, now)
+        return None
+
+    def poll(self):
+        """Return ([new ProcessInfo], [exited pids]) since the previous poll."""
+        known = dict(self.tracked) if journal.enabled else None
+        new, exited = self._changes()
+        if known is not None:
+            journal.record_processes('start', new)
+            journal.record_processes('exit', [known[pid] for pid in exited if pid in known])
+        return new, exited
+
+    def _changes(self):
+        return self._rescan()
+
+    def _rescan(self):
+        """Diff the process table against the last one."""
+        if not self.use_proc:
+            with profiler.phase('scan'):
+                current = {int(pid): ProcessInfo(int(pid), None, command.split(' ', 1)[0], [command], None)
+                           for pid, command in get_node_processes()}
+            new = [info for pid, info in current.items() if pid not in self.tracked]
+            exited = [pid for pid in self.tracked if pid not in current]
+            self.tracked = current
+            return new, exited
+
+        now = time.monotonic()
+        with profiler.phase('scan'):
+            pids = self._list_pids()
+        with profiler.phase('diff'):
+            exited = [pid for pid in self.tracked if pid not in pids]
+            for pid in exited:
+                del self.tracked[pid]
+            for pid in [pid for pid in self.recheck if pid not in pids]:
+                del self.recheck[pid]
+            appeared = pids - self.seen
+
+        new = []
+        with profiler.phase('match'):
+            for pid in appeared:
+                info = self._check(pid, now)
+                if info is not None:
+                    new.append(info)
+            for pid, first_seen in list(self.recheck.items()):
+                if pid in self.seen and pid not in self.tracked:
+                    if now - first_seen > self.RECHECK_WINDOW:
+                        del self.recheck[pid]
+                    else:
+                        info = self._check(pid, now)
+                        if info is not None:
+                            new.append(info)
+        self.seen = pids
+        return new, exited
+
+    def discard(self, pid):
+        """Stop tracking a PID without reporting it as exited."""
+        self.tracked.pop(int(pid), None)
+
+    def close(self):
+        pass
+
+class NetlinkProcessMonitor(PollingProcessMonitor):
+    """Track Node.js processes from fork/exec/exit events on the netlink proc connector.
+
+    Needs CAP_NET_ADMIN; the constructor raises OSError when the connector
+    cannot be joined so callers can fall back to PollingProcessMonitor.
+    """
+    NETLINK_CONNECTOR = 11
+    CN_IDX_PROC = 1
+    CN_VAL_PROC = 1
+    NLMSG_DONE = 3
+    PROC_CN_MCAST_LISTEN = 1
+    PROC_CN_MCAST_IGNORE = 2
+    PROC_EVENT_FORK = 0x00000001
+    PROC_EVENT_EXEC = 0x00000002
+    PROC_EVENT_EXIT = 0x80000000
+
+    def __init__(self, proc_root=PROC_ROOT):
+        import socket
+        super().__init__(proc_root)
+        if not hasattr(socket, 'AF_NETLINK'):
+            raise OSError("netlink is not available on this platform")
+        # Subscribed here, before start() takes the initial scan, so nothing falls between the two
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, self.NETLINK_CONNECTOR)
+        try:
+            self.sock.bind((0, self.CN_IDX_PROC))
+            self._control(self.PROC_CN_MCAST_LISTEN)
+            self.sock.setblocking(False)
+        except OSError:
+            self.sock.close()
+            raise
+        self.resync = False
+
+    def _control(self, op):
+        """Send a listen/ignore request to the proc connector."""
+        import struct
+        cn_msg = struct.pack('=IIIIHH', self.CN_IDX_PROC, self.CN_VAL_PROC, 0, 0, 4, 0)
+        payload = cn_msg + struct.pack('=I', op)
+        header = struct.pack('=IHHII', 16 + len(payload), self.NLMSG_DONE, 0, 0, 0)
+        self.sock.send(header + payload)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def _read_events(self):
+        """Drain the socket and yield (what, pid, tgid, parent_tgid) tuples."""
+        import struct
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError:
+                # ENOBUFS: the kernel dropped events, rescan to catch up
+                self.resync = True
+                return
+            offset = 0
+            while offset + 16 <= len(data):
+                length = struct.unpack_from('=I', data, offset)[0]
+                if length < 16:
+                    break
+                event = offset + 16 + 20  # skip nlmsghdr and cn_msg
+                if event + 16 <= offset + length:
+                    what = struct.unpack_from('=I', data, event)[0]
+                    body = event + 16
+                    if what == self.PROC_EVENT_FORK:
+                        _, parent_tgid, child_pid, child_tgid = struct.unpack_from('=IIII', data, body)
+                        yield what, child_pid, child_tgid, parent_tgid
+                    elif what in (self.PROC_EVENT_EXEC, self.PROC_EVENT_EXIT):
+                        pid, tgid = struct.unpack_from('=II', data, body)
+                        yield what, pid, tgid, None
+                offset += (length + 3) & ~3
+
+    def _changes(self):
+        """Apply the pending events."""
+        with profiler.phase('events'):
+            return self._apply_events()
+
+    def _apply_events(self):
+        new = {}
+        exited = []
+        now = time.monotonic()
+        for what, pid, tgid, parent in self._read_events():
+            if pid != tgid:
+                continue  # thread events
+            if what == self.PROC_EVENT_EXIT:
+                new.pop(pid, None)
+                if self.tracked.pop(pid, None) is not None:
+                    exited.append(pid)
+            elif what == self.PROC_EVENT_FORK:
+                # A forked child is only node if its parent is; exec catches the rest
+                if parent in self.tracked:
+                    info = self._check(pid, now)
+                    if info is not None:
+                        new[pid] = info
+            else:
+                was_tracked = self.tracked.pop(pid, None) is not None
+                info = self._check(pid, now)
+                if info is not None:
+                    if not was_tracked:
+                        new[pid] = info
+                elif was_tracked:
+                    exited.append(pid)
+        if self.resync:
+            self.resync = False
+            self.seen = set(self.tracked)
+            rescanned_new, rescanned_exited = self._rescan()
+            new.update((info.pid, info) for info in rescanned_new)
+            exited.extend(rescanned_exited)
+        return list(new.values()), exited
+
+    def close(self):
+        try:
+            self._control(self.PROC_CN_MCAST_IGNORE)
+        except OSError:
+            pass
+        self.sock.close()
+
+def open_process_monitor(prefer_events=True, proc_root=PROC_ROOT):
+    """Return the best available process monitor for this system.
+
+    The netlink proc connector is used when it can be joined; otherwise,
+    e.g. without CAP_NET_ADMIN, this falls back to PollingProcessMonitor.
+    """
+    if prefer_events and _use_proc_scanner():
+        try:
+            return NetlinkProcessMonitor(proc_root)
+        except OSError:
+            pass
+    return PollingProcessMonitor(proc_root)
+
+async def watch_processes(interval=2.0, prefer_events=True, proc_root=PROC_ROOT):
+    """Yield ([new ProcessInfo], [exited pids]) on the running loop as processes come and go.
+
+    The first item lists every process already running. With the netlink
+    monitor, changes are yielded as soon as they happen; otherwise the
+    process table is checked every interval seconds.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    monitor = open_process_monitor(prefer_events, proc_root)
+    ready = asyncio.Event()
+    fd = monitor.fileno()
+    try:
+        if fd is not None:
+            loop.add_reader(fd, ready.set)
+        yield list(monitor.start().values()), []
+        while True:
+            try:
+                await asyncio.wait_for(ready.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            ready.clear()
+            started, exited = monitor.poll()
+            if started or exited:
+                yield started, exited
+    finally:
+        if fd is not None:
+            loop.remove_reader(fd)
+        monitor.close()
+
+def _format_command(command, width=60):
+    """Truncate a command line for the process tables."""
+    return command[:width] + '...' if len(command) > width else command
+
+def _format_bytes(size):
+    """Format a byte count the way top does (e.g. 512K, 1.5G)."""
+    for unit in ('B', 'K', 'M', 'G'):
+        if size < 1024 or unit == 'G':
+            return f"{size:.0f}{unit}" if unit in ('B', 'K') else f"{size:.1f}{unit}"
+        size /= 1024
+
+def _format_duration(seconds):
+    """Format an uptime as e.g. 45s, 12m05s, 3h20m or 2d04h."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    if seconds < 86400:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d{seconds % 86400 // 3600:02d}h"
+
+# Columns the process table can be sorted by: name -> (key, descending)
+SORT_COLUMNS = {
+    'pid': (lambda info: info.pid, False),
+    'cpu': (lambda info: info.cpu_percent or 0, True),
+    'rss': (lambda info: info.rss or 0, True),
+    'threads': (lambda info: info.threads or 0, True),
+    'fds': (lambda info: info.fds or 0, True),
+    'uptime': (lambda info: info.uptime or 0, True),
+    'ports': (lambda info: min(info.ports) if info.ports else 65536, False),
+    'command': (lambda info: info.command, False),
+}
+
+def sort_processes(records, column='pid', reverse=False):
+    """Sort ProcessInfo records by one of SORT_COLUMNS, optionally in the opposite order."""
+    key, descending = SORT_COLUMNS[column]
+    return sorted(records, key=key, reverse=descending != reverse)
+
+class ProcessFilter:
+    """Case-insensitive substring filter over PIDs (record keys) and command lines.
+
+    A trigram index is kept up to date as processes come and go, so a
+    query only has to check the PIDs that contain all of its trigrams.
+    While the user keeps typing, each longer query only rechecks the
+    matches of the previous one.
+    """
+    def __init__(self):
+        self.texts = {}     # key -> "key command", lowercased
+        self.commands = {}  # key -> the command string that was indexed
+        self.trigrams = {}  # trigram -> set of keys
+        self.last_query = None
+        self.last_matches = None
+
+    def _grams(self, text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def add(self, pid, command):
+        text = f"{pid} {command}".lower()
+        if self.texts.get(pid) == text:
+            return
+        self.remove(pid)
+        self.texts[pid] = text
+        self.commands[pid] = command
+        for gram in self._grams(text):
+            self.trigrams.setdefault(gram, set()).add(pid)
+        self.last_query = None  # the new process may match
+
+    def remove(self, pid):
+        text = self.texts.pop(pid, None)
+        if text is None:
+            return
+        del self.commands[pid]
+        for gram in self._grams(text):
+            postings = self.trigrams[gram]
+            postings.discard(pid)
+            if not postings:
+                del self.trigrams[gram]
+        if self.last_matches is not None:
+            self.last_matches.discard(pid)
+
+    def update(self, records):
+        """Index new ProcessInfo records, re-index those whose command changed, and drop the ones that are gone."""
+        current = {info.key for info in records}
+        for key in [key for key in self.texts if key not in current]:
+            self.remove(key)
+        commands = self.commands
+        for info in records:
+            # Commands are interned, so an unchanged one is usually the same object
+            if commands.get(info.key) != info.command:
+                self.add(info.key, info.command)
+
+    def matches(self, query):
+        """Return the set of keys whose "key command" contains query."""
+        query = query.lower()
+        if self.last_query is not None and query.startswith(self.last_query):
+            candidates = self.last_matches
+        elif len(query) >= 3:
+            postings = sorted((self.trigrams.get(gram, set()) for gram in self._grams(query)), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+        else:
+            candidates = self.texts
+        texts = self.texts
+        matches = {pid for pid in candidates if query in texts[pid]}
+        self.last_query, self.last_matches = query, matches
+        return matches
+
+class TableViewport:
+    """Scroll position, cursor and marked rows of the live monitor's table.
+
+    Only the rows inside the viewport are formatted. The cursor is an
+    index into the rows currently shown (after filtering and sorting);
+    marks are kept by record key so they survive re-sorting.
+    """
+    def __init__(self):
+        self.offset = 0
+        self.cursor = 0
+        self.page = 10  # rows that fit on screen, set by the last frame
+        self.marked = set()
+
+    def move(self, key):
+        """Move the cursor for a navigation key name from InputHandler."""
+        step = {'up': -1, 'down': 1, 'pgup': -self.page, 'pgdn': self.page}.get(key)
+        if step is not None:
+            self.cursor += step
+        elif key == 'home':
+            self.cursor = 0
+        elif key == 'end':
+            self.cursor = 1 << 30  # clamped by window()
+
+    def window(self, total, page):
+        """Clamp the cursor and scroll it into view, returning (start, end) row indices."""
+        self.page = max(page, 1)
+        self.cursor = max(0, min(self.cursor, total - 1))
+        if self.cursor < self.offset:
+            self.offset = self.cursor
+        elif self.cursor >= self.offset + self.page:
+            self.offset = self.cursor - self.page + 1
+        self.offset = max(0, min(self.offset, total - self.page))
+        return self.offset, min(self.offset + self.page, total)
+
+HISTORY_WINDOW = 36   # samples kept per process, one per refresh (72 s in the live monitor)
+SPARKLINE_WIDTH = 12  # characters per sparkline; each covers HISTORY_WINDOW / SPARKLINE_WIDTH samples
+SPARK_BLOCKS = '▁▂▃▄▅▆▇█'
+
+class MetricHistory:
+    """Ring buffers of CPU% and RSS samples per process, for sparklines.
+
+    Every process gets a slot of `window` samples in two flat float arrays,
+    so recording a sample is one store per metric and no object is created
+    per sample. All processes are sampled on the same tick, so one shared
+    tick counter is the write position of every ring. A process's slot is
+    freed when it stops showing up and reused by the next new one; memory
+    is bounded by the most processes seen at once times the window.
+    """
+    def __init__(self, window=HISTORY_WINDOW):
+        import array
+        self.window = window
+        self.tick = 0
+        self.slots = {}  # record key -> [slot, first tick, start_time]
+        self.free = []   # slots of processes that have exited
+        self.blank = array.array('f', bytes(4 * window))
+        self.cpu = array.array('f')
+        self.rss = array.array('f')
+
+    def record(self, records):
+        """Store one sample of every record, and free the slots of processes not among them."""
+        position = self.tick % self.window
+        seen = set()
+        for info in records:
+            key = info.key
+            entry = self.slots.get(key)
+            if entry is None:
+                if self.free:
+                    slot = self.free.pop()
+                else:
+                    slot = len(self.cpu) // self.window
+                    self.cpu.extend(self.blank)
+                    self.rss.extend(self.blank)
+                entry = self.slots[key] = [slot, self.tick, info.start_time]
+            elif entry[2] != info.start_time:
+                entry[1:] = [self.tick, info.start_time]  # the PID was reused; start over
+            offset = entry[0] * self.window + position
+            self.cpu[offset] = info.cpu_percent or 0.0
+            self.rss[offset] = info.rss or 0
+            seen.add(key)
+        if len(seen) != len(self.slots):
+            for key in [key for key in self.slots if key not in seen]:
+                self.free.append(self.slots.pop(key)[0])
+        self.tick += 1
+
+    def samples(self, key, metric='cpu'):
+        """A process's samples of 'cpu' or 'rss', oldest first."""
+        entry = self.slots.get(key)
+        if entry is None:
+            return []
+        data = self.cpu if metric == 'cpu' else self.rss
+        start = entry[0] * self.window
+        ring = data[start:start + self.window]
+        position = self.tick % self.window
+        count = min(self.tick - entry[1], self.window)
+        return (ring[position:] + ring[:position])[self.window - count:].tolist()
+
+    def sparkline(self, key, metric='cpu', width=SPARKLINE_WIDTH):
+        """Draw a process's history as block characters, right-aligned in width.
+
+        Samples are grouped to fit the width, keeping the peak of each group
+        so short spikes still show. CPU is scaled from 0 to 100% (or to the
+        peak, on several cores); RSS from its lowest to its highest sample,
+        so steady growth stands out.
+        """
+        values = self.samples(key, metric)
+        per_char = max(self.window // width, 1)
+        # Grouped from the newest sample back, so the last character is always current
+        groups = [values[max(end - per_char, 0):end] for end in range(len(values), 0, -per_char)]
+        values = [max(group) for group in reversed(groups)]
+        if not values:
+            return ' ' * width
+        if metric == 'cpu':
+            low, high = 0.0, max(max(values), 100.0)
+        else:
+            low, high = min(values), max(values)
+        if high - low < (1 << 20 if metric == 'rss' else 1):
+            line = SPARK_BLOCKS[0] * len(values)  # flat: less than 1 MiB of movement
+        else:
+            scale = (len(SPARK_BLOCKS) - 1) / (high - low)
+            line = ''.join(SPARK_BLOCKS[int((value - low) * scale)] for value in values)
+        return line[-width:].rjust(width)
+
+def _format_ports(ports):
+    """Format listening ports as ':3000,:3001', shortened to fit the column."""
+    text = ','.join(f":{port}" for port in ports) or '-'
+    return text if len(text) <= 12 else text[:11] + '+'
+
+def _format_metric(value, formatter):
+    return '-' if value is None else formatter(value)
+
+def process_table_lines(records, depths=None, marked=None, cursor=None, width=None, history=None):
+    """Build the header and rows of the process table with resource columns.
+
+    depths maps PIDs to their level in the process tree; children are
+    indented under their parent. With marked given (a set of record keys)
+    the rows get a selection column, and the row whose key is cursor is
+    highlighted. With width given, command lines are cut to fit instead
+    of at 60 characters. Records from agents get a HOST column. With a
+    MetricHistory given, CPU and RSS sparklines are shown before the
+    command, unless that would leave it less than 20 columns.
+    """
+    select = marked is not None
+    hosts = max((max(len(info.host), 4) for info in records if info.host is not None), default=0)
+    host_column = f"{'HOST':<{hosts}} " if hosts else ''
+    extra = len(host_column) + 2 * select
+    if history is not None and width is not None and width - 60 - extra - 2 * (SPARKLINE_WIDTH + 1) < 20:
+        history = None
+    trend_column = f"{'CPU% trend':<{SPARKLINE_WIDTH}} {'RSS trend':<{SPARKLINE_WIDTH}} " if history is not None else ''
+    extra += len(trend_column)
+    lines = [f"{Colors.OKCYAN}{'  ' if select else ''}{host_column}{'PID':<8} {'CPU%':>6} {'RSS':>8} {'THR':>4} {'FDS':>5} {'UPTIME':>7} {'Ports':<12} {trend_column}{'Command'}{Colors.ENDC}",
+             f"{Colors.OKCYAN}{'-' * (93 + extra)}{Colors.ENDC}"]
+    for info in records:
+        cpu = _format_metric(info.cpu_percent, lambda v: f"{v:.1f}")
+        rss = _format_metric(info.rss, _format_bytes)
+        threads = _format_metric(info.threads, str)
+        fds = _format_metric(info.fds, str)
+        uptime = _format_metric(info.uptime, _format_duration)
+        ports = _format_metric(info.ports, _format_ports)
+        depth = depths.get(info.pid, 0) if depths else 0
+        branch = '  ' * (depth - 1) + '└─ ' if depth else ''
+        # 57 columns before the command, 3 more for the '...' of a cut command
+        command = _format_command(info.command, max(width - 60 - extra - len(branch), 10) if width else 60)
+        trends = (f"{history.sparkline(info.key, 'cpu')} {history.sparkline(info.key, 'rss')} "
+                  if history is not None else '')
+        row = (f"{info.pid:<8} {cpu:>6} {rss:>8} {threads:>4} {fds:>5} {uptime:>7} {ports:<12} "
+               f"{trends}{branch}{command}")
+        if hosts:
+            row = f"{info.host or '':<{hosts}} " + row
+        if select:
+            row = ('* ' if info.key in marked else '  ') + row
+        if info.key == cursor:
+            lines.append(f"{Colors.OKCYAN}{Colors.REVERSE}{row}{Colors.ENDC}")
+        else:
+            lines.append(f"{Colors.OKCYAN}{row}{Colors.ENDC}")
+    return lines
+
+def _command_reference_lines(commands):
+    """Build the AVAILABLE COMMANDS box for the given (key, colour, description) rows."""
+    lines = ["", f"{Colors.BOLD}{Colors.HEADER}{'='*50}{Colors.ENDC}",
+             f"{Colors.BOLD}{Colors.OKCYAN}AVAILABLE COMMANDS:{Colors.ENDC}"]
+    for key, color, description in commands:
+        lines.append(f"{Colors.OKCYAN}  {key:<12}- {color}{description}{Colors.ENDC}")
+    lines.append(f"{Colors.BOLD}{Colors.HEADER}{'='*50}{Colors.ENDC}")
+    return lines
+
+MONITOR_COMMANDS = [
+    ('k', Colors.WARNING, "Kill all processes"),
+    ('k <pid>', Colors.WARNING, "Kill process with specified PID"),
+    ('k :<port>', Colors.WARNING, "Kill processes listening on a port"),
+    ('kt <pid>', Colors.WARNING, "Kill a process and its whole tree"),
+    ('km', Colors.WARNING, "Kill the marked processes"),
+    ('m [<pid>..]', Colors.OKBLUE, "Mark/unmark the cursor row or PIDs (m * all shown, m - none)"),
+    ('/<text>', Colors.OKBLUE, "Filter as you type (/ alone clears)"),
+    ('t', Colors.OKBLUE, "Toggle process tree view"),
+    ('s <column>', Colors.OKBLUE, "Sort by " + "/".join(SORT_COLUMNS) + " (again to reverse)"),
+    ('r', Colors.OKBLUE, "Refresh process list"),
+    ('h', Colors.OKBLUE, "Show this help"),
+    ('q', Colors.WARNING, "Quit monitoring mode"),
+]
+TERMINATION_REPORT_COMMANDS = [
+    ('r', Colors.OKBLUE, "Return to monitoring now"),
+    ('h', Colors.OKBLUE, "Show this help"),
+    ('q', Colors.WARNING, "Quit monitoring mode"),
+]
+# Lines at the bottom of each screen that stay visible when the frame is clipped
+MONITOR_FOOTER = len(MONITOR_COMMANDS) + 5
+TERMINATION_REPORT_FOOTER = len(TERMINATION_REPORT_COMMANDS) + 5
+MESSAGE_LINES = 2  # added to the footer while a message is shown
+EVENT_LIST_LIMIT = 10  # new/terminated processes listed per frame
+MIN_TABLE_ROWS = 5  # below this the command box is folded into one line
+MENU_LINES = 16  # lines main() prints around the process table, besides the header box
+
+def monitor_frame_lines(current_processes, new_processes, terminated_pids, message, current_input,
+                        sort_column='pid', depths=None, overlay=None, viewport=None, size=None, total=None,
+                        filter_text="", agents=None, history=None):
+    """Build one live monitoring screen as a list of lines.
+
+    current_processes is a list of ProcessInfo records, already sorted; with
+    depths given they are in tree order (see tree_order()). overlay lines,
+    e.g. the profiler's timings, are shown under the status line.
+
+    With a TableViewport and the terminal size (columns, lines) given, only
+    the rows that fit on screen are formatted, and the viewport's page size
+    is updated. total is the process count before filtering. agents maps
+    each agent's name to its connection status in the fleet view. With a
+    MetricHistory, the rows get CPU and RSS sparklines.
+    """
+    lines = header_lines()
+    
+    # Display status
+    total = len(current_processes) if total is None else total
+    status = f"Monitoring {total} Node.js processes (sorted by {sort_column})"
+    if filter_text:
+        status += f", {len(current_processes)} matching '{filter_text}'"
+    if agents is not None:
+        up = sum(1 for state in agents.values() if state == 'up')
+        status += f" on {up}/{len(agents)} agents"
+    lines += ["", f"{Colors.BOLD}{Colors.HEADER}=== LIVE MONITORING MODE ==={Colors.ENDC}",
+              f"{Colors.OKCYAN}{status}{Colors.ENDC}"]
+    if agents is not None:
+        lines += [f"{Colors.WARNING}Agent {name}: {state}{Colors.ENDC}"
+                  for name, state in agents.items() if state != 'up']
+    if overlay:
+        lines += [""] + overlay
+    
+    # Show new processes
+    if new_processes:
+        lines += ["", f"{Colors.BOLD}{Colors.OKGREEN}NEW PROCESSES DETECTED:{Colors.ENDC}",
+                  f"{Colors.OKCYAN}{'PID':<8} {'Command'}{Colors.ENDC}",
+                  f"{Colors.OKCYAN}{'-' * 50}{Colors.ENDC}"]
+        for pid, command in list(new_processes.items())[:EVENT_LIST_LIMIT]:
+            lines.append(f"{Colors.OKCYAN}{pid:<8} {_format_command(command)}{Colors.ENDC}")
+        if len(new_processes) > EVENT_LIST_LIMIT:
+            lines.append(f"{Colors.OKCYAN}... and {len(new_processes) - EVENT_LIST_LIMIT} more{Colors.ENDC}")
+    
+    # Show terminated processes
+    if terminated_pids:
+        lines += ["", f"{Colors.BOLD}{Colors.FAIL}PROCESSES TERMINATED:{Colors.ENDC}"]
+        for pid in list(terminated_pids)[:EVENT_LIST_LIMIT]:
+            lines.append(f"{Colors.FAIL}  PID {pid}{Colors.ENDC}")
+        if len(terminated_pids) > EVENT_LIST_LIMIT:
+            lines.append(f"{Colors.FAIL}  ... and {len(terminated_pids) - EVENT_LIST_LIMIT} more{Colors.ENDC}")
+    
+    # Show message if recent, just above the commands so it is never clipped
+    footer = ["", message] if message else []
+    
+    # Always show command reference, then the prompt with current input
+    commands = _command_reference_lines(MONITOR_COMMANDS)
+    prompt = ["", f"{Colors.BOLD}Enter command: {Colors.ENDC}{current_input}"]
+    
+    # Show all current processes
+    lines += ["", f"{Colors.BOLD}{Colors.OKBLUE}CURRENT NODE.JS PROCESSES:{Colors.ENDC}"]
+    if viewport is not None:
+        columns, height = size
+        # Table header and the position line take three rows
+        room = height - len(lines) - len(footer) - len(commands) - len(prompt) - 3
+        if room < MIN_TABLE_ROWS:
+            # Short terminal: trade the command box for table rows
+            commands = ["", f"{Colors.OKCYAN}Commands: {', '.join(key for key, _, _ in MONITOR_COMMANDS)}{Colors.ENDC}"]
+            room = height - len(lines) - len(footer) - len(commands) - len(prompt) - 3
+    if not current_processes:
+        lines.append(f"{Colors.WARNING}No Node.js processes running{' that match' if filter_text else ''}.{Colors.ENDC}")
+    elif viewport is None:
+        lines += process_table_lines(current_processes, depths, history=history)
+    else:
+        start, end = viewport.window(len(current_processes), room)
+        cursor = current_processes[viewport.cursor].key
+        lines += process_table_lines(current_processes[start:end], depths, viewport.marked, cursor, columns - 1,
+                                     history)
+        marked = f", {len(viewport.marked)} marked" if viewport.marked else ""
+        lines.append(f"{Colors.OKCYAN}Rows {start + 1}-{end} of {len(current_processes)}{marked}"
+                     f" (Up/Down, PgUp/PgDn, Home/End to move){Colors.ENDC}")
+    
+    return lines + footer + commands + prompt
+
+def termination_report_frame_lines(results, timeout_remaining, message, current_input="", overlay=None):
+    """Build the screen shown after a kill command as a list of lines."""
+    lines = header_lines()
+    lines += ["", f"{Colors.BOLD}{Colors.HEADER}=== LIVE MONITORING MODE ==={Colors.ENDC}",
+              f"{Colors.OKCYAN}Still monitoring - Showing termination report{Colors.ENDC}",
+              f"{Colors.WARNING}Returning to live monitoring in {int(timeout_remaining)} seconds...{Colors.ENDC}"]
+    if overlay:
+        lines += [""] + overlay
+    lines += termination_report_lines(results)
+    if message:
+        lines += ["", message]
+    lines += _command_reference_lines(TERMINATION_REPORT_COMMANDS)
+    lines += ["", f"{Colors.BOLD}Enter command: {Colors.ENDC}{current_input}"]
+    return lines
+
+def _run_async(coroutine):
+    """Run a coroutine to completion on a new event loop.
+
+    Windows' default proactor loop has no add_reader(), so a selector loop
+    is used there.
+    """
+    import asyncio
+    if sys.platform == 'win32':
+        loop = asyncio.SelectorEventLoop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+    return asyncio.run(coroutine)
+
+def live_monitoring_mode(agents=None, token=None, drain=None):
+    """Enter live monitoring mode to continuously watch for Node.js processes.
+
+    With agents given as (name, host, port) tuples, the processes of those
+    `agent` instances are shown instead of the local ones. With drain set,
+    local kills wait for servers' connections to close (see
+    terminate_processes()).
+    """
+    print(f"\n{Colors.OKCYAN}Entering live monitoring mode...{Colors.ENDC}")
+    print(f"\n{Colors.OKGREEN}Starting monitoring... (Press Enter after typing commands){Colors.ENDC}")
+    
+    if agents:
+        monitor = FleetMonitor(agents, token)  # started inside the event loop
+    else:
+        # Track processes through fork/exec/exit events where possible
+        monitor = open_process_monitor()
+        monitor.start()
+    
+    # Create input handler
+    input_handler = InputHandler()
+    input_handler.start()
+    
+    try:
+        _run_async(_live_monitoring(monitor, input_handler, drain))
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Exiting live monitoring mode.{Colors.ENDC}")
+    finally:
+        # Ensure input handler is stopped
+        input_handler.stop()
+        monitor.close()
+
+async def _live_monitoring(monitor, input_handler, drain=None):
+    """Main loop of live monitoring mode.
+
+    Input and process events wake the loop through event loop readers, and
+    kills run as tasks, so the screen keeps updating and taking commands
+    while processes shut down.
+    """
+    import asyncio
+    import shutil
+    loop = asyncio.get_running_loop()
+    new_processes = {}      # pid -> command seen since the last redraw
+    terminated_pids = set()  # pids that exited since the last redraw
+    renderer = ScreenRenderer()
+    sampler = ResourceSampler()
+    port_index = PortIndex()
+    history = MetricHistory()  # CPU and RSS sparklines, one sample per refresh interval
+    wake = asyncio.Event()
+    monitor_ready = asyncio.Event()
+    kills = []  # termination tasks still running
+    fleet = isinstance(monitor, FleetMonitor)
+    lookup = monitor.get if fleet else process_snapshot.get  # "pid" (or "name/pid") -> ProcessInfo
+
+    def on_monitor_event():
+        monitor_ready.set()
+        wake.set()
+
+    def start_kill(coroutine):
+        task = asyncio.ensure_future(coroutine)
+        task.add_done_callback(lambda _: wake.set())
+        kills.append(task)
+
+    def succeeded(results):
+        return sum(1 for r in results if r['status'] in ['success', 'success_force'])
+
+    # Each kill returns (results, color, summary) for the termination report
+    async def kill_targets(targets, where=""):
+        results = await terminate_processes_async(targets, drain=drain)
+        return results, Colors.OKGREEN, f"Terminated {succeeded(results)}/{len(results)} processes{where}."
+
+    async def kill_remote(request, where=""):
+        results = await request
+        return results, Colors.OKGREEN, f"Terminated {succeeded(results)}/{len(results)} processes{where}."
+
+    async def kill_tree(info):
+        target = info.pid
+        results, teardown_time = await kill_process_tree_async(target, start_time=info.start_time)
+        if results[0]['status'] == 'error' and len(results) == 1:
+            return results, Colors.FAIL, results[0]['message']
+        return results, Colors.OKGREEN, f"Tore down tree {target}: {succeeded(results)}/{len(results)} processes in {teardown_time:.2f}s."
+
+    async def kill_one(info):
+        results = await terminate_processes_async([(info.pid, info.command, info.start_time)], drain=drain)
+        if results[0]['status'] in ['success', 'success_force']:
+            return results, Colors.OKGREEN, f"Process {info.pid} terminated successfully."
+        elif results[0]['status'] == 'already_terminated':
+            return results, Colors.WARNING, f"Process {info.pid} was already terminated."
+        return results, Colors.FAIL, f"Failed to terminate process {info.pid}."
+
+    loop.add_reader(input_handler.fileno(), wake.set)
+    monitor_fd = monitor.fileno()
+    if monitor_fd is not None:
+        loop.add_reader(monitor_fd, on_monitor_event)
+    if fleet:
+        monitor.notify = on_monitor_event
+        monitor.start()
+    
+    try:
+        last_refresh = time.time()
+        refresh_interval = 2  # seconds
+        next_history = 0  # samples between refreshes (on process events) are not recorded
+        events_pending = False
+        message = ""
+        drawn_message = ""
+        sort_column = 'pid'
+        sort_reverse = False
+        tree_view = False
+        current_processes = []
+        shown = []              # rows of the table as last drawn, after filtering and sorting
+        viewport = TableViewport()
+        process_filter = ProcessFilter()
+        active_filter = ""
+        message_time = 0
+        show_termination_report = False
+        termination_results = []
+        termination_report_drawn = False
+        termination_report_time = 0
+        termination_report_timeout = 10  # seconds to show termination report before returning to monitoring
+        last_termination_report_draw = 0  # Track when we last drew the termination report
+        
+        while True:
+            current_time = time.time()
+            
+            # Process input
+            previous_input = input_handler.current_input
+            command = input_handler.process_input()
+            input_changed = input_handler.current_input != previous_input
+            while input_handler.keys:
+                viewport.move(input_handler.keys.popleft())
+                input_changed = True
+            
+            if command:
+                if command == 'q':
+                    print(f"\n{Colors.WARNING}Exiting live monitoring mode.{Colors.ENDC}")
+                    break
+                
+                elif command == 'h':
+                    message = f"{Colors.OKBLUE}Help information is always visible at the bottom of the screen.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command == 'r':
+                    message = f"{Colors.OKBLUE}Refreshing process list...{Colors.ENDC}"
+                    message_time = current_time
+                    last_refresh = 0  # Force immediate refresh
+                    show_termination_report = False  # Hide termination report on refresh
+                    termination_report_drawn = False  # Reset termination report state
+                
+                elif command.startswith('s ') or command == 's':
+                    column = command[2:].strip().lower()
+                    if column in SORT_COLUMNS:
+                        # Sorting by the same column again flips the order
+                        sort_reverse = not sort_reverse if column == sort_column else False
+                        sort_column = column
+                        message = f"{Colors.OKBLUE}Sorting by {column}{', reversed' if sort_reverse else ''}.{Colors.ENDC}"
+                    else:
+                        message = f"{Colors.FAIL}Unknown column. Sort by one of: {', '.join(SORT_COLUMNS)}.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command.startswith('/'):
+                    active_filter = command[1:].strip()
+                    viewport.cursor = 0
+                    if active_filter:
+                        message = f"{Colors.OKBLUE}Showing processes matching '{active_filter}'.{Colors.ENDC}"
+                    else:
+                        message = f"{Colors.OKBLUE}Filter cleared.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command == 'm' or command.startswith('m '):
+                    # Mark rows for a batch kill with km
+                    arguments = command[2:].split()
+                    if arguments == ['-']:
+                        viewport.marked.clear()
+                    elif arguments == ['*']:
+                        viewport.marked.update(info.key for info in shown)
+                    elif not arguments:
+                        if shown:
+                            viewport.marked ^= {shown[min(viewport.cursor, len(shown) - 1)].key}
+                    else:
+                        unknown = [arg for arg in arguments if lookup(arg) is None]
+                        if unknown:
+                            message = f"{Colors.FAIL}PID {', '.join(unknown)} not found in current processes.{Colors.ENDC}"
+                            message_time = current_time
+                            continue
+                        viewport.marked ^= {lookup(arg).key for arg in arguments}
+                    message = f"{Colors.OKBLUE}{len(viewport.marked)} processes marked.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command == 'km':
+                    marked = [lookup(key) for key in sorted(viewport.marked)]
+                    marked = [info for info in marked if info is not None]
+                    viewport.marked.clear()
+                    if not marked:
+                        message = f"{Colors.FAIL}No processes are marked; mark rows with m first.{Colors.ENDC}"
+                        message_time = current_time
+                        continue
+                    
+                    message = f"{Colors.WARNING}Terminating {len(marked)} marked processes...{Colors.ENDC}"
+                    message_time = current_time
+                    if fleet:
+                        start_kill(kill_remote(monitor.kill_records(marked), " (marked)"))
+                    else:
+                        start_kill(kill_targets(termination_targets(marked), " (marked)"))
+                
+                elif fleet and (command in ('t', 'kt') or command.startswith('kt ')):
+                    # Process trees do not span hosts, and PIDs repeat between them
+                    message = f"{Colors.FAIL}Process trees are not available in the fleet view.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command == 't':
+                    tree_view = not tree_view
+                    message = f"{Colors.OKBLUE}Tree view {'on' if tree_view else 'off'}.{Colors.ENDC}"
+                    message_time = current_time
+                
+                elif command.startswith('kt ') or command == 'kt':
+                    # Kill a process together with all of its descendants
+                    target = command[3:].strip()
+                    info = process_snapshot.get(target)
+                    if info is None:
+                        message = f"{Colors.FAIL}PID {target} not found in current processes.{Colors.ENDC}"
+                        message_time = current_time
+                        continue
+                    
+                    message = f"{Colors.WARNING}Tearing down tree {target}...{Colors.ENDC}"
+                    message_time = current_time
+                    start_kill(kill_tree(info))
+                
+                elif command == 'k':
+                    # Kill all processes
+                    node_processes = monitor.records() if fleet else process_snapshot.records()
+                    
+                    message = f"{Colors.WARNING}Terminating all {len(node_processes)} Node.js processes...{Colors.ENDC}"
+                    message_time = current_time
+                    if fleet:
+                        start_kill(kill_remote(monitor.kill_all()))
+                    else:
+                        start_kill(kill_targets(termination_targets(node_processes)))
+                
+                elif command.startswith('k '):
+                    # Kill specific process
+                    target = command[2:].strip()
+                    
+                    # Check if user tried to use "k all"
+                    if target == 'all':
+                        message = f"{Colors.FAIL}Use 'k' to kill all processes, not 'k all'.{Colors.ENDC}"
+                        message_time = current_time
+                        continue
+                    
+                    port = parse_port(target)
+                    if port is not None and fleet:
+                        # Every agent looks the port up itself, so all of them are asked
+                        message = f"{Colors.WARNING}Terminating processes on :{port} on {len(monitor.agents)} agents...{Colors.ENDC}"
+                        message_time = current_time
+                        start_kill(kill_remote(monitor.kill_port(port), f" on :{port}"))
+                        continue
+                    if port is not None:
+                        # Kill whatever is listening on the port
+                        node_processes = process_snapshot.records()
+                        port_index.update(node_processes)
+                        port_targets = termination_targets(
+                            process_snapshot.by_pid[pid] for pid in port_index.pids_for_port(port))
+                        if not port_targets:
+                            message = f"{Colors.FAIL}No Node.js process is listening on :{port}.{Colors.ENDC}"
+                            message_time = current_time
+                            continue
+                        
+                        message = f"{Colors.WARNING}Terminating {len(port_targets)} processes on :{port}...{Colors.ENDC}"
+                        message_time = current_time
+                        start_kill(kill_targets(port_targets, f" on :{port}"))
+                        continue
+                    
+                    info = lookup(target)
+                    
+                    if info is not None:
+                        message = f"{Colors.WARNING}Terminating process {target}...{Colors.ENDC}"
+                        message_time = current_time
+                        start_kill(kill_remote(monitor.kill_records([info])) if fleet else kill_one(info))
+                    else:
+                        message = f"{Colors.FAIL}PID {target} not found in current processes.{Colors.ENDC}"
+                        message_time = current_time
+                
+                else:
+                    message = f"{Colors.FAIL}Invalid command. See available commands at the bottom of the screen.{Colors.ENDC}"
+                    message_time = current_time
+            
+            # Report kills that have finished since the last pass
+            for task in [task for task in kills if task.done()]:
+                kills.remove(task)
+                termination_results, color, summary = task.result()
+                for result in termination_results:
+                    if result['status'] in ['success', 'success_force', 'already_terminated']:
+                        monitor.discard(result['pid'])
+                        if not fleet:
+                            process_snapshot.discard(result['pid'])
+                
+                # Set flag to show termination report
+                show_termination_report = True
+                termination_report_drawn = False  # Reset draw state
+                termination_report_time = current_time  # Set the time when report was shown
+                last_termination_report_draw = 0  # Reset last draw time
+                
+                message = f"{color}{summary} Returning to monitoring in {termination_report_timeout} seconds...{Colors.ENDC}"
+                message_time = current_time
+                last_refresh = current_time  # Update refresh time but don't force refresh immediately
+            
+            visible_message = message if message and current_time - message_time < 5 else ""
+            
+            # Handle termination report display if active
+            if show_termination_report:
+                # Check if timeout has passed
+                timeout_remaining = termination_report_timeout - (current_time - termination_report_time)
+                
+                if timeout_remaining <= 0:
+                    # Timeout reached, return to monitoring
+                    show_termination_report = False
+                    termination_report_drawn = False
+                    last_refresh = 0  # Force immediate refresh
+                    continue
+                
+                # Only redraw if necessary (first time, every second, or message is active)
+                if (not termination_report_drawn or 
+                    current_time - last_termination_report_draw >= 1 or 
+                    input_changed or visible_message):
+                    
+                    with profiler.phase('render'):
+                        lines = termination_report_frame_lines(
+                            termination_results, timeout_remaining, visible_message, input_handler.current_input,
+                            profiler.overlay_lines() if profiler.enabled else None)
+                    with profiler.phase('draw'):
+                        renderer.render(lines, footer=TERMINATION_REPORT_FOOTER + (MESSAGE_LINES if visible_message else 0))
+                    
+                    termination_report_drawn = True
+                    last_termination_report_draw = current_time
+            
+            # Apply process events (immediately for netlink, every refresh when polling)
+            if events_pending or current_time - last_refresh >= refresh_interval:
+                started, exited = monitor.poll()
+                if metrics_exporter is not None:
+                    metrics_exporter.record_events(len(started), len(exited))
+                for info in started:
+                    new_processes[info.key] = info.command
+                    terminated_pids.discard(info.key)
+                for pid in exited:
+                    if new_processes.pop(pid, None) is None:
+                        terminated_pids.add(pid)
+                events_pending = bool(started or exited)
+
+            # Refresh display if needed (only in live monitoring mode)
+            if not show_termination_report and (
+                    events_pending or input_changed or visible_message != drawn_message or
+                    current_time - last_refresh >= refresh_interval):
+                with profiler.phase('sample'):
+                    if events_pending or current_time - last_refresh >= refresh_interval:
+                        if fleet:
+                            # Agents send their records already sampled
+                            current_processes = monitor.records()
+                        else:
+                            scan_started = time.perf_counter()
+                            current_processes = sampler.sample(list(monitor.tracked.values()))
+                            port_index.update(current_processes)
+                            process_snapshot.update(current_processes)
+                            if metrics_exporter is not None:
+                                metrics_exporter.update(current_processes, time.perf_counter() - scan_started)
+                        process_filter.update(current_processes)
+                        viewport.marked &= {info.key for info in current_processes}
+                        if current_time >= next_history:
+                            history.record(current_processes)
+                            next_history = current_time + refresh_interval
+                    # fd counts cost a directory listing, so only fetch them for rows on screen
+                    if sort_column == 'fds' and not fleet:
+                        sampler.collect_details(current_processes)
+                with profiler.phase('render'):
+                    # While a /filter is being typed, the table follows it
+                    typed = input_handler.current_input
+                    filter_text = typed[1:].strip() if typed.startswith('/') else active_filter
+                    shown = current_processes
+                    if filter_text:
+                        matches = process_filter.matches(filter_text)
+                        shown = [info for info in current_processes if info.key in matches]
+                    depths = None
+                    if tree_view:
+                        rows = tree_order(shown, sort_column, sort_reverse)
+                        shown = [info for info, _ in rows]
+                        depths = {info.pid: depth for info, depth in rows}
+                    else:
+                        shown = sort_processes(shown, sort_column, sort_reverse)
+                size = shutil.get_terminal_size()
+                if sort_column != 'fds' and not fleet:
+                    with profiler.phase('sample'):
+                        sampler.collect_details(shown[viewport.offset:viewport.offset + size.lines])
+                with profiler.phase('render'):
+                    lines = monitor_frame_lines(
+                        shown, new_processes, terminated_pids,
+                        visible_message, input_handler.current_input, sort_column, depths,
+                        profiler.overlay_lines() if profiler.enabled else None,
+                        viewport, size, len(current_processes), filter_text,
+                        monitor.status if fleet else None, history)
+                with profiler.phase('draw'):
+                    renderer.render(lines, footer=MONITOR_FOOTER + (MESSAGE_LINES if visible_message else 0))
+                drawn_message = visible_message
+                
+                if events_pending or current_time - last_refresh >= refresh_interval:
+                    last_refresh = current_time
+                    new_processes = {}
+                    terminated_pids = set()
+                events_pending = False
+            
+            # Sleep until input, a process event or the next scheduled redraw
+            if show_termination_report:
+                next_wakeup = min(last_termination_report_draw + 1,
+                                  termination_report_time + termination_report_timeout)
+            else:
+                next_wakeup = last_refresh + refresh_interval
+            if message and current_time - message_time < 5:
+                next_wakeup = min(next_wakeup, message_time + 5)
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), max(0, next_wakeup - time.time()))
+            except asyncio.TimeoutError:
+                pass
+            events_pending = monitor_ready.is_set()
+            monitor_ready.clear()
+    
+    finally:
+        loop.remove_reader(input_handler.fileno())
+        if monitor_fd is not None:
+            loop.remove_reader(monitor_fd)
+        for task in kills:
+            task.cancel()
+        sampler.close()
+
+def main():
+    display_header()
+    print(f"\n{Colors.BOLD}{Colors.OKCYAN}Node.js Process Terminator{Colors.ENDC}")
+    print(f"{Colors.BOLD}{Colors.HEADER}=========================={Colors.ENDC}")
+    
+    # Get running Node.js processes
+    processes = process_snapshot.refresh()
+    
+    if not processes:
+        print(f"{Colors.WARNING}No running Node.js processes found.{Colors.ENDC}")
+    
+    # Display processes
+    if processes:
+        print(f"\n{Colors.BOLD}{Colors.OKBLUE}Found running Node.js processes:{Colors.ENDC}")
+        # Only the rows that fit above the menu are printed; live monitoring scrolls and filters
+        import shutil
+        size = shutil.get_terminal_size()
+        room = max(size.lines - len(header_lines()) - MENU_LINES, MIN_TABLE_ROWS)
+        if _use_proc_scanner():
+            collect_details(processes[:room])
+            print("\n".join(process_table_lines(processes[:room], width=size.columns - 1)))
+        else:
+            print(f"{Colors.OKCYAN}{'PID':<8} {'Command'}{Colors.ENDC}")
+            print(f"{Colors.OKCYAN}{'-' * 50}{Colors.ENDC}")
+            for info in processes[:room]:
+                print(f"{Colors.OKCYAN}{info.pid:<8} {_format_command(info.command)}{Colors.ENDC}")
+        if len(processes) > room:
+            print(f"{Colors.WARNING}... and {len(processes) - room} more. Use live monitoring (3) to scroll and filter.{Colors.ENDC}")
+    
+    # User selection
+    print(f"\n{Colors.BOLD}{Colors.HEADER}Options:{Colors.ENDC}")
+    print(f"{Colors.OKCYAN}1. {Colors.WARNING}Terminate all processes{Colors.ENDC}")
+    print(f"{Colors.OKCYAN}2. {Colors.WARNING}Terminate specific processes (by PID){Colors.ENDC}")
+    print(f"{Colors.OKCYAN}3. {Colors.OKBLUE}Live monitoring mode{Colors.ENDC}")
+    print(f"{Colors.OKCYAN}4. {Colors.WARNING}Cancel{Colors.ENDC}")
+    
+    choice = input(f"\n{Colors.BOLD}Enter your choice (1-4): {Colors.ENDC}").strip()
+    
+    if choice == "1":
+        # Terminate all processes
+        if not processes:
+            print(f"\n{Colors.WARNING}No Node.js processes to terminate.{Colors.ENDC}")
+            return
+            
+        print(f"\n{Colors.WARNING}Terminating all Node.js processes...{Colors.ENDC}")
+        termination_results = terminate_processes(termination_targets(processes))
+        
+        # Display termination report
+        display_termination_report(termination_results)
+    
+    elif choice == "2":
+        # Terminate specific processes
+        if not processes:
+            print(f"\n{Colors.WARNING}No Node.js processes to terminate.{Colors.ENDC}")
+            return
+            
+        pids_input = input(f"\n{Colors.BOLD}Enter PIDs or :ports to terminate (comma-separated): {Colors.ENDC}").strip()
+        selected_pids = []
+        for entry in (entry.strip() for entry in pids_input.split(',')):
+            port = parse_port(entry)
+            if port is not None and _port_index is not None:
+                # Expand a :port into the PIDs listening on it
+                selected_pids += [str(pid) for pid in _port_index.pids_for_port(port)]
+            elif entry:
+                selected_pids.append(entry)
+        
+        if not selected_pids:
+            print(f"{Colors.FAIL}No valid PIDs entered.{Colors.ENDC}")
+            return
+        
+        print(f"\n{Colors.WARNING}Terminating selected processes...{Colors.ENDC}")
+        # The snapshot taken for the table above is reused for the lookups,
+        # however long the prompt was open; start times guard against PID reuse
+        selected = [process_snapshot.by_pid.get(int(pid)) if pid.isdigit() else None for pid in selected_pids]
+        targets = termination_targets(info for info in selected if info is not None)
+        found = {str(target[0]) for target in targets}
+
+        # Terminate all found PIDs in one batch, then report in the order entered
+        batch_results = {str(r['pid']): r for r in terminate_processes(targets)}
+        termination_results = []
+        for pid in selected_pids:
+            if pid in batch_results:
+                termination_results.append(batch_results.pop(pid))
+            elif pid not in found:
+                termination_results.append({
+                    'pid': pid,
+                    'command': None,
+                    'status': 'not_found',
+                    'message': f"PID {pid} not found in Node.js processes"
+                })
+        
+        # Display termination report
+        display_termination_report(termination_results)
+    
+    elif choice == "3":
+        # Live monitoring mode
+        live_monitoring_mode()
+    
+    elif choice == "4":
+        print(f"\n{Colors.WARNING}Operation cancelled.{Colors.ENDC}")
+        return
+    
+    else:
+        print(f"\n{Colors.FAIL}Invalid choice. Operation cancelled.{Colors.ENDC}")
+        return
+
+class Histogram:
+    """Cumulative Prometheus histogram with fixed bucket bounds."""
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name):
+        """Sample lines in the text exposition format."""
+        lines = [f'{name}_bucket{{le="{bound}"}} {count}' for bound, count in zip(self.buckets, self.counts)]
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.sum:.6f}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+def _metric_label(value):
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsExporter:
+    """Serves Prometheus metrics for the processes seen by a scan loop.
+
+    The scan loop calls record_events() and update(); update() renders the
+    whole /metrics page once. Scrapes are answered from that rendered page,
+    so they never scan /proc themselves no matter how often they come.
+    Termination results come in through record_terminations(), which
+    start_metrics_exporter() hooks up to every terminate_processes() call.
+    """
+    SCAN_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+    TERMINATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    STATUSES = ('success', 'success_force', 'already_terminated', 'failed', 'error')
+
+    def __init__(self):
+        self.started = 0
+        self.exited = 0
+        self.outcomes = {}  # status -> terminations with that result
+        self.scan_duration = Histogram(self.SCAN_BUCKETS)
+        self.termination_duration = Histogram(self.TERMINATION_BUCKETS)
+        self.records = []
+        self.payload = self.render([])
+        self.server = None
+
+    def record_events(self, started, exited):
+        """Count processes that appeared or exited since the last poll."""
+        self.started += started
+        self.exited += exited
+
+    def update(self, records, scan_seconds):
+        """Record one scan and re-render the page served to scrapers."""
+        self.scan_duration.observe(scan_seconds)
+        self.records = records
+        self.payload = self.render(records)  # replaced in one assignment, so scrapes never see half a page
+
+    def record_terminations(self, results):
+        """Count termination results by status and time their exits; the page is re-rendered right away."""
+        for result in results:
+            self.outcomes[result['status']] = self.outcomes.get(result['status'], 0) + 1
+            if 'exit_time' in result:
+                self.termination_duration.observe(result['exit_time'])
+        self.payload = self.render(self.records)
+
+    def render(self, records):
+        lines = [
+            "# HELP node_processes Node.js processes currently running.",
+            "# TYPE node_processes gauge",
+            f"node_processes {len(records)}",
+            "# HELP node_process_cpu_percent CPU usage of a Node.js process, in percent of one core.",
+            "# TYPE node_process_cpu_percent gauge",
+        ]
+        labels = [f'pid="{info.pid}",command="{_metric_label(_format_command(info.command))}"' for info in records]
+        outcomes = dict(self.outcomes)  # kills can finish on other threads (agent) while this renders
+        lines += [f"node_process_cpu_percent{{{label}}} {info.cpu_percent or 0:.2f}"
+                  for label, info in zip(labels, records)]
+        lines += [
+            "# HELP node_process_resident_memory_bytes Resident memory of a Node.js process.",
+            "# TYPE node_process_resident_memory_bytes gauge",
+        ]
+        lines += [f"node_process_resident_memory_bytes{{{label}}} {info.rss or 0}"
+                  for label, info in zip(labels, records)]
+        lines += [
+            "# HELP node_processes_started_total Node.js processes seen starting.",
+            "# TYPE node_processes_started_total counter",
+            f"node_processes_started_total {self.started}",
+            "# HELP node_processes_exited_total Node.js processes seen exiting.",
+            "# TYPE node_processes_exited_total counter",
+            f"node_processes_exited_total {self.exited}",
+            "# HELP node_terminations_total Terminations by outcome.",
+            "# TYPE node_terminations_total counter",
+        ]
+        for status in self.STATUSES + tuple(sorted(set(outcomes) - set(self.STATUSES))):
+            lines.append(f'node_terminations_total{{status="{status}"}} {outcomes.get(status, 0)}')
+        lines += [
+            "# HELP node_termination_duration_seconds Time from SIGTERM until a terminated process was seen to exit.",
+            "# TYPE node_termination_duration_seconds histogram",
+        ]
+        lines += self.termination_duration.lines('node_termination_duration_seconds')
+        lines += [
+            "# HELP node_scan_duration_seconds Time taken by one process scan.",
+            "# TYPE node_scan_duration_seconds histogram",
+        ]
+        lines += self.scan_duration.lines('node_scan_duration_seconds')
+        return ('\n'.join(lines) + '\n').encode()
+
+    def serve(self, host, port):
+        """Start answering GET /metrics on a background thread."""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                payload = exporter.payload
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass  # stdout carries the NDJSON events
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        global metrics_exporter
+        if metrics_exporter is self:
+            metrics_exporter = None
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+def start_metrics_exporter(listen):
+    """Serve /metrics on listen, a (host, port) pair, and feed it every termination until it is closed.
+
+    Raises OSError when the address cannot be listened on.
+    """
+    global metrics_exporter
+    exporter = MetricsExporter()
+    exporter.serve(*listen)
+    metrics_exporter = exporter
+    return exporter
+
+# Default listen address of `agent`, and the token it and `monitor --agent` use
+AGENT_PORT = 9470
+FLEET_TOKEN = os.environ.get('NODE_SERVER_MANAGER_TOKEN')
+
+class FleetAgent:
+    """Serves this host's Node.js processes to `monitor --agent` controllers.
+
+    The scan loop calls update() with each sample. A controller follows
+    GET /events: a snapshot first, then one NDJSON diff line (new, exited
+    and changed processes) per sample that changed anything, so an idle
+    host only sends a keepalive now and then. Every diff has a sequence
+    number; a controller that reconnects with ?since=EPOCH:SEQ is sent the
+    diffs it missed, or a new snapshot if they are no longer kept.
+    POST /kill terminates tracked processes by PID, by port or all of them.
+    """
+    HISTORY = 1024       # diffs kept for reconnecting controllers
+    QUEUE_LIMIT = 1000   # diffs a slow controller may fall behind before it is cut off
+    KEEPALIVE = 15.0     # seconds between pings on an idle stream
+
+    def __init__(self, token=None):
+        import collections
+        import threading
+        self.token = token
+        self.epoch = os.urandom(4).hex()  # changes on restart, so controllers know to resync
+        self.seq = 0
+        self.sent = {}      # pid -> wire record as last published
+        self.by_pid = {}    # pid -> ProcessInfo from the last sample, for kills
+        self.history = collections.deque(maxlen=self.HISTORY)  # (seq, diff line)
+        self.subscribers = set()  # one queue.Queue per /events stream
+        self.lock = threading.Lock()
+        # Kills come in on server threads; they run one at a time, as they update
+        # the metrics exporter and the journal
+        self.kill_lock = threading.Lock()
+        self.server = None
+
+    @staticmethod
+    def _wire(info):
+        """The JSON form of a record; uptime is sent as a start time so it does not change."""
+        return {'pid': info.pid, 'ppid': info.ppid, 'command': info.command, 'start_time': info.start_time,
+                'started': round(time.time() - info.uptime, 1) if info.uptime is not None else None,
+                'cpu_percent': round(info.cpu_percent, 1) if info.cpu_percent is not None else None,
+                'rss': info.rss, 'threads': info.threads, 'ports': info.ports}
+
+    @staticmethod
+    def _signature(record):
+        """What has to change for a record to be sent again: whole CPU%, RSS in MiB, threads, ports."""
+        cpu = record['cpu_percent']
+        return (round(cpu) if cpu is not None else None, (record['rss'] or 0) >> 20,
+                record['threads'], record['ports'])
+
+    def update(self, records):
+        """Publish a sample; streams get only what changed since the previous one."""
+        import json
+        current = {info.pid: self._wire(info) for info in records}
+        new, changed = [], []
+        exited = [pid for pid, record in self.sent.items()
+                  if pid not in current or current[pid]['start_time'] != record['start_time']]
+        sent = {pid: self.sent[pid] for pid in self.sent if pid in current}
+        for pid in exited:
+            sent.pop(pid, None)
+        for pid, record in current.items():
+            if pid not in sent:
+                new.append(record)
+            elif self._signature(record) != self._signature(sent[pid]):
+                changed.append(record)
+            else:
+                continue
+            sent[pid] = record
+        with self.lock:
+            self.sent = sent
+            self.by_pid = {info.pid: info for info in records}
+            if not (new or exited or changed):
+                return
+            self.seq += 1
+            line = (json.dumps({'type': 'diff', 'seq': self.seq, 'new': new, 'exited': exited,
+                                'changed': changed}) + '\n').encode()
+            self.history.append((self.seq, line))
+            self._publish(line)
+
+    def _publish(self, line):
+        for subscriber in list(self.subscribers):
+            if subscriber.qsize() >= self.QUEUE_LIMIT:
+                # Too far behind; closing the stream makes it reconnect and resync
+                self.subscribers.discard(subscriber)
+                subscriber.put(None)
+            else:
+                subscriber.put(line)
+
+    def snapshot_line(self):
+        import json
+        return (json.dumps({'type': 'snapshot', 'epoch': self.epoch, 'seq': self.seq,
+                            'processes': list(self.sent.values())}) + '\n').encode()
+
+    def subscribe(self, since=None):
+        """Start a stream; returns (queue, lines to send first)."""
+        import queue
+        with self.lock:
+            epoch, _, seq = (since or '').partition(':')
+            if epoch == self.epoch and seq.isdigit() and int(seq) <= self.seq and (
+                    int(seq) == self.seq or (self.history and self.history[0][0] <= int(seq) + 1)):
+                backlog = [line for number, line in self.history if number > int(seq)]
+            else:
+                backlog = [self.snapshot_line()]
+            subscriber = queue.Queue()
+            self.subscribers.add(subscriber)
+        return subscriber, backlog
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def kill(self, request):
+        """Terminate the tracked processes a /kill request selects, returning the results.
+
+        The request is {"pids": [PID, ...]}, {"port": PORT} or {"all": true},
+        with optional "grace" and "kill_timeout" seconds. PIDs this agent
+        does not track are reported as not_found and left alone. Raises
+        ValueError for anything else.
+        """
+        def integer(value):
+            return isinstance(value, int) and not isinstance(value, bool)
+
+        if not isinstance(request, dict):
+            raise ValueError("the request must be a JSON object")
+        selectors = [key for key in ('pids', 'port', 'all') if key in request]
+        if len(selectors) != 1:
+            raise ValueError("give exactly one of pids, port and all")
+        timeouts = []
+        for key, default in (('grace', GRACE_PERIOD), ('kill_timeout', KILL_TIMEOUT)):
+            value = request.get(key, default)
+            if not ((integer(value) or isinstance(value, float)) and 0 <= value < float('inf')):
+                raise ValueError(f"{key} must be a number of seconds")
+            timeouts.append(float(value))
+        by_pid = self.by_pid
+        missing = []
+        if selectors == ['all']:
+            if request['all'] is not True:
+                raise ValueError("all must be true")
+            records = list(by_pid.values())
+        elif selectors == ['port']:
+            port = request['port']
+            if not (integer(port) and 0 < port < 65536):
+                raise ValueError("port must be an integer from 1 to 65535")
+            records = [info for info in by_pid.values() if port in (info.ports or ())]
+        else:
+            pids = request['pids']
+            if not (isinstance(pids, list) and pids and all(integer(pid) for pid in pids)):
+                raise ValueError("pids must be a non-empty list of integers")
+            pids = list(dict.fromkeys(pids))
+            records = [by_pid[pid] for pid in pids if pid in by_pid]
+            missing = [{'pid': pid, 'command': None, 'status': 'not_found',
+                        'message': f"PID {pid} is not a Node.js process tracked by this agent"}
+                       for pid in pids if pid not in by_pid]
+        if not records:
+            return missing
+        with self.kill_lock:
+            return missing + terminate_processes(termination_targets(records), *timeouts, verbose=False)
+
+    def serve(self, host, port):
+        """Start answering /events, /snapshot and /kill on background threads."""
+        import hmac
+        import json
+        import queue
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import parse_qs, urlsplit
+        agent = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def authorized(self):
+                if agent.token is None:
+                    return True
+                given = self.headers.get('Authorization', '')
+                if hmac.compare_digest(given.encode(), f"Bearer {agent.token}".encode()):
+                    return True
+                self.send_error(401)
+                return False
+
+            def send_json(self, payload):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path not in ('/events', '/snapshot'):
+                    self.send_error(404)
+                    return
+                if not self.authorized():
+                    return
+                if url.path == '/snapshot':
+                    with agent.lock:
+                        self.send_json(agent.snapshot_line())
+                    return
+                since = parse_qs(url.query).get('since', [None])[0]
+                subscriber, backlog = agent.subscribe(since)
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/x-ndjson')
+                    self.end_headers()
+                    self.wfile.write(b''.join(backlog))
+                    self.wfile.flush()
+                    while True:
+                        try:
+                            line = subscriber.get(timeout=agent.KEEPALIVE)
+                        except queue.Empty:
+                            line = b'{"type": "ping"}\n'
+                        if line is None:
+                            break
+                        self.wfile.write(line)
+                        self.wfile.flush()
+                except OSError:
+                    pass  # the controller went away
+                finally:
+                    agent.unsubscribe(subscriber)
+
+            def do_POST(self):
+                if self.path != '/kill':
+                    self.send_error(404)
+                    return
+                if not self.authorized():
+                    return
+                try:
+                    request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    results = agent.kill(request)
+                except ValueError as e:
+                    self.send_error(400, str(e))
+                    return
+                self.send_json(json.dumps({'results': results}).encode())
+
+            def log_message(self, format, *args):
+                pass  # stdout carries the NDJSON events
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def close(self):
+        if self.server is not None:
+            with self.lock:
+                for subscriber in self.subscribers:
+                    subscriber.put(None)
+                self.subscribers.clear()
+            self.server.shutdown()
+            self.server.server_close()
+
+def parse_agent(text):
+    """Parse an agent address, [NAME=]HOST:PORT, into (name, host, port); the name defaults to HOST:PORT."""
+    name, _, address = text.rpartition('=')
+    host, _, port = address.rpartition(':')
+    if not host or not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"invalid agent address: {text} (use [NAME=]HOST:PORT)")
+    host = host.strip('[]')
+    return (name or f"{host}:{port}", host, int(port))
+
+class FleetMonitor:
+    """Merges the processes of several agents into one view for the live monitor.
+
+    It has the same tracked/poll()/discard() interface as the local process
+    monitors, with records keyed "name/pid" (ProcessInfo.key) and carrying
+    the agent's name in .host. Each agent's /events stream is followed by a
+    task on the running event loop; a dropped stream is reconnected with
+    backoff and resumes where it left off. Kills are sent to every agent
+    involved at the same time.
+    """
+    RETRY_DELAYS = (0.5, 5.0)  # first and longest wait before reconnecting
+    STREAM_TIMEOUT = 2 * FleetAgent.KEEPALIVE + 5  # silence after which an agent counts as gone
+
+    def __init__(self, agents, token=None):
+        self.agents = {name: (host, port) for name, host, port in agents}
+        self.token = token
+        self.tracked = {}   # "name/pid" -> ProcessInfo
+        self.started_at = {}  # "name/pid" -> unix start time, for uptimes
+        self.status = {name: 'connecting' for name in self.agents}
+        self.new = []
+        self.exited = []
+        self.notify = None  # called when processes start or exit
+        self.tasks = []
+
+    def fileno(self):
+        """Agents are followed by tasks on the event loop, not through a descriptor."""
+        return None
+
+    def start(self):
+        """Connect to every agent; must be called from inside the running event loop."""
+        import asyncio
+        self.tasks = [asyncio.ensure_future(self._follow(name)) for name in self.agents]
+        return self.tracked
+
+    def _request(self, method, path, host, body=b''):
+        lines = [f"{method} {path} HTTP/1.0", f"Host: {host}"]
+        if self.token:
+            lines.append(f"Authorization: Bearer {self.token}")
+        if body:
+            lines += ["Content-Type: application/json", f"Content-Length: {len(body)}"]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+    async def _open(self, name, method, path, body=b''):
+        """Send a request to an agent and return (reader, writer) positioned after a 200 response's headers."""
+        import asyncio
+        host, port = self.agents[name]
+        reader, writer = await asyncio.open_connection(host, port, limit=1 << 24)
+        try:
+            writer.write(self._request(method, path, host, body))
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), self.STREAM_TIMEOUT)
+            status = head.split(b' ', 2)[1]
+            if status != b'200':
+                raise ConnectionError(f"HTTP {status.decode()}" + (" (check --token)" if status == b'401' else ""))
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _follow(self, name):
+        """Keep this agent's records in self.tracked up to date, reconnecting whenever the stream drops."""
+        import asyncio
+        import json
+        since = None
+        delay = self.RETRY_DELAYS[0]
+        while True:
+            try:
+                reader, writer = await self._open(name, 'GET', '/events' + (f'?since={since}' if since else ''))
+                try:
+                    self.status[name] = 'up'
+                    delay = self.RETRY_DELAYS[0]
+                    while True:
+                        line = await asyncio.wait_for(reader.readline(), self.STREAM_TIMEOUT)
+                        if not line:
+                            raise ConnectionError("connection closed")
+                        since = self._apply(name, json.loads(line), since)
+                finally:
+                    writer.close()
+            except (OSError, ValueError, KeyError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    asyncio.LimitOverrunError) as e:
+                self.status[name] = f"unreachable: {e or type(e).__name__}"
+            if self.notify is not None:
+                self.notify()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.RETRY_DELAYS[1])
+
+    def _record(self, name, wire):
+        command = wire['command']
+        info = ProcessInfo(wire['pid'], wire['ppid'], os.path.basename(command.split(' ', 1)[0]),
+                           [command], wire['start_time'])
+        info.host = sys.intern(name)
+        return self._change(info, wire)
+
+    def _change(self, info, wire):
+        info.cpu_percent = wire['cpu_percent']
+        info.rss = wire['rss']
+        info.threads = wire['threads']
+        info.ports = wire['ports']
+        self.started_at[info.key] = wire['started']
+        return info
+
+    def _apply(self, name, message, since):
+        """Apply one line of an agent's stream and return the position to resume from."""
+        kind = message['type']
+        if kind == 'ping':
+            return since
+        prefix = f"{name}/"
+        if kind == 'snapshot':
+            epoch = message['epoch']
+            current = {f"{prefix}{wire['pid']}": wire for wire in message['processes']}
+            exited = [key for key in self.tracked if key.startswith(prefix) and key not in current]
+            new = []
+            for key, wire in current.items():
+                info = self.tracked.get(key)
+                if info is None or info.start_time != wire['start_time']:
+                    if info is not None:
+                        exited.append(key)
+                    new.append(self._record(name, wire))
+                else:
+                    self._change(info, wire)
+        else:
+            epoch = since.partition(':')[0]
+            exited = [f"{prefix}{pid}" for pid in message['exited']]
+            new = [self._record(name, wire) for wire in message['new']]
+            for wire in message['changed']:
+                info = self.tracked.get(f"{prefix}{wire['pid']}")
+                if info is not None:
+                    self._change(info, wire)
+        for key in exited:
+            if self.tracked.pop(key, None) is not None:
+                self.started_at.pop(key, None)
+                self.exited.append(key)
+        for info in new:
+            self.tracked[info.key] = info
+            self.new.append(info)
+        if (new or exited) and self.notify is not None:
+            self.notify()
+        return f"{epoch}:{message['seq']}"
+
+    def poll(self):
+        """Return ([new ProcessInfo], [exited keys]) since the previous poll."""
+        new, exited = self.new, self.exited
+        self.new, self.exited = [], []
+        return new, exited
+
+    def records(self):
+        """Every agent's records, with their uptimes brought up to date."""
+        now = time.time()
+        for key, info in self.tracked.items():
+            started = self.started_at.get(key)
+            info.uptime = max(now - started, 0) if started is not None else None
+        return list(self.tracked.values())
+
+    def get(self, text):
+        """The record for "name/pid", or for a bare PID that only one agent has; None otherwise."""
+        info = self.tracked.get(text)
+        if info is None and text.isdigit():
+            matches = [info for info in self.tracked.values() if info.pid == int(text)]
+            info = matches[0] if len(matches) == 1 else None
+        return info
+
+    def discard(self, key):
+        """Stop showing a record without reporting it as exited."""
+        self.tracked.pop(key, None)
+
+    async def _kill(self, name, request):
+        """POST one /kill to an agent; the results are keyed like the records."""
+        import asyncio
+        import json
+        try:
+            reader, writer = await self._open(name, 'POST', '/kill', json.dumps(request).encode())
+            try:
+                body = await asyncio.wait_for(reader.read(), GRACE_PERIOD + KILL_TIMEOUT + self.STREAM_TIMEOUT)
+            finally:
+                writer.close()
+            results = json.loads(body)['results']
+        except (OSError, ValueError, KeyError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                asyncio.LimitOverrunError) as e:
+            return [{'pid': name, 'command': None, 'status': 'error', 'host': name,
+                     'message': f"agent {name} is unreachable: {e or type(e).__name__}"}]
+        for result in results:
+            result['host'] = name
+            result['pid'] = f"{name}/{result['pid']}"
+        return results
+
+    async def _kill_each(self, requests):
+        import asyncio
+        batches = await asyncio.gather(*(self._kill(name, request) for name, request in requests.items()))
+        return [result for results in batches for result in results]
+
+    async def kill_records(self, records):
+        """Terminate the given records, one request per agent, all agents at once."""
+        pids = {}
+        for info in records:
+            pids.setdefault(info.host, []).append(info.pid)
+        return await self._kill_each({name: {'pids': group} for name, group in pids.items()})
+
+    async def kill_port(self, port):
+        """Terminate whatever listens on a port, on every agent."""
+        return await self._kill_each({name: {'port': port} for name in self.agents})
+
+    async def kill_all(self):
+        """Terminate every Node.js process on every agent."""
+        return await self._kill_each({name: {'all': True} for name in self.agents})
+
+    def close(self):
+        for task in self.tasks:
+            task.cancel()
+
+# A process counts as idle for reaper rules below this CPU%
+IDLE_CPU_PERCENT = 1.0
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+_DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_size(text):
+    """Parse a size such as 512M or 2G into bytes."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([BKMGT]?)i?B?', text.strip(), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"invalid size: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+def parse_duration(text):
+    """Parse a duration such as 90, 60s, 5m, 1h or 2d into seconds."""
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([smhd]?)', text.strip())
+    if match is None:
+        raise ValueError(f"invalid duration: {text}")
+    return float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+
+class ReapRule:
+    """A condition on a process, optionally required to hold for a duration.
+
+    Written as terms joined by `and`, with an optional `for <duration>`:
+
+        rss > 2G for 60s
+        cpu > 95% for 5m
+        ppid == 1 and age > 1h
+        port in 3000-3999 and idle for 10m
+
+    Fields are rss (bytes), cpu (percent), age (seconds), ppid, threads,
+    fds and port (any listening port). `idle` means CPU below
+    IDLE_CPU_PERCENT. Values may use size and duration suffixes.
+    """
+    FIELDS = {'rss': parse_size, 'cpu': lambda text: float(text.rstrip('%')), 'age': parse_duration,
+              'ppid': int, 'threads': int, 'fds': int, 'port': int}
+    OPERATORS = {'>': lambda a, b: a > b, '>=': lambda a, b: a >= b, '<': lambda a, b: a < b,
+                 '<=': lambda a, b: a <= b, '==': lambda a, b: a == b, '!=': lambda a, b: a != b}
+
+    def __init__(self, text):
+        self.text = text.strip()
+        body = self.text
+        self.duration = 0.0
+        match = re.fullmatch(r'(.*?)\s+for\s+(\S+)', body)
+        try:
+            if match:
+                body, self.duration = match.group(1), parse_duration(match.group(2))
+            self.terms = [self._parse_term(term) for term in re.split(r'\s+and\s+', body)]
+        except ValueError as e:
+            raise ValueError(f"invalid rule {self.text!r}: {e}")
+        self.fields = {field for field, _, _ in self.terms}
+        # age only grows, so an age threshold can be scheduled instead of polled
+        self.min_age = max((value for field, op, value in self.terms if field == 'age' and op in ('>', '>=')),
+                           default=None)
+
+    def _parse_term(self, term):
+        term = term.strip()
+        if term == 'idle':
+            return ('cpu', '<', IDLE_CPU_PERCENT)
+        match = re.fullmatch(r'(\w+)\s+in\s+(\S+)', term)
+        if match and match.group(1) in self.FIELDS:
+            field, parse = match.group(1), self.FIELDS[match.group(1)]
+            low, _, high = match.group(2).partition('-')
+            return (field, 'in', (parse(low), parse(high or low)))
+        match = re.fullmatch(r'(\w+)\s*(>=|<=|==|!=|>|<)\s*(\S+)', term)
+        if match is None or match.group(1) not in self.FIELDS:
+            raise ValueError(f"cannot parse {term!r}")
+        field, op, value = match.groups()
+        return (field, op, self.FIELDS[field](value))
+
+    @staticmethod
+    def _value(info, field):
+        if field == 'cpu':
+            return info.cpu_percent
+        if field == 'age':
+            return info.uptime
+        if field == 'port':
+            return info.ports
+        return getattr(info, field)
+
+    def matches(self, info):
+        """Check whether every term currently holds for a sampled ProcessInfo."""
+        for field, op, value in self.terms:
+            actual = self._value(info, field)
+            if actual is None:
+                return False
+            values = actual if field == 'port' else [actual]
+            if op == 'in':
+                ok = any(value[0] <= v <= value[1] for v in values)
+            else:
+                ok = any(self.OPERATORS[op](v, value) for v in values)
+            if not ok:
+                return False
+        return True
+
+    def __repr__(self):
+        return f"ReapRule({self.text!r})"
+
+class Reaper:
+    """Applies ReapRules to sampled processes and terminates the ones that break them.
+
+    State is kept per (pid, rule): the time the rule started to hold. The
+    moment it must have held until goes on a heap, so a tick only evaluates
+    processes whose sampled values changed and pops deadlines that are due;
+    processes that sit unchanged cost one tuple comparison. Age thresholds
+    are also put on the heap, as a re-check at the time they are crossed.
+
+    The processes that fall due in one tick are terminated together, and a
+    failed termination is tried again RETRY_DELAY seconds later.
+    """
+    RETRY_DELAY = 10.0
+
+    def __init__(self, rules, dry_run=False, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT, log=None):
+        self.rules = rules
+        self.fields = sorted(set().union(*(rule.fields for rule in rules)) - {'age'})
+        self.dry_run = dry_run
+        self.grace_period = grace_period
+        self.kill_timeout = kill_timeout
+        self.log = log or (lambda result: None)
+        self.processes = {}   # pid -> latest ProcessInfo
+        self.signatures = {}  # pid -> rule inputs at the last evaluation
+        self.since = {}       # (pid, rule index) -> time the rule started to hold
+        self.heap = []        # (when, sequence, pid, rule index or None, since)
+        self.sequence = 0
+        self.rechecks = {}    # pid -> time of its pending age re-check
+        self.acted = set()    # pids already terminated (or reported in a dry run)
+
+    def _push(self, when, pid, index, since):
+        import heapq
+        self.sequence += 1
+        heapq.heappush(self.heap, (when, self.sequence, pid, index, since))
+
+    def _evaluate(self, info, now):
+        for index, rule in enumerate(self.rules):
+            key = (info.pid, index)
+            if rule.matches(info):
+                if key not in self.since:
+                    self.since[key] = now
+                    self._push(now + rule.duration, info.pid, index, now)
+            else:
+                self.since.pop(key, None)
+                if (rule.min_age is not None and info.uptime is not None and info.uptime <= rule.min_age
+                        and info.pid not in self.rechecks):
+                    # Look again once the process is old enough
+                    self.rechecks[info.pid] = now + rule.min_age - info.uptime + 0.001
+                    self._push(self.rechecks[info.pid], info.pid, None, None)
+
+    def next_deadline(self):
+        """When the earliest scheduled check is due, or None."""
+        return self.heap[0][0] if self.heap else None
+
+    def tick(self, records, exited=(), now=None):
+        """Take one sample of the tracked processes; returns the result dicts of any actions."""
+        import heapq
+        now = time.monotonic() if now is None else now
+        for pid in exited:
+            self._forget(pid)
+        for info in records:
+            self.processes[info.pid] = info
+            signature = tuple(self._signature_value(info, field) for field in self.fields)
+            if self.signatures.get(info.pid) != signature:
+                self.signatures[info.pid] = signature
+                self._evaluate(info, now)
+
+        due = {}
+        while self.heap and self.heap[0][0] <= now:
+            when, _, pid, index, since = heapq.heappop(self.heap)
+            info = self.processes.get(pid)
+            if info is None or pid in self.acted:
+                continue
+            if index is None:
+                if self.rechecks.get(pid) == when:
+                    del self.rechecks[pid]
+                    self._evaluate(info, now)  # an age threshold was crossed
+            elif self.since.get((pid, index)) == since and self.rules[index].matches(info):
+                due.setdefault(pid, index)
+        return self._act(due, now) if due else []
+
+    @staticmethod
+    def _signature_value(info, field):
+        value = ReapRule._value(info, field)
+        return tuple(value) if isinstance(value, list) else value
+
+    def _forget(self, pid):
+        self.processes.pop(pid, None)
+        self.signatures.pop(pid, None)
+        self.acted.discard(pid)
+        self.rechecks.pop(pid, None)
+        for index in range(len(self.rules)):
+            self.since.pop((pid, index), None)
+
+    def _act(self, due, now):
+        """Terminate the processes in due ({pid: rule index}) with one shared grace period."""
+        records = [self.processes[pid] for pid in due]
+        if self.dry_run:
+            results = [{'pid': info.pid, 'command': info.command, 'status': 'dry_run',
+                        'message': f"Would terminate process {info.pid} ({info.command})"} for info in records]
+        else:
+            results = terminate_processes(termination_targets(records), self.grace_period, self.kill_timeout)
+        for info, result in zip(records, results):
+            index = due[info.pid]
+            if result['status'] in ('success', 'success_force', 'already_terminated', 'dry_run'):
+                self.acted.add(info.pid)
+            else:
+                self._push(now + self.RETRY_DELAY, info.pid, index, self.since[(info.pid, index)])
+            result['rule'] = self.rules[index].text
+            result['time'] = round(time.time(), 3)
+            self.log(result)
+        return results
+
+# Linux pressure stall information for memory, and the defaults of `guard`
+PSI_MEMORY = '/proc/pressure/memory'
+GUARD_STALL = 0.2      # seconds of stall per window that wake the guard
+GUARD_WINDOW = 2.0     # PSI window in seconds, 0.5 to 10; a multiple of 2 without CAP_SYS_RESOURCE
+GUARD_RESERVE = '10%'  # MemAvailable the guard restores, as a size or a share of MemTotal
+GUARD_COOLDOWN = 10.0  # seconds the guard waits after acting, so freed memory shows up
+
+def read_pressure(path=PSI_MEMORY):
+    """Parse a PSI file into {'some': {'avg10': ..., 'total': ...}, 'full': {...}}."""
+    pressure = {}
+    for line in _read_proc_file(path).decode().splitlines():
+        kind, *fields = line.split()
+        pressure[kind] = {}
+        for field in fields:
+            name, _, value = field.partition('=')
+            pressure[kind][name] = int(value) if name == 'total' else float(value)
+    return pressure
+
+def read_meminfo(proc_root=PROC_ROOT):
+    """/proc/meminfo as {field: bytes}."""
+    meminfo = {}
+    for line in _read_proc_file(f"{proc_root}/meminfo").splitlines():
+        name, _, value = line.partition(b':')
+        fields = value.split()
+        if fields:
+            meminfo[name.decode()] = int(fields[0]) * (1024 if fields[1:] == [b'kB'] else 1)
+    return meminfo
+
+class PressureTrigger:
+    """A PSI trigger on a pressure file: wait() blocks in poll() until it fires.
+
+    The kernel watches the stall time itself and wakes the poller only when
+    tasks have been stalled for `stall` seconds within a `window` (on some
+    task, or with `full` on all of them at once), so waiting costs no CPU.
+    It reports at most one event per window. Works on /proc/pressure/memory
+    and on the memory.pressure file of a cgroup v2.
+    """
+    def __init__(self, stall=GUARD_STALL, window=GUARD_WINDOW, full=False, path=PSI_MEMORY):
+        import select
+        self.path = path
+        self.fd = os.open(path, os.O_RDWR | os.O_NONBLOCK)
+        try:
+            os.write(self.fd, f"{'full' if full else 'some'} {int(stall * 1e6)} {int(window * 1e6)}\0".encode())
+        except OSError:
+            os.close(self.fd)
+            raise
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLPRI)
+
+    def wait(self, timeout=None):
+        """Block until the trigger fires (True) or timeout seconds have passed (False)."""
+        import select
+        for _, events in self.poller.poll(None if timeout is None else max(timeout, 0) * 1000):
+            if events & (select.POLLERR | select.POLLNVAL):
+                # e.g. the cgroup the trigger was set on has been removed
+                raise OSError(f"pressure trigger on {self.path} is gone")
+            return True
+        return False
+
+    def close(self):
+        os.close(self.fd)
+
+class MemoryGuard:
+    """Terminates the fewest Node.js processes that bring MemAvailable back above a reserve.
+
+    The reserve is a size such as 1G or a share of MemTotal such as 10%.
+    Candidates are ranked by RSS, largest first, and among equal sizes the
+    youngest first. The largest ones are taken until the amount still missing
+    fits into a single process; that last one is the smallest that covers
+    it. This gives the fewest processes possible and spares a big server
+    when a smaller one is enough. RSS counts shared pages too, so the memory
+    freed is an estimate.
+    """
+    def __init__(self, reserve=GUARD_RESERVE, dry_run=False, grace_period=GRACE_PERIOD, kill_timeout=KILL_TIMEOUT,
+                 log=None):
+        text = reserve.strip()
+        if text.endswith('%'):
+            try:
+                self.reserve_share = float(text[:-1]) / 100
+            except ValueError:
+                raise ValueError(f"invalid reserve: {reserve}")
+            self.reserve = None
+        else:
+            self.reserve_share = None
+            self.reserve = parse_size(text)
+        self.dry_run = dry_run
+        self.grace_period = grace_period
+        self.kill_timeout = kill_timeout
+        self.log = log or (lambda result: None)
+
+    def reserve_bytes(self, meminfo):
+        if self.reserve is not None:
+            return self.reserve
+        return int(meminfo.get('MemTotal', 0) * self.reserve_share)
+
+    @staticmethod
+    def plan(records, needed):
+        """The processes to terminate to free `needed` bytes of RSS (all of them if that is not enough)."""
+        candidates = sorted((info for info in records if info.rss),
+                            key=lambda info: (-info.rss, info.uptime or 0))
+        chosen = []
+        while needed > 0 and candidates:
+            covering = [info for info in candidates if info.rss >= needed]
+            pick = min(covering, key=lambda info: (info.rss, info.uptime or 0)) if covering else candidates[0]
+            candidates.remove(pick)
+            chosen.append(pick)
+            needed -= pick.rss
+        return chosen
+
+    def relieve(self, records, meminfo, pressure=None):
+        """Decide on one pressure event and act on it; returns the result dicts of the processes acted on."""
+        available = meminfo.get('MemAvailable', meminfo.get('MemFree', 0))
+        reserve = self.reserve_bytes(meminfo)
+        needed = reserve - available
+        chosen = self.plan(records, needed) if needed > 0 else []
+        freed = sum(info.rss for info in chosen)
+        if needed <= 0:
+            message = f"{_format_bytes(available)} available, above the {_format_bytes(reserve)} reserve"
+        elif not chosen:
+            message = f"{_format_bytes(needed)} needed, but no Node.js process to terminate"
+        else:
+            message = (f"{_format_bytes(needed)} needed; terminating {len(chosen)} of {len(records)} "
+                       f"Node.js processes frees about {_format_bytes(freed)}")
+        some = (pressure or {}).get('some', {})
+        full = (pressure or {}).get('full', {})
+        self.log({'event': 'pressure', 'time': round(time.time(), 3), 'some_avg10': some.get('avg10'),
+                  'full_avg10': full.get('avg10'), 'available': available, 'reserve': reserve,
+                  'needed': max(needed, 0), 'chosen': [info.pid for info in chosen], 'freed': freed,
+                  'message': message})
+
+        if not chosen:
+            return []
+        if self.dry_run:
+            results = [{'pid': info.pid, 'command': info.command, 'status': 'dry_run',
+                        'message': f"Would terminate process {info.pid} ({info.command})"} for info in chosen]
+        else:
+            results = terminate_processes(termination_targets(chosen), self.grace_period, self.kill_timeout)
+        for info, result in zip(chosen, results):
+            result['rss'] = info.rss
+            result['age'] = round(info.uptime, 1) if info.uptime is not None else None
+            result['time'] = round(time.time(), 3)
+            self.log(result)
+        return results
+
+# Exit statuses of the headless commands
+EXIT_OK = 0
+EXIT_FAILED = 1     # at least one selected process could not be terminated
+EXIT_USAGE = 2      # bad arguments; argparse exits with 2 as well
+EXIT_NO_MATCH = 3   # no process matched the selection, or a --pid is not a Node.js process
+
+def _disable_colors():
+    """Blank out the color codes, for output that is not going to a terminal."""
+    for name in list(vars(Colors)):
+        if name.isupper():
+            setattr(Colors, name, '')
+
+def process_record(pid, command, info=None):
+    """Build the JSON object for one process, with the resource fields that are known."""
+    record = {'pid': int(pid), 'command': command}
+    if info is not None:
+        for name in ('ppid', 'start_time', 'cpu_percent', 'rss', 'threads', 'fds', 'uptime', 'ports', 'cgroup'):
+            value = getattr(info, name)
+            if value is not None:
+                record[name] = round(value, 2) if isinstance(value, float) else value
+    return record
+
+def _emit(records, as_json=False):
+    """Print records as one JSON array, or as NDJSON (one object per line)."""
+    import json
+    if as_json:
+        print(json.dumps(records, indent=2))
+    else:
+        for record in records:
+            print(json.dumps(record))
+    sys.stdout.flush()
+
+def _port_argument(text):
+    """argparse type for --port, accepting both 3000 and :3000."""
+    port = parse_port(text if text.startswith(':') else ':' + text)
+    if port is None:
+        import argparse
+        raise argparse.ArgumentTypeError(f"invalid port: {text}")
+    return port
+
+def _listen_argument(text):
+    """argparse type for [HOST:]PORT listen addresses."""
+    host, _, port = text.rpartition(':')
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        import argparse
+        raise argparse.ArgumentTypeError(f"invalid listen address: {text}")
+    return (host.strip('[]') or '127.0.0.1', int(port))
+
+def _agent_argument(text):
+    """argparse type for --agent, [NAME=]HOST:PORT."""
+    try:
+        return parse_agent(text)
+    except ValueError as e:
+        import argparse
+        raise argparse.ArgumentTypeError(str(e))
+
+def _time_argument(text):
+    """argparse type for --since/--until: a time ago (90s, 5m, 2h, 1d) or an ISO date and time."""
+    import argparse
+    import datetime
+    try:
+        return time.time() - parse_duration(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {text} (use e.g. 2h or 2024-05-01T12:00)")
+
+COMMANDS = ('list', 'monitor', 'kill', 'restart', 'watch', 'agent', 'reap', 'guard', 'history')
+
+class _SkippedOptions:
+    """Stands in for the parser of a command that is not being run, so its options are never built."""
+    def add_argument(self, *args, **kwargs):
+        pass
+
+def _command_name(argv):
+    """The command named in argv, skipping the global options and their values; None if there is none."""
+    args = iter(argv)
+    for arg in args:
+        if arg in ('--config', '--profile'):
+            next(args, None)
+        elif not arg.startswith('-'):
+            return arg
+    return None
+
+def _help_formatter(prog):
+    """argparse's HelpFormatter, sized the way shutil.get_terminal_size() would without importing shutil."""
+    import argparse
+    try:
+        columns = int(os.environ['COLUMNS'])
+    except (KeyError, ValueError):
+        try:
+            columns = os.get_terminal_size(sys.__stdout__.fileno()).columns
+        except (AttributeError, ValueError, OSError):
+            columns = 80
+    return argparse.HelpFormatter(prog, width=columns - 2)
+
+def build_parser(command=None):
+    """Build the argument parser for the headless commands.
+
+    With one of COMMANDS given, only that command gets a parser; building
+    every one costs more than a `list` run. Any other value builds them
+    all, so argparse can list the valid choices.
+    """
+    import argparse
+    if command not in COMMANDS:
+        command = None
+    common = argparse.ArgumentParser(add_help=False, formatter_class=_help_formatter)
+    common.add_argument('--json', action='store_true',
+                        help="print a single JSON document instead of NDJSON")
+    common.add_argument('-q', '--quiet', action='store_true',
+                        help="do not print progress messages to stderr")
+    recording = argparse.ArgumentParser(add_help=False, formatter_class=_help_formatter)
+    recording.add_argument('--journal', nargs='?', const=JOURNAL_PATH, metavar='PATH',
+                           help=f"append process starts, exits and terminations to a journal "
+                                f"(default {JOURNAL_PATH}); read it back with `history`")
+    exporting = argparse.ArgumentParser(add_help=False, formatter_class=_help_formatter)
+    exporting.add_argument('--metrics', type=_listen_argument, metavar='[HOST:]PORT',
+                           help="serve Prometheus metrics, terminations included, on http://HOST:PORT/metrics "
+                                "(HOST defaults to 127.0.0.1)")
+
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]), formatter_class=_help_formatter,
+        description="Find and stop Node.js servers. Run without arguments for the interactive menu.",
+        epilog=f"exit status: {EXIT_OK} ok, {EXIT_FAILED} a process could not be terminated, "
+               f"{EXIT_USAGE} usage error, {EXIT_NO_MATCH} no process matched")
+    parser.add_argument('--config', metavar='PATH',
+                        help=f"JSON file with process matching rules (default {CONFIG_PATH})")
+    parser.add_argument('--profile', metavar='TRACE',
+                        help="time each phase (scan, match, render, signal, wait, ...) and write a "
+                             "Chrome trace-event file to TRACE on exit; `monitor` also shows p50/p99 live")
+    subparsers = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    def add_command(name, parents, help):
+        if command is None or command == name:
+            return subparsers.add_parser(name, parents=parents, help=help, formatter_class=_help_formatter)
+        return _SkippedOptions()
+
+    add_command('list', parents=[common], help="list running Node.js processes")
+
+    monitor = add_command('monitor', parents=[recording, exporting], help="open the live monitor directly")
+    monitor.add_argument('--agent', type=_agent_argument, action='append', metavar='[NAME=]HOST:PORT',
+                         help="show the processes of this `agent` instead of the local ones (repeatable; "
+                              "the rows are merged and k, km and k :port act on every agent at once)")
+    monitor.add_argument('--drain', type=float, metavar='SECONDS',
+                         help="when killing servers, wait for their connections to close, up to SECONDS (Linux only)")
+    monitor.add_argument('--token', default=FLEET_TOKEN,
+                         help="token the agents were started with (default NODE_SERVER_MANAGER_TOKEN)")
+
+    # Process selection and termination options shared by kill and restart
+    selection = argparse.ArgumentParser(add_help=False, formatter_class=_help_formatter)
+    selection.add_argument('--all', action='store_true', help="every Node.js process")
+    selection.add_argument('--pid', type=int, action='append', default=[], metavar='PID',
+                           help="a process ID (repeatable)")
+    selection.add_argument('--port', type=_port_argument, action='append', default=[], metavar='PORT',
+                           help="processes listening on a TCP port, e.g. 3000 or :3000 (repeatable, Linux only)")
+    selection.add_argument('--match', metavar='REGEX', help="processes whose command line matches REGEX")
+    selection.add_argument('--grace', type=float, default=GRACE_PERIOD, metavar='SECONDS',
+                           help=f"time to exit after SIGTERM before SIGKILL (default {GRACE_PERIOD})")
+    selection.add_argument('--kill-timeout', type=float, default=KILL_TIMEOUT, metavar='SECONDS',
+                           help=f"time to wait after SIGKILL (default {KILL_TIMEOUT})")
+
+    kill = add_command('kill', parents=[common, selection, recording], help="terminate Node.js processes")
+    kill.add_argument('--dry-run', action='store_true', help="show what would be terminated")
+    kill.add_argument('--drain', type=float, metavar='SECONDS',
+                      help="let servers finish their open connections: SIGKILL each one once its connections "
+                           "are closed, or after SECONDS at the latest, instead of after --grace (Linux only)")
+    kill.add_argument('--cgroup', action='store_true',
+                      help="take down each cgroup v2 that holds only selected processes with cgroup.freeze "
+                           "and cgroup.kill, instead of PID by PID (Linux only)")
+
+    restart = add_command('restart', parents=[common, selection, recording],
+                                  help="terminate Node.js processes and start them again (Linux only)")
+    restart.add_argument('--ready-timeout', type=float, default=READY_TIMEOUT, metavar='SECONDS',
+                         help=f"time to wait for the servers to be ready again (default {READY_TIMEOUT:g})")
+    restart.add_argument('--ready-log', metavar='REGEX',
+                         help="for servers without a listening port, wait for a line of output matching REGEX "
+                              f"(default: running for {READY_SETTLE:g}s)")
+    restart.add_argument('--dry-run', action='store_true', help="show what would be restarted")
+
+    watch = add_command('watch', parents=[recording, exporting], help="stream process start/exit events as NDJSON")
+    watch.add_argument('--interval', type=float, default=1.0, metavar='SECONDS',
+                       help="how often to rescan when process events are unavailable (default 1.0)")
+    watch.add_argument('--duration', type=float, metavar='SECONDS', help="stop after this long")
+
+    agent = add_command('agent', parents=[recording, exporting],
+                                help="serve this host's Node.js processes to `monitor --agent` over HTTP")
+    agent.add_argument('--listen', type=_listen_argument, default=('127.0.0.1', AGENT_PORT), metavar='[HOST:]PORT',
+                       help=f"address to serve on (default 127.0.0.1:{AGENT_PORT}); any address other than "
+                            "loopback needs a token")
+    agent.add_argument('--token', default=FLEET_TOKEN,
+                       help="require this bearer token from controllers (default NODE_SERVER_MANAGER_TOKEN)")
+    agent.add_argument('--interval', type=float, default=2.0, metavar='SECONDS',
+                       help="how often processes are sampled (default 2.0)")
+    agent.add_argument('--duration', type=float, metavar='SECONDS', help="stop after this long")
+    agent.add_argument('-q', '--quiet', action='store_true', help="do not print progress messages to stderr")
+
+    reap = add_command('reap', parents=[recording, exporting],
+                               help="terminate processes that break rules, logging actions as NDJSON")
+    reap.add_argument('--rule', action='append', default=[], metavar='RULE',
+                      help="e.g. 'rss > 2G for 60s' or 'ppid == 1 and age > 1h' (repeatable; "
+                           "defaults to the \"reap\" rules in the config file)")
+    reap.add_argument('--dry-run', action='store_true', help="log what would be terminated without doing it")
+    reap.add_argument('--interval', type=float, default=2.0, metavar='SECONDS',
+                      help="how often processes are sampled (default 2.0)")
+    reap.add_argument('--duration', type=float, metavar='SECONDS', help="stop after this long")
+    reap.add_argument('--grace', type=float, default=GRACE_PERIOD, metavar='SECONDS',
+                      help=f"time to exit after SIGTERM before SIGKILL (default {GRACE_PERIOD})")
+    reap.add_argument('--kill-timeout', type=float, default=KILL_TIMEOUT, metavar='SECONDS',
+                      help=f"time to wait after SIGKILL (default {KILL_TIMEOUT})")
+
+    guard = add_command('guard', parents=[recording, exporting],
+                                help="terminate the fewest processes needed when memory pressure is high (Linux)")
+    guard.add_argument('--stall', type=float, default=GUARD_STALL * 1000, metavar='MS',
+                       help=f"act when tasks stall on memory this long within a window "
+                            f"(default {GUARD_STALL * 1000:.0f})")
+    guard.add_argument('--window', type=float, default=GUARD_WINDOW, metavar='SECONDS',
+                       help=f"PSI window, 0.5 to 10 and a multiple of 2 without CAP_SYS_RESOURCE "
+                            f"(default {GUARD_WINDOW})")
+    guard.add_argument('--full', action='store_true',
+                       help="count only stalls of all tasks at once instead of any task")
+    guard.add_argument('--reserve', default=GUARD_RESERVE, metavar='SIZE|PERCENT',
+                       help=f"MemAvailable to restore, e.g. 1G or 10%% of MemTotal "
+                            f"(default {GUARD_RESERVE.replace('%', '%%')})")
+    guard.add_argument('--pressure-file', default=PSI_MEMORY, metavar='PATH',
+                       help=f"PSI file to watch, e.g. a cgroup's memory.pressure (default {PSI_MEMORY})")
+    guard.add_argument('--cooldown', type=float, default=GUARD_COOLDOWN, metavar='SECONDS',
+                       help=f"time to wait after acting before reacting again (default {GUARD_COOLDOWN})")
+    guard.add_argument('--simulate', type=parse_size, metavar='AVAILABLE',
+                       help="do not wait for pressure; act once as if it fired with this much MemAvailable")
+    guard.add_argument('--dry-run', action='store_true', help="log what would be terminated without doing it")
+    guard.add_argument('--duration', type=float, metavar='SECONDS', help="stop after this long")
+    guard.add_argument('--grace', type=float, default=GRACE_PERIOD, metavar='SECONDS',
+                       help=f"time to exit after SIGTERM before SIGKILL (default {GRACE_PERIOD})")
+    guard.add_argument('--kill-timeout', type=float, default=KILL_TIMEOUT, metavar='SECONDS',
+                       help=f"time to wait after SIGKILL (default {KILL_TIMEOUT})")
+
+    history = add_command('history', parents=[common], help="query the event journal")
+    history.add_argument('--journal', default=JOURNAL_PATH, metavar='PATH',
+                         help=f"journal to read (default {JOURNAL_PATH})")
+    history.add_argument('--pid', type=int, metavar='PID', help="events of one process ID")
+    history.add_argument('--match', metavar='REGEX', help="events whose command line matches REGEX")
+    history.add_argument('--since', type=_time_argument, metavar='WHEN',
+                         help="events at or after WHEN, e.g. 2h (ago) or 2024-05-01T12:00")
+    history.add_argument('--until', type=_time_argument, metavar='WHEN', help="events at or before WHEN")
+    history.add_argument('--event', action='append', choices=EventJournal.EVENTS,
+                         help="only this kind of event (repeatable)")
+    return parser
+
+def cli_list(args):
+    """`list`: print every Node.js process with its resource usage."""
+    processes = process_snapshot.records()
+    if _use_proc_scanner():
+        group_by_cgroup(processes)
+        collect_details(processes)
+    records = [process_record(info.pid, info.command, info) for info in processes]
+    _emit(records, args.json)
+    return EXIT_OK if records else EXIT_NO_MATCH
+
+def cli_monitor(args):
+    """`monitor`: the live monitor, skipping the menu; with --agent, the merged view of those agents."""
+    if args.agent and args.metrics:
+        print("monitor: --metrics covers local processes only; run each agent with --metrics instead",
+              file=sys.stderr)
+        return EXIT_USAGE
+    live_monitoring_mode(args.agent, args.token, args.drain)
+    return EXIT_OK
+
+def _select_processes(args):
+    """Resolve --all, --pid, --port and --match into ({pid string: ProcessInfo}, [pid strings]).
+
+    Raises ValueError describing a usage error.
+    """
+    if not (args.all or args.pid or args.port or args.match):
+        raise ValueError("choose processes with --all, --pid, --port or --match")
+    try:
+        pattern = re.compile(args.match) if args.match else None
+    except re.error as e:
+        raise ValueError(f"invalid --match pattern: {e}")
+
+    processes = {str(info.pid): info for info in process_snapshot.records()}
+    if args.port and _port_index is None:
+        raise ValueError("--port needs /proc to find listening sockets")
+
+    if args.all:
+        selected = list(processes)
+    else:
+        selected = [str(pid) for pid in args.pid]
+        for port in args.port:
+            selected += [str(pid) for pid in _port_index.pids_for_port(port)]
+        if pattern is not None:
+            selected += [pid for pid, info in processes.items() if pattern.search(info.command)]
+    return processes, list(dict.fromkeys(selected))  # drop duplicates, keep order
+
+def _not_found(processes, selected):
+    """Result dicts for the selected PIDs that are not Node.js processes."""
+    return [{
+        'pid': int(pid),
+        'command': None,
+        'status': 'not_found',
+        'message': f"PID {pid} not found in Node.js processes"
+    } for pid in selected if pid not in processes]
+
+def cli_kill(args):
+    """`kill`: terminate the selected processes and print one result per process."""
+    try:
+        processes, selected = _select_processes(args)
+    except ValueError as e:
+        print(f"kill: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.cgroup and not _use_proc_scanner():
+        print("kill: --cgroup needs /proc and cgroup v2", file=sys.stderr)
+        return EXIT_USAGE
+    records = [processes[pid] for pid in selected if pid in processes]
+    targets = termination_targets(records)
+    not_found = _not_found(processes, selected)
+
+    if not selected:
+        _emit([], args.json)
+        return EXIT_NO_MATCH
+    if args.dry_run:
+        results = [{'pid': int(pid), 'command': command, 'status': 'dry_run',
+                    'message': "Would be terminated"} for pid, command, _ in targets]
+        _emit(results + not_found, args.json)
+        return EXIT_NO_MATCH if not_found else EXIT_OK
+
+    import contextlib
+    # terminate_processes() reports progress on stdout, which is reserved for the results here
+    with open(os.devnull, 'w') if args.quiet else contextlib.nullcontext(sys.stderr) as progress:
+        with contextlib.redirect_stdout(progress):
+            if args.cgroup:
+                results = terminate_cgroups(records, args.grace, args.kill_timeout, drain=args.drain)
+            else:
+                results = terminate_processes(targets, args.grace, args.kill_timeout, drain=args.drain)
+    _emit(results + not_found, args.json)
+    if not all(r['status'] in ('success', 'success_force', 'already_terminated') for r in results):
+        return EXIT_FAILED
+    # A --pid that is not a Node.js process means nothing to do for it, not a failed kill
+    return EXIT_NO_MATCH if not_found else EXIT_OK
+
+def cli_restart(args):
+    """`restart`: terminate the selected processes, start them again and report each one's downtime."""
+    if not _use_proc_scanner():
+        print("restart: needs /proc to capture how processes were started", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        processes, selected = _select_processes(args)
+        ready_pattern = re.compile(args.ready_log) if args.ready_log else None
+    except (ValueError, re.error) as e:
+        print(f"restart: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    records = [processes[pid] for pid in selected if pid in processes]
+    not_found = _not_found(processes, selected)
+    if not selected:
+        _emit([], args.json)
+        return EXIT_NO_MATCH
+    if args.dry_run:
+        results = []
+        for info in records:
+            try:
+                spec = capture_process(info)
+            except OSError as e:
+                results.append({'pid': info.pid, 'command': info.command, 'status': 'capture_failed',
+                                'message': f"Could not capture process {info.pid}: {e}"})
+                continue
+            results.append({'pid': info.pid, 'command': info.command, 'status': 'dry_run',
+                            'message': "Would be restarted", 'argv': spec['argv'], 'cwd': spec['cwd'],
+                            'ports': spec['ports'], 'log': spec['stdout']})
+        _emit(results + not_found, args.json)
+        return EXIT_NO_MATCH if not_found else EXIT_OK
+
+    import contextlib
+    # Progress goes to stderr; stdout carries the results
+    with open(os.devnull, 'w') if args.quiet else contextlib.nullcontext(sys.stderr) as progress:
+        with contextlib.redirect_stdout(progress):
+            results = restart_processes(records, args.grace, args.kill_timeout, args.ready_timeout, ready_pattern)
+    _emit(results + not_found, args.json)
+    if not all(r['status'] == 'restarted' for r in results):
+        return EXIT_FAILED
+    return EXIT_NO_MATCH if not_found else EXIT_OK
+
+def cli_watch(args):
+    """`watch`: print an NDJSON event whenever a Node.js process starts or exits.
+
+    With --metrics, the processes are also sampled every --interval seconds
+    (and whenever one starts or exits) for the Prometheus exporter cli()
+    started.
+    """
+    import json
+    import select
+
+    def emit(event, pid, info=None):
+        record = {'event': event, 'time': round(time.time(), 3), 'pid': pid}
+        if info is not None:
+            record['ppid'] = info.ppid
+            record['command'] = info.command
+        print(json.dumps(record), flush=True)
+
+    monitor = open_process_monitor()
+    exporter = metrics_exporter
+    sampler = ResourceSampler()
+    deadline = time.monotonic() + args.duration if args.duration is not None else None
+    try:
+        scan_started = time.perf_counter()
+        for pid, info in sorted(monitor.start().items()):
+            emit('running', pid, info)
+        next_sample = 0
+        while True:
+            if exporter is not None and time.monotonic() >= next_sample:
+                exporter.update(sampler.sample(list(monitor.tracked.values())),
+                                time.perf_counter() - scan_started)
+                next_sample = time.monotonic() + args.interval
+            timeout = args.interval if exporter is None else next_sample - time.monotonic()
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+            fd = monitor.fileno()
+            if fd is None:
+                time.sleep(max(timeout, 0))
+            else:
+                select.select([fd], [], [], max(timeout, 0))
+            scan_started = time.perf_counter()
+            new, exited = monitor.poll()
+            for info in new:
+                emit('start', info.pid, info)
+            for pid in exited:
+                emit('exit', pid)
+            if exporter is not None:
+                exporter.record_events(len(new), len(exited))
+                if new or exited:
+                    next_sample = 0  # publish the change right away
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        sampler.close()
+    return EXIT_OK
+
+def cli_agent(args):
+    """`agent`: serve this host's Node.js processes to `monitor --agent` controllers.
+
+    Processes are sampled every --interval seconds and whenever one starts
+    or exits; each sample that changed something is pushed to the streams.
+    """
+    import ipaddress
+    import select
+    host, port = args.listen
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = host == 'localhost'
+    if not loopback and not args.token:
+        print(f"agent: refusing to listen on {host} without --token or NODE_SERVER_MANAGER_TOKEN",
+              file=sys.stderr)
+        return EXIT_USAGE
+    monitor = open_process_monitor()
+    sampler = ResourceSampler()
+    port_index = PortIndex()
+    agent = FleetAgent(args.token)
+    deadline = time.monotonic() + args.duration if args.duration is not None else None
+    try:
+        try:
+            agent.serve(host, port)
+        except OSError as e:
+            print(f"agent: cannot listen on {host}:{port}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+        if not args.quiet:
+            print(f"agent: serving on http://{host}:{port}/events", file=sys.stderr)
+        monitor.start()
+        next_sample = 0
+        while True:
+            if time.monotonic() >= next_sample:
+                scan_started = time.perf_counter()
+                records = sampler.sample(list(monitor.tracked.values()))
+                if _use_proc_scanner():
+                    port_index.update(records)
+                agent.update(records)
+                if metrics_exporter is not None:
+                    metrics_exporter.update(records, time.perf_counter() - scan_started)
+                next_sample = time.monotonic() + args.interval
+            timeout = next_sample - time.monotonic()
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+            fd = monitor.fileno()
+            if fd is None:
+                time.sleep(max(timeout, 0))
+            else:
+                select.select([fd], [], [], max(timeout, 0))
+            new, exited = monitor.poll()
+            if metrics_exporter is not None:
+                metrics_exporter.record_events(len(new), len(exited))
+            if new or exited:
+                next_sample = 0  # publish the change right away
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.close()
+        monitor.close()
+        sampler.close()
+    return EXIT_OK
+
+def cli_reap(args):
+    """`reap`: sample processes every --interval seconds and terminate those breaking a rule."""
+    import contextlib
+    import json
+    try:
+        texts = args.rule or load_config(args.config).get('reap', {}).get('rules', [])
+        rules = [ReapRule(text) for text in texts]
+    except (ValueError, AttributeError) as e:
+        print(f"reap: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not rules:
+        print("reap: no rules; pass --rule or set \"reap\": {\"rules\": [...]} in the config file", file=sys.stderr)
+        return EXIT_USAGE
+
+    output = sys.stdout
+    reaper = Reaper(rules, args.dry_run, args.grace, args.kill_timeout,
+                    log=lambda result: print(json.dumps(result), file=output, flush=True))
+    monitor = open_process_monitor()
+    sampler = ResourceSampler()
+    port_index = PortIndex() if 'port' in reaper.fields else None
+    deadline = time.monotonic() + args.duration if args.duration is not None else None
+    try:
+        # terminate_process() reports progress on stdout, which carries the action log here
+        with contextlib.redirect_stdout(sys.stderr):
+            monitor.start()
+            exited = []
+            while deadline is None or time.monotonic() < deadline:
+                scan_started = time.perf_counter()
+                records = sampler.sample(list(monitor.tracked.values()))
+                if port_index is not None:
+                    port_index.update(records)
+                if 'fds' in reaper.fields:
+                    sampler.collect_details(records)
+                if metrics_exporter is not None:
+                    metrics_exporter.update(records, time.perf_counter() - scan_started)
+                reaper.tick(records, exited)
+
+                wake = time.monotonic() + args.interval
+                if reaper.next_deadline() is not None:
+                    wake = min(wake, reaper.next_deadline())
+                if deadline is not None:
+                    wake = min(wake, deadline)
+                time.sleep(max(wake - time.monotonic(), 0))
+                new, exited = monitor.poll()
+                if metrics_exporter is not None:
+                    metrics_exporter.record_events(len(new), len(exited))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.close()
+        sampler.close()
+    return EXIT_OK
+
+def cli_guard(args):
+    """`guard`: wait on a PSI trigger and terminate the fewest processes that relieve memory pressure."""
+    import contextlib
+    import json
+    output = sys.stdout
+    try:
+        guard = MemoryGuard(args.reserve, args.dry_run, args.grace, args.kill_timeout,
+                            log=lambda result: print(json.dumps(result), file=output, flush=True))
+    except ValueError as e:
+        print(f"guard: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    def pressure():
+        try:
+            return read_pressure(args.pressure_file)
+        except (OSError, ValueError):
+            return None
+
+    def processes():
+        scan_started = time.perf_counter()
+        records = process_snapshot.refresh()
+        if metrics_exporter is not None:
+            metrics_exporter.update(records, time.perf_counter() - scan_started)
+        return records
+
+    try:
+        # terminate_processes() reports progress on stdout, which carries the decision log here
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.simulate is not None:
+                meminfo = dict(read_meminfo(), MemAvailable=args.simulate)
+                guard.relieve(processes(), meminfo, pressure())
+                return EXIT_OK
+            try:
+                trigger = PressureTrigger(args.stall / 1000, args.window, args.full, args.pressure_file)
+            except OSError as e:
+                import errno
+                hint = ""
+                if e.errno == errno.EINVAL:
+                    hint = (" (the stall must fit in the window, and without CAP_SYS_RESOURCE the window "
+                            "must be a multiple of 2 seconds)")
+                print(f"guard: cannot set a PSI trigger on {args.pressure_file}: {e.strerror or e}{hint}",
+                      file=sys.stderr)
+                return EXIT_USAGE
+            deadline = time.monotonic() + args.duration if args.duration is not None else None
+            try:
+                while deadline is None or time.monotonic() < deadline:
+                    if not trigger.wait(None if deadline is None else deadline - time.monotonic()):
+                        continue
+                    if guard.relieve(processes(), read_meminfo(), pressure()):
+                        # Give the kernel time to reclaim before judging MemAvailable again
+                        pause = args.cooldown if deadline is None else min(args.cooldown, deadline - time.monotonic())
+                        time.sleep(max(pause, 0))
+            finally:
+                trigger.close()
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"guard: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_OK
+
+def cli_history(args):
+    """`history`: print the journaled events matching the filters, oldest first."""
+    try:
+        pattern = re.compile(args.match) if args.match else None
+    except re.error as e:
+        print(f"history: invalid --match pattern: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not os.path.exists(args.journal) and not os.path.exists(args.journal + '.1'):
+        print(f"history: no journal at {args.journal}; record one with --journal", file=sys.stderr)
+        return EXIT_USAGE
+    events = EventJournal.read(args.journal, args.pid, pattern, args.since, args.until, args.event)
+    try:
+        # NDJSON is printed as it is read, so long histories are never held in memory
+        first = next(events, None)
+        if first is None:
+            _emit([], args.json)
+            return EXIT_NO_MATCH
+        import itertools
+        events = itertools.chain([first], events)
+        _emit(list(events) if args.json else events, args.json)
+    except ValueError as e:
+        print(f"history: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    return EXIT_OK
+
+def cli(argv):
+    """Run a headless command and return its exit status."""
+    command = _command_name(argv)
+    args = build_parser(command).parse_args(argv)
+    if args.command != command:
+        args = build_parser().parse_args(argv)  # argv was read wrongly; parse it with every option
+    if not sys.stderr.isatty():
+        _disable_colors()
+    try:
+        set_process_matcher(ProcessMatcher.from_config(args.config))
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    handler = {'list': cli_list, 'monitor': cli_monitor, 'kill': cli_kill, 'watch': cli_watch,
+               'reap': cli_reap, 'history': cli_history, 'restart': cli_restart, 'agent': cli_agent,
+               'guard': cli_guard}[args.command]
+    if args.command != 'history' and getattr(args, 'journal', None):
+        try:
+            journal.open(args.journal)
+        except (OSError, ValueError) as e:
+            print(f"error: cannot open journal: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    exporter = None
+    if getattr(args, 'metrics', None):
+        try:
+            exporter = start_metrics_exporter(args.metrics)
+        except OSError as e:
+            journal.close()
+            print(f"error: cannot listen on {args.metrics[0]}:{args.metrics[1]}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    if args.profile:
+        profiler.enable()
+    try:
+        return handler(args)
+    except BrokenPipeError:
+        # The reader went away (e.g. piped into head); stop quietly
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_OK
+    finally:
+        journal.close()
+        if exporter is not None:
+            exporter.close()
+        if args.profile:
+            profiler.dump(args.profile)
+
+def run():
+    """Entry point of stop_node_servers.py: a headless command, or the menu when given no arguments."""
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:]))
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n{Colors.WARNING}Operation cancelled by user.{Colors.ENDC}")
+        sys.exit(0)
+
+if __name__ == "__main__":
+    run()
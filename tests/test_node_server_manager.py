@@ -0,0 +1,947 @@
+"""Tests for node_server_manager.
+
+Run with `python -m pytest tests` from the repository root.
+"""
+import os
+import re
+import signal
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import node_server_manager as nsm  # noqa: E402
+
+
+def make_info(pid, argv=('node', 'server.js'), start_time=100, rss=0, cpu=0.0, uptime=10.0, ppid=1):
+    info = nsm.ProcessInfo(pid, ppid, os.path.basename(argv[0]), list(argv), start_time)
+    info.rss = rss
+    info.cpu_percent = cpu
+    info.uptime = uptime
+    return info
+
+
+def write_proc(proc_root, pid, comm, argv, ppid=1, start_time=100, flags=0, rss_pages=10, threads=1):
+    """Create /proc/<pid>/stat and cmdline files the way the kernel lays them out."""
+    base = proc_root / str(pid)
+    base.mkdir(exist_ok=True)
+    fields = ['S', ppid, pid, pid, 0, -1, flags, 0, 0, 0, 0, 5, 3, 0, 0, 20, 0, threads, 0, start_time, 1000,
+              rss_pages]
+    (base / 'stat').write_text(f"{pid} ({comm}) " + ' '.join(str(field) for field in fields) + '\n')
+    (base / 'cmdline').write_bytes(b''.join(arg.encode() + b'\0' for arg in argv))
+
+
+# ReapRule
+
+def test_reap_rule_parses_terms_and_duration():
+    rule = nsm.ReapRule('rss > 2G for 60s')
+    assert rule.terms == [('rss', '>', 2 << 30)]
+    assert rule.duration == 60
+    assert rule.min_age is None
+
+
+def test_reap_rule_conjunctions_ranges_and_idle():
+    rule = nsm.ReapRule('port in 3000-3999 and idle and age > 1h')
+    assert rule.terms == [('port', 'in', (3000, 3999)), ('cpu', '<', nsm.IDLE_CPU_PERCENT), ('age', '>', 3600)]
+    assert rule.fields == {'port', 'cpu', 'age'}
+    assert rule.min_age == 3600
+
+
+@pytest.mark.parametrize('text', ['rss >', 'memory > 1G', 'rss > 1X', 'cpu > 90 for ever'])
+def test_reap_rule_rejects_bad_rules(text):
+    with pytest.raises(ValueError):
+        nsm.ReapRule(text)
+
+
+def test_reap_rule_matches():
+    info = make_info(10, rss=3 << 30, cpu=0.5, uptime=7200)
+    info.ports = [3001]
+    assert nsm.ReapRule('rss > 2G').matches(info)
+    assert nsm.ReapRule('port in 3000-3999 and idle and age > 1h').matches(info)
+    assert not nsm.ReapRule('cpu >= 95%').matches(info)
+    assert not nsm.ReapRule('fds > 10').matches(info)  # not collected, so never matched
+
+
+def test_reaper_waits_for_duration_and_batches(monkeypatch):
+    batches = []
+
+    def terminate(targets, grace_period, kill_timeout):
+        batches.append([target[0] for target in targets])
+        return [{'pid': pid, 'command': command, 'status': 'success', 'message': ''} for pid, command, _ in targets]
+
+    monkeypatch.setattr(nsm, 'terminate_processes', terminate)
+    reaper = nsm.Reaper([nsm.ReapRule('rss > 1M for 5s')])
+    records = [make_info(10, rss=2 << 20), make_info(11, rss=2 << 20), make_info(12, rss=1 << 10)]
+    assert reaper.tick(records, now=0) == []
+    assert reaper.next_deadline() == 5
+    results = reaper.tick(records, now=5)
+    assert batches == [[10, 11]]
+    assert [result['rule'] for result in results] == ['rss > 1M for 5s'] * 2
+    assert reaper.tick(records, now=20) == []  # acted on already
+
+
+def test_reaper_retries_failed_terminations(monkeypatch):
+    statuses = iter(['failed', 'success'])
+    monkeypatch.setattr(nsm, 'terminate_processes', lambda targets, grace, kill_timeout: [
+        {'pid': pid, 'command': command, 'status': next(statuses), 'message': ''} for pid, command, _ in targets])
+    reaper = nsm.Reaper([nsm.ReapRule('rss > 1M')])
+    records = [make_info(10, rss=2 << 20)]
+    assert [result['status'] for result in reaper.tick(records, now=0)] == ['failed']
+    assert reaper.tick(records, now=1) == []
+    assert [result['status'] for result in reaper.tick(records, now=nsm.Reaper.RETRY_DELAY)] == ['success']
+
+
+def test_parse_size_and_duration():
+    assert nsm.parse_size('512M') == 512 << 20
+    assert nsm.parse_size('1.5GiB') == 3 << 29
+    assert nsm.parse_duration('90') == 90
+    assert nsm.parse_duration('2d') == 2 * 86400
+    with pytest.raises(ValueError):
+        nsm.parse_duration('soon')
+
+
+# ProcessFilter
+
+def test_filter_matches_pids_and_commands():
+    index = nsm.ProcessFilter()
+    index.update([make_info(101, ('node', 'api/server.js')), make_info(202, ('node', 'web/next', 'dev')),
+                  make_info(303, ('bun', 'worker.ts'))])
+    assert index.matches('SERVER') == {101}
+    assert index.matches('node') == {101, 202}
+    assert index.matches('20') == {202}  # shorter than a trigram
+    assert index.matches('nothing here') == set()
+
+
+def test_filter_narrows_while_typing_and_forgets_exited_processes():
+    index = nsm.ProcessFilter()
+    records = [make_info(pid, ('node', f"app{pid}.js")) for pid in (1, 2, 12)]
+    index.update(records)
+    assert index.matches('app1') == {1, 12}
+    assert index.matches('app12') == {12}
+    index.update(records[:2])
+    assert index.matches('app1') == {1}
+    assert all(12 not in postings for postings in index.trigrams.values())
+
+
+def test_filter_reindexes_a_process_that_execs():
+    index = nsm.ProcessFilter()
+    info = make_info(7, ('sh', '-c', 'start.sh'))
+    index.update([info])
+    assert index.matches('start') == {7}
+    index.update([make_info(7, ('node', 'server.js'))])
+    assert index.matches('start') == set()
+    assert index.matches('server') == {7}
+
+
+# EventJournal
+
+def test_journal_round_trip(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = nsm.EventJournal()
+    journal.open(path)
+    journal.record_processes('start', [make_info(10, start_time=555, ppid=3)])
+    journal.record('exit', 10, 'node server.js')
+    journal.record_results([{'pid': 11, 'command': 'node ' + 'x' * 200, 'status': 'success_force'},
+                            {'pid': 'abc', 'command': None, 'status': 'error'}])
+    journal.close()
+
+    events = list(nsm.EventJournal.read(path))
+    assert [(event['event'], event['pid']) for event in events] == [('start', 10), ('exit', 10), ('kill', 11)]
+    assert events[0]['ppid'] == 3 and events[0]['start_time'] == 555
+    assert events[0]['command'] == 'node server.js'
+    assert events[2]['status'] == 'success_force'
+    assert len(events[2]['command']) == nsm.EventJournal.COMMAND_BYTES
+
+
+def test_journal_filters(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = nsm.EventJournal()
+    journal.open(path)
+    for pid in range(1, 50):
+        journal.record('start', pid, f"node app{pid % 3}.js")
+    journal.record('exit', 7, 'node app1.js')
+    journal.close()
+
+    assert [event['event'] for event in nsm.EventJournal.read(path, pid=7)] == ['start', 'exit']
+    assert {event['pid'] for event in nsm.EventJournal.read(path, events=['exit'])} == {7}
+    matched = list(nsm.EventJournal.read(path, pattern=re.compile(r'app2\.js')))
+    assert [event['pid'] for event in matched] == [pid for pid in range(1, 50) if pid % 3 == 2]
+    assert list(nsm.EventJournal.read(path, since=4e9)) == []
+
+
+def test_journal_rotates_and_reads_both_files(tmp_path):
+    path = str(tmp_path / 'journal')
+    journal = nsm.EventJournal()
+    journal.open(path, max_records=4)
+    for pid in range(1, 11):
+        journal.record('start', pid)
+    journal.close()
+    assert os.path.exists(path + '.1')
+    # Rotation keeps the previous file only, so the oldest records are gone
+    assert [event['pid'] for event in nsm.EventJournal.read(path)] == [5, 6, 7, 8, 9, 10]
+
+
+def test_journal_time_range_with_interleaved_writers(tmp_path, monkeypatch):
+    path = str(tmp_path / 'journal')
+    tui, reaper = nsm.EventJournal(), nsm.EventJournal()
+    tui.open(path)
+    reaper.open(path)
+    # The reaper stamps its records a little before the TUI's land, so they go in out of order
+    for pid, (writer, when) in enumerate([(tui, 100.0), (reaper, 99.0), (tui, 102.0), (reaper, 101.0),
+                                          (tui, 104.0), (reaper, 103.0), (tui, 106.0)]):
+        monkeypatch.setattr(nsm.time, 'time', lambda when=when: when)
+        writer.record('start', pid)
+    tui.close()
+    reaper.close()
+
+    assert [event['time'] for event in nsm.EventJournal.read(path, since=100, until=103)] == [100, 102, 101, 103]
+    assert [event['pid'] for event in nsm.EventJournal.read(path, pid=3, since=100.5)] == [3]
+
+
+def test_journal_in_order_keeps_binary_search(tmp_path, monkeypatch):
+    path = str(tmp_path / 'journal')
+    journal = nsm.EventJournal()
+    journal.open(path)
+    for when in (1.0, 2.0, 2.0, 3.0):
+        monkeypatch.setattr(nsm.time, 'time', lambda when=when: when)
+        journal.record('start', int(when))
+    journal.close()
+    searches = []
+    bisect = nsm.EventJournal._bisect
+    monkeypatch.setattr(nsm.EventJournal, '_bisect', lambda *args, **kwargs: searches.append(args) or bisect(*args, **kwargs))
+
+    assert not journal.unsorted
+    assert [event['time'] for event in nsm.EventJournal.read(path, since=2)] == [2, 2, 3]
+    assert len(searches) == 1
+
+
+def test_journal_refuses_other_files(tmp_path):
+    path = tmp_path / 'notes'
+    path.write_text('not a journal')
+    with pytest.raises(ValueError):
+        nsm.EventJournal().open(str(path))
+
+
+# ProcessMatcher
+
+def test_matcher_classifies_fake_proc(tmp_path):
+    write_proc(tmp_path, 10, 'node', ['node', 'server.js'])
+    write_proc(tmp_path, 11, 'vim', ['vim', 'node', 'notes'])
+    write_proc(tmp_path, 12, 'node22', ['/usr/bin/node22', '--inspect', 'app.js'])
+    write_proc(tmp_path, 13, 'next-server', ['next-server (v14.2.0)'])
+    write_proc(tmp_path, 14, 'kworker/0:1', [], flags=nsm.PF_KTHREAD)
+    write_proc(tmp_path, 15, 'sh', ['sh', '-c', 'ts-node index.ts'])
+    (tmp_path / 'self').mkdir()
+
+    matched = {info.pid: info for info in nsm.ProcessMatcher().scan(str(tmp_path))}
+    assert sorted(matched) == [10, 12, 13]
+    assert matched[10].command == 'node server.js'
+    assert matched[10].rss == 10 * nsm.PAGE_SIZE and matched[10].cpu_ticks == 8
+
+    custom = nsm.ProcessMatcher(include=[r'\bts-node\b'], exclude=['--inspect'])
+    assert sorted(info.pid for info in custom.scan(str(tmp_path))) == [10, 13, 15]
+
+
+def test_matcher_memoizes_until_exec(tmp_path):
+    write_proc(tmp_path, 10, 'node', ['node', 'server.js'])
+    matcher = nsm.ProcessMatcher()
+    assert [info.pid for info in matcher.scan(str(tmp_path))] == [10]
+    # Same (pid, start time, comm): the cached decision is used and cmdline is not read again
+    (tmp_path / '10' / 'cmdline').unlink()
+    assert [info.pid for info in matcher.scan(str(tmp_path))] == [10]
+    # An exec changes comm, so the process is matched again
+    write_proc(tmp_path, 10, 'python3', ['python3', 'tool.py'])
+    assert matcher.scan(str(tmp_path)) == []
+
+
+def test_matcher_rejects_bad_patterns():
+    with pytest.raises(ValueError):
+        nsm.ProcessMatcher(include=['('])
+
+
+# PortIndex
+
+def write_tcp(proc_root, sockets):
+    """Write /proc/net/tcp with (local port, state, inode) rows; tcp6 is left empty."""
+    net = proc_root / 'net'
+    net.mkdir(exist_ok=True)
+    lines = ['  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode']
+    for row, (port, state, inode) in enumerate(sockets):
+        lines.append(f"  {row}: 0100007F:{port:04X} 00000000:0000 {state} 00000000:00000000 00:00000000 "
+                     f"00000000  1000        0 {inode} 1 0000000000000000 100 0 0 10 0")
+    (net / 'tcp').write_text('\n'.join(lines) + '\n')
+    (net / 'tcp6').write_text(lines[0] + '\n')
+
+
+def give_sockets(proc_root, pid, inodes):
+    fd_dir = proc_root / str(pid) / 'fd'
+    fd_dir.mkdir(parents=True, exist_ok=True)
+    for number, inode in enumerate(inodes, start=3):
+        os.symlink(f"socket:[{inode}]", fd_dir / str(number))
+
+
+def test_port_index_maps_listeners_and_counts_connections(tmp_path):
+    write_tcp(tmp_path, [(3000, nsm.TCP_LISTEN, 111), (3000, nsm.TCP_ESTABLISHED, 112),
+                         (3000, nsm.TCP_ESTABLISHED, 113), (4000, nsm.TCP_LISTEN, 211)])
+    give_sockets(tmp_path, 10, [111, 112, 113])
+    give_sockets(tmp_path, 20, [211])
+    records = [make_info(10), make_info(20), make_info(30)]
+
+    index = nsm.PortIndex(str(tmp_path))
+    index.update(records)
+    assert [info.ports for info in records] == [[3000], [4000], None]
+    assert index.pids_for_port(3000) == [10]
+    assert index.connections([10, 20, 30], {3000, 4000}) == {10: 2, 20: 0}
+
+    # A closed listener is noticed although the fd numbers stay the same
+    write_tcp(tmp_path, [(4000, nsm.TCP_LISTEN, 211)])
+    index.update(records)
+    assert records[0].ports == [] and index.pids_for_port(3000) == []
+
+
+# ProcessSnapshot
+
+@pytest.fixture
+def fake_scans(monkeypatch):
+    """Serve the given scans to ProcessSnapshot one per refresh, on a clock the test moves."""
+    scans = []
+    clock = [1000.0]
+    monkeypatch.setattr(nsm, 'get_node_processes', lambda with_resources=False: [
+        info.as_tuple() + (info,) for info in scans.pop(0)])
+    monkeypatch.setattr(nsm.time, 'monotonic', lambda: clock[0])
+    return scans, clock
+
+
+def test_snapshot_is_reused_within_the_ttl(fake_scans):
+    scans, clock = fake_scans
+    scans.extend([[make_info(10), make_info(11)], [make_info(10)]])
+    snapshot = nsm.ProcessSnapshot(ttl=1.0)
+    assert sorted(info.pid for info in snapshot.records()) == [10, 11]
+    clock[0] += 0.9
+    assert snapshot.get('11').pid == 11 and snapshot.get(12) is None
+    assert len(scans) == 1  # no rescan yet
+
+    clock[0] += 0.2
+    assert snapshot.get(11) is None  # past the TTL: rescanned, and 11 has gone
+    assert [info.pid for info in snapshot.records()] == [10] and scans == []
+
+
+def test_snapshot_update_and_invalidate(fake_scans):
+    scans, clock = fake_scans
+    scans.append([make_info(30)])
+    snapshot = nsm.ProcessSnapshot(ttl=1.0)
+    snapshot.update([make_info(20)])  # e.g. from the live monitor's own scan
+    assert [info.pid for info in snapshot.records()] == [20]
+    snapshot.discard(20)
+    assert snapshot.get(20) is None and scans
+    snapshot.invalidate()
+    assert [info.pid for info in snapshot.records()] == [30]
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_snapshot_treats_a_recycled_pid_as_another_process(fake_scans, spawn, monkeypatch):
+    scans, clock = fake_scans
+    child = spawn(['sleep', '30'], python=False)
+    # The same PID before and after it was reused: only the start time differs
+    scans.extend([[make_info(child.pid, ('node', 'old.js'), start_time=1)],
+                  [make_info(child.pid, ('node', 'new.js'), start_time=nsm.process_start_time(child.pid))]])
+    snapshot = nsm.ProcessSnapshot(ttl=1.0)
+    old = snapshot.get(child.pid)
+    clock[0] += 2
+    new = snapshot.get(child.pid)
+    assert new is not old and new.command == 'node new.js'
+    assert new.pid == old.pid and new.identity != old.identity
+
+    # A kill chosen from the old snapshot must not reach the new process
+    monkeypatch.undo()  # back to the real clock for the grace deadline
+    [result] = nsm.terminate_processes(nsm.termination_targets([old]), 0.2, 0.2, verbose=False)
+    assert result['status'] == 'already_terminated' and child.poll() is None
+
+
+# Termination
+
+# Ignores SIGTERM, so only SIGKILL ends it
+STUBBORN = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('ready', flush=True); time.sleep(60)"
+
+
+@pytest.fixture
+def spawn():
+    """Start child processes that are killed again after the test; python=True runs the code with Python."""
+    import subprocess
+    processes = []
+
+    def start(code, python=True):
+        argv = [sys.executable, '-c', code] if python else code
+        process = subprocess.Popen(argv, stdout=subprocess.PIPE if python else None, text=True)
+        if python:
+            process.stdout.readline()  # wait until its signal handlers are in place
+        processes.append(process)
+        return process
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def unique_marker():
+    """An argument only this test's children carry, so matching on it cannot pick up any other process."""
+    return f"nsm-test-{os.getpid()}-{time.monotonic_ns()}"
+
+
+def targets_of(processes):
+    return [(process.pid, 'test child', nsm.process_start_time(process.pid)) for process in processes]
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_terminate_processes_shares_one_grace_deadline(spawn):
+    sleepers = [spawn(['sleep', '30'], python=False) for _ in range(4)]
+    stubborn = [spawn(STUBBORN) for _ in range(2)]
+    grace = 1.0
+
+    started = time.monotonic()
+    results = nsm.terminate_processes(targets_of(sleepers + stubborn), grace, 1.0, verbose=False)
+    elapsed = time.monotonic() - started
+
+    assert [result['pid'] for result in results] == [process.pid for process in sleepers + stubborn]
+    assert [result['status'] for result in results] == ['success'] * 4 + ['success_force'] * 2
+    assert all(result['exit_time'] < 0.5 for result in results[:4])
+    # Both stubborn processes waited out the same deadline, not one grace period each
+    assert grace <= elapsed < grace * 1.5
+    assert all(process.wait(1) == -signal.SIGKILL for process in stubborn)
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_stale_start_time_is_never_signalled(spawn):
+    process = spawn(['sleep', '30'], python=False)
+    [(pid, command, start_time)] = targets_of([process])
+    results = nsm.terminate_processes([(pid, command, start_time + 1), (pid + 10 ** 7, 'gone', None)], 0.2, 0.2,
+                                      verbose=False)
+    assert [result['status'] for result in results] == ['already_terminated', 'already_terminated']
+    assert 'belongs to another process' in results[0]['message']
+    assert process.poll() is None
+
+
+# Exits 0.3 s after SIGTERM, like a server finishing its shutdown
+SLOW_EXIT = ("import signal, sys, time\n"
+             "signal.signal(signal.SIGTERM, lambda *_: (time.sleep(0.3), sys.exit(0)))\n"
+             "print('ready', flush=True)\n"
+             "time.sleep(60)")
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+@pytest.mark.parametrize('use_pidfds', [True, False], ids=['pidfd', 'polling'])
+def test_exit_is_seen_when_it_happens(spawn, monkeypatch, use_pidfds):
+    if use_pidfds and not hasattr(os, 'pidfd_open'):
+        pytest.skip("no pidfd_open")
+    if not use_pidfds:
+        monkeypatch.setattr(nsm, '_open_pidfds', lambda pids: {})
+    process = spawn(SLOW_EXIT)
+
+    started = time.monotonic()
+    [result] = nsm.terminate_processes(targets_of([process]), 5.0, 1.0, verbose=False)
+    elapsed = time.monotonic() - started
+    assert result['status'] == 'success'
+    # Seen within a few ms of the exit, not at the end of the grace period
+    assert 0.3 <= result['exit_time'] < 0.45
+    assert elapsed < 0.6
+    assert result['exited_at'] - started < 0.6
+
+
+@pytest.mark.skipif(not hasattr(os, 'pidfd_open'), reason="no pidfd_open")
+def test_wait_for_exits_reports_survivors_and_exit_times(spawn):
+    slow, stubborn = spawn(SLOW_EXIT), spawn(STUBBORN)
+    pidfds = nsm._open_pidfds([slow.pid, stubborn.pid])
+    try:
+        os.kill(slow.pid, signal.SIGTERM)
+        os.kill(stubborn.pid, signal.SIGTERM)
+        started = time.monotonic()
+        survivors, exited = nsm._wait_for_exits([slow.pid, stubborn.pid], started + 1.0, pidfds)
+        assert time.monotonic() - started >= 1.0
+        assert survivors == {stubborn.pid}
+        assert list(exited) == [slow.pid] and 0.25 <= exited[slow.pid] - started < 0.45
+
+        # The coroutine version watches the same pidfds from the event loop
+        import asyncio
+        os.kill(stubborn.pid, signal.SIGKILL)
+        started = time.monotonic()
+        survivors, exited = asyncio.run(nsm._wait_for_exits_async([stubborn.pid], started + 5.0, pidfds))
+        assert survivors == set() and exited[stubborn.pid] - started < 0.1
+    finally:
+        nsm._close_pidfds(pidfds)
+
+
+# Process trees
+
+def process_state(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        return f.read().rsplit(')', 1)[1].split()[0]
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_kill_process_tree_takes_down_every_member(spawn):
+    root = spawn(['sh', '-c', 'sleep 30 & sleep 30 & wait'], python=False)
+    deadline = time.monotonic() + 5
+    while len(nsm.process_tree_members(root.pid, nsm.scan_processes())) < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    members = [info.pid for info in nsm.process_tree_members(root.pid, nsm.scan_processes())]
+
+    results, _ = nsm.kill_process_tree(root.pid, 1.0, 1.0, start_time=nsm.process_start_time(root.pid))
+    assert sorted(result['pid'] for result in results) == sorted(members) and len(members) == 3
+    assert results[-1]['pid'] == root.pid  # children first
+    assert {result['status'] for result in results} == {'success'}
+    assert root.wait(1) is not None
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_kill_process_tree_leaves_a_recycled_root_alone(spawn):
+    root = spawn(['sleep', '30'], python=False)
+    results, _ = nsm.kill_process_tree(root.pid, 0.2, 0.2, start_time=nsm.process_start_time(root.pid) + 1)
+    assert [result['status'] for result in results] == ['already_terminated']
+    assert root.poll() is None and process_state(root.pid) != 'T'  # neither killed nor stopped
+
+
+# Runs kill_process_tree() on its parent, so the tree holds the caller itself
+TREE_WITH_CALLER = f"""
+import subprocess, sys
+code = '''
+import json, os, sys
+sys.path.insert(0, {os.path.dirname(os.path.abspath(nsm.__file__))!r})
+import node_server_manager as nsm
+print(json.dumps(nsm.kill_process_tree(os.getppid(), 0.5, 0.5)[0]))
+'''
+child = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, timeout=10)
+print(child.stdout.strip().splitlines()[-1], flush=True)
+"""
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_kill_process_tree_refuses_a_tree_holding_the_caller():
+    import json
+    import subprocess
+    parent = subprocess.run([sys.executable, '-c', TREE_WITH_CALLER], capture_output=True, text=True, timeout=15)
+    [result] = json.loads(parent.stdout)
+    assert result['status'] == 'error' and 'contains this process' in result['message']
+    assert parent.returncode == 0  # not stopped or killed either
+
+
+# Process monitors
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_polling_fallback_reports_exec_and_exit(spawn, monkeypatch):
+    import socket
+
+    def no_netlink(family=-1, *args, **kwargs):
+        if family == getattr(socket, 'AF_NETLINK', None):
+            raise PermissionError(1, "Operation not permitted")  # as without CAP_NET_ADMIN
+        return real_socket(family, *args, **kwargs)
+
+    real_socket = socket.socket
+    monkeypatch.setattr(socket, 'socket', no_netlink)
+    marker = unique_marker()
+    monkeypatch.setattr(nsm, '_process_matcher', nsm.ProcessMatcher(executables=[], include=[re.escape(marker)]))
+    monitor = nsm.open_process_monitor()
+    assert type(monitor) is nsm.PollingProcessMonitor
+    monitor.start()
+
+    # The shell is not matched; the marker only shows up once it execs
+    prefix, suffix = marker.split('-', 1)
+    child = spawn(['sh', '-c', 'sleep 0.2; exec "$0" -c "import time; time.sleep(30)" "$1-$2"',
+                   sys.executable, prefix, suffix], python=False)
+    new, exited = monitor.poll()
+    assert child.pid not in [info.pid for info in new] and exited == []
+    deadline = time.monotonic() + 5
+    while not new and time.monotonic() < deadline:
+        time.sleep(0.05)
+        new, exited = monitor.poll()
+    assert [info.pid for info in new] == [child.pid]
+    assert new[0].argv[-1] == marker
+
+    child.kill()
+    child.wait()
+    assert monitor.poll() == ([], [child.pid])
+    monitor.close()
+
+
+# Resource columns
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_fds_are_only_counted_for_the_rows_shown(spawn, monkeypatch, capsys):
+    marker = unique_marker()
+    monkeypatch.setattr(nsm, '_process_matcher', nsm.ProcessMatcher(executables=[], include=[re.escape(marker)]))
+    children = [spawn([sys.executable, '-c', 'import time; time.sleep(30)', marker], python=False)
+                for _ in range(8)]
+    time.sleep(0.2)  # until they have exec'd
+    listed = []
+    real_collect = nsm.ResourceSampler.collect_details
+    monkeypatch.setattr(nsm.ResourceSampler, 'collect_details',
+                        lambda self, records: listed.extend(info.pid for info in records) or real_collect(self, records))
+
+    records = nsm.get_node_processes(with_resources=True)
+    assert sorted(int(pid) for pid, _, _ in records) == sorted(child.pid for child in children)
+    assert listed == [] and all(info.fds is None and info.rss for _, _, info in records)
+
+    # The menu only has room for MIN_TABLE_ROWS rows in a 10-line terminal
+    monkeypatch.setattr('shutil.get_terminal_size', lambda *args: os.terminal_size((120, 10)))
+    monkeypatch.setattr('builtins.input', lambda prompt='': '4')
+    nsm.main()
+    assert len(listed) == nsm.MIN_TABLE_ROWS
+    shown = [info for info in nsm.process_snapshot.records() if info.pid in listed]
+    assert len(shown) == nsm.MIN_TABLE_ROWS and all(info.fds >= 3 for info in shown)
+    assert "and 3 more" in capsys.readouterr().out
+
+
+# Metrics
+
+def scrape(port):
+    from urllib.request import urlopen
+    with urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        return response.read().decode()
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_metrics_count_terminations(spawn):
+    exporter = nsm.start_metrics_exporter(('127.0.0.1', 0))
+    try:
+        port = exporter.server.server_address[1]
+        assert 'node_terminations_total{status="success"} 0' in scrape(port)
+        children = [spawn(['sleep', '30'], python=False), spawn(STUBBORN)]
+        nsm.terminate_processes(targets_of(children), 0.2, 1.0, verbose=False)
+
+        page = scrape(port)
+        assert 'node_terminations_total{status="success"} 1' in page
+        assert 'node_terminations_total{status="success_force"} 1' in page
+        assert 'node_termination_duration_seconds_count 2' in page
+        assert 'node_termination_duration_seconds_bucket{le="0.1"} 1' in page  # the sleeper; the other took 0.2 s
+    finally:
+        exporter.close()
+    assert nsm.metrics_exporter is None
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_reap_serves_metrics_of_its_kills(spawn, tmp_path):
+    import json
+    import subprocess
+    # Only the child below matches, so the rule cannot reach anything else on the machine
+    marker = unique_marker()
+    config = tmp_path / 'config.json'
+    config.write_text(json.dumps({'match': {'executables': [], 'include': [re.escape(marker)]}}))
+    child = spawn([sys.executable, '-c', 'import time; time.sleep(30)', marker], python=False)
+    port = free_port()
+    reap = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(nsm.__file__), 'stop_node_servers.py'),
+                             '--config', str(config), 'reap', '--rule', f"ppid == {os.getpid()}", '--interval', '0.1',
+                             '--grace', '1', '--duration', '10', '--metrics', f"127.0.0.1:{port}"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        assert json.loads(reap.stdout.readline())['pid'] == child.pid  # the reaper's action log
+        page = scrape(port)
+        assert 'node_terminations_total{status="success"} 1' in page
+        assert 'node_termination_duration_seconds_count 1' in page
+        assert child.wait(1) == -signal.SIGTERM
+    finally:
+        reap.terminate()
+        reap.wait()
+
+
+# Restart
+
+# Listens on PORT and takes 1 s to shut down after SIGTERM, holding the port until it exits
+SLOW_SERVER = """
+import signal, socket, sys, time
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind(('127.0.0.1', PORT))
+server.listen()
+signal.signal(signal.SIGTERM, lambda *_: (time.sleep(1), sys.exit(0)))
+print('ready', flush=True)
+while True:
+    server.accept()[0].close()
+"""
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_restart_brings_the_port_back_and_counts_downtime_from_the_exit(spawn):
+    import socket
+    port = free_port()
+    old = spawn(SLOW_SERVER.replace('PORT', str(port)))
+    info = nsm.read_process_info(old.pid)
+    info.ports = [port]
+
+    started = time.monotonic()
+    [result] = nsm.restart_processes([info], grace_period=5, kill_timeout=1, ready_timeout=10)
+    elapsed = time.monotonic() - started
+    try:
+        assert old.wait(1) == 0  # shut down by SIGTERM, not killed
+        assert result['status'] == 'restarted' and result['ready'] == 'port' and result['ports'] == [port]
+        assert result['new_pid'] != old.pid and nsm.process_exists(result['new_pid'])
+        socket.create_connection(('127.0.0.1', port), timeout=1).close()
+        # The second the old server spent shutting down is not downtime; the port was still served
+        assert 0 <= result['downtime'] < elapsed - 0.5
+    finally:
+        if result.get('new_pid'):
+            os.kill(result['new_pid'], signal.SIGKILL)
+            os.waitpid(result['new_pid'], 0)
+        if result.get('log'):
+            os.unlink(result['log'])
+
+
+# Draining
+
+# Listens on PORT and keeps every connection open; HANDLER is what it does on SIGTERM
+DRAIN_SERVER = """
+import signal, socket, sys, time
+server = socket.socket()
+server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+server.bind(('127.0.0.1', PORT))
+server.listen()
+clients = []
+signal.signal(signal.SIGTERM, HANDLER)
+print('ready', flush=True)
+while True:
+    client = server.accept()[0]
+    client.sendall(b'+')  # tells the test the connection has been accepted
+    clients.append(client)
+"""
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+@pytest.mark.parametrize('handler, clients, status, dropped', [
+    ('lambda *_: sys.exit(0)', 0, 'success', 0),
+    ('signal.SIG_IGN', 0, 'success_force', 0),
+    ('lambda *_: (time.sleep(0.3), sys.exit(0))', 1, 'success', 0),
+    ('signal.SIG_IGN', 1, 'success_force', 1),
+], ids=['idle-exits', 'idle-stubborn', 'busy-exits', 'busy-stubborn'])
+def test_drain_reports_connections_drain_time_and_dropped(spawn, handler, clients, status, dropped):
+    import socket
+    port = free_port()
+    server = spawn(DRAIN_SERVER.replace('PORT', str(port)).replace('HANDLER', handler))
+    connected = [socket.create_connection(('127.0.0.1', port), timeout=5) for _ in range(clients)]
+    try:
+        for client in connected:
+            assert client.recv(1) == b'+'
+        [result] = nsm.terminate_processes(targets_of([server]), 5, 1, drain=1.0, verbose=False)
+    finally:
+        for client in connected:
+            client.close()
+
+    assert (result['status'], result['connections'], result['dropped']) == (status, clients, dropped)
+    if dropped:
+        assert result['drain_time'] is None  # never idle, so SIGKILLed at the drain deadline
+        assert result['exit_time'] >= 1.0
+    elif status == 'success':
+        # Exited by itself: idle when a count saw it so, at the latest when it exited
+        assert 0 <= result['drain_time'] <= result['exit_time'] < 1.0
+        assert result['drain_time'] >= 0.3 * clients  # the busy one held its connection until it exited
+    else:
+        # Idle from the first count on, and SIGKILLed once it stayed idle for DRAIN_SETTLE
+        assert result['drain_time'] < nsm.DRAIN_POLL
+        assert nsm.DRAIN_SETTLE <= result['exit_time'] < 1.0
+
+
+# Fleet
+
+@pytest.fixture
+def agents():
+    """Start FleetAgents on localhost ports; they are shut down after the test."""
+    started = []
+
+    def start():
+        agent = nsm.FleetAgent()
+        agent.serve('127.0.0.1', 0)
+        started.append(agent)
+        return agent
+
+    yield start
+    for agent in started:
+        agent.close()
+
+
+def post_kill(agent, body):
+    """POST a raw /kill body to an agent; returns (HTTP status, parsed body or None)."""
+    import json
+    import urllib.error
+    import urllib.request
+    url = f"http://127.0.0.1:{agent.server.server_address[1]}/kill"
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, body.encode(), method='POST'), timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_agent_rejects_malformed_kills(agents, spawn):
+    agent = agents()
+    child = spawn(['sleep', '30'], python=False)
+    agent.update([nsm.read_process_info(child.pid)])
+    for body in ['{"pids": "12"}', '{"pids": [12.5]}', '{"pids": []}', '{"port": "3000"}', '{"port": 70000}',
+                 '{"all": 1}', '{"all": true, "grace": "5"}', '{"pids": [12], "port": 3000}', '[12]', 'not json']:
+        assert post_kill(agent, body) == (400, None), body
+    assert child.poll() is None
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_agent_leaves_untracked_pids_alone(agents, spawn):
+    agent = agents()
+    tracked, untracked = spawn(['sleep', '30'], python=False), spawn(['sleep', '30'], python=False)
+    agent.update([nsm.read_process_info(tracked.pid)])
+
+    status, body = post_kill(agent, f'{{"pids": [{untracked.pid}, {tracked.pid}], "grace": 1}}')
+    assert status == 200
+    assert [(result['pid'], result['status']) for result in body['results']] == [
+        (untracked.pid, 'not_found'), (tracked.pid, 'success')]
+    assert untracked.poll() is None and tracked.wait(1) == -signal.SIGTERM
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_fleet_monitor_merges_agents_and_kills_on_each(agents, spawn):
+    import asyncio
+    web, api = agents(), agents()
+    children = [spawn(['sleep', '30'], python=False) for _ in range(3)]
+    records = [nsm.read_process_info(child.pid) for child in children]
+    records[2].ports = [3000]
+    web.update(records[:2])
+    api.update(records[2:])
+    fleet = nsm.FleetMonitor([('web', '127.0.0.1', web.server.server_address[1]),
+                              ('api', '127.0.0.1', api.server.server_address[1])])
+
+    async def run():
+        fleet.start()
+        expected = {f"web/{children[0].pid}", f"web/{children[1].pid}", f"api/{children[2].pid}"}
+        while set(fleet.tracked) != expected:
+            await asyncio.sleep(0.01)
+        assert {info.host for info in fleet.records()} == {'web', 'api'}
+        assert fleet.get(str(children[2].pid)).host == 'api'
+        # One request per agent, both at once; the port is looked up on each agent
+        by_pid = await fleet.kill_records([fleet.tracked[f"web/{children[0].pid}"]])
+        by_port = await fleet.kill_port(3000)
+        web.update(records[1:2])
+        api.update([])
+        while fleet.tracked.keys() != {f"web/{children[1].pid}"}:
+            await asyncio.sleep(0.01)
+        return by_pid, by_port
+
+    try:
+        by_pid, by_port = asyncio.run(run())
+    finally:
+        fleet.close()
+    assert [(result['pid'], result['status']) for result in by_pid] == [(f"web/{children[0].pid}", 'success')]
+    assert [(result['pid'], result['status']) for result in by_port] == [(f"api/{children[2].pid}", 'success')]
+    assert children[0].wait(1) == children[2].wait(1) == -signal.SIGTERM and children[1].poll() is None
+    _, exited = fleet.poll()
+    assert sorted(exited) == sorted([f"web/{children[0].pid}", f"api/{children[2].pid}"])
+
+
+# cgroups
+
+@pytest.fixture
+def sleeper():
+    import subprocess
+    process = subprocess.Popen(['sleep', '30'])
+    yield process
+    process.kill()
+    process.wait()
+
+
+@pytest.mark.skipif(not nsm._use_proc_scanner(), reason="needs /proc")
+def test_cgroup_is_thawed_when_every_member_is_already_gone(tmp_path, sleeper):
+    proc_root, cgroup_root = tmp_path / 'proc', tmp_path / 'cgroup'
+    (proc_root / str(sleeper.pid)).mkdir(parents=True)
+    (proc_root / str(sleeper.pid) / 'cgroup').write_text('0::/app.service\n')
+    group = cgroup_root / 'app.service'
+    group.mkdir(parents=True)
+    for name in ('cgroup.freeze', 'cgroup.kill'):
+        (group / name).write_text('0')
+    (group / 'cgroup.procs').write_text(f"{sleeper.pid}\n")
+
+    # A stale start time: the PID looks recycled, so nothing may be signalled
+    info = make_info(sleeper.pid, start_time=nsm.process_start_time(sleeper.pid) + 1)
+    results = nsm.terminate_cgroups([info], 0.2, 0.2, proc_root=str(proc_root), cgroup_root=str(cgroup_root))
+    assert [result['status'] for result in results] == ['already_terminated']
+    assert results[0]['cgroup'] == '/app.service'
+    assert (group / 'cgroup.freeze').read_text() == '0'
+    assert (group / 'cgroup.kill').read_text() == '0'
+    assert sleeper.poll() is None
+
+
+# MetricHistory
+
+def test_history_keeps_a_window_per_process():
+    history = nsm.MetricHistory(window=4)
+    for step in range(6):
+        history.record([make_info(10, cpu=step, rss=step << 20), make_info(11, cpu=50.0)])
+    assert history.samples(10, 'cpu') == [2, 3, 4, 5]
+    assert history.samples(10, 'rss') == [float(step << 20) for step in (2, 3, 4, 5)]
+    history.record([make_info(11, cpu=50.0)])
+    assert history.samples(10) == []  # freed once the process is gone
+    assert len(history.samples(11)) == 4
+
+
+def test_sparkline_scales_cpu_to_percent():
+    history = nsm.MetricHistory(window=4)
+    for cpu in (0.0, 100.0, 0.0, 100.0):
+        history.record([make_info(10, cpu=cpu)])
+    line = history.sparkline(10, 'cpu', width=4)
+    assert line == '▁█▁█'
+
+
+# MemoryGuard
+
+# Fake processes for the guard to choose from: pid -> (RSS, uptime)
+GUARD_PROCESSES = {101: (2 << 30, 600), 102: (1 << 30, 60), 103: (1 << 30, 5), 104: (300 << 20, 30),
+                   105: (700 << 20, 30)}
+
+
+def test_guard_simulate_picks_victims_from_synthetic_pressure(tmp_path, monkeypatch, capsys):
+    import json
+    psi = tmp_path / 'memory.pressure'
+    psi.write_text("some avg10=42.50 avg60=10.00 avg300=2.00 total=123456\n"
+                   "full avg10=7.25 avg60=1.00 avg300=0.50 total=2345\n")
+    records = [make_info(pid, rss=rss, uptime=uptime) for pid, (rss, uptime) in GUARD_PROCESSES.items()]
+    monkeypatch.setattr(nsm.process_snapshot, 'refresh', lambda: records)
+
+    def no_trigger(*args):
+        raise AssertionError("--simulate must not set a PSI trigger")
+    monkeypatch.setattr(nsm, 'PressureTrigger', no_trigger)
+
+    assert nsm.cli(['guard', '--simulate', '100M', '--reserve', '1G', '--dry-run',
+                    '--pressure-file', str(psi)]) == nsm.EXIT_OK
+    decision, *results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert (decision['event'], decision['some_avg10'], decision['full_avg10']) == ('pressure', 42.5, 7.25)
+    assert decision['needed'] == (1 << 30) - (100 << 20)
+    # One 1G process covers it, and of the two the younger one goes; the 2G server is spared
+    assert decision['chosen'] == [103]
+    assert [(result['pid'], result['status'], result['rss']) for result in results] == [(103, 'dry_run', 1 << 30)]
+
+
+@pytest.mark.parametrize('needed, chosen', [
+    (0, []),
+    (200 << 20, [104]),             # the smallest process that covers it
+    (900 << 20, [103]),
+    (3 << 30, [101, 103]),          # the largest first, then the smallest that covers the rest
+    (3 << 30 | 1, [101, 103, 104]),  # equal sizes go youngest first
+    (10 << 30, [101, 103, 102, 105, 104]),  # not enough in total: everything, largest first
+])
+def test_guard_plan_takes_the_fewest_processes(needed, chosen):
+    records = [make_info(pid, rss=rss, uptime=uptime) for pid, (rss, uptime) in GUARD_PROCESSES.items()]
+    assert [info.pid for info in nsm.MemoryGuard.plan(records, needed)] == chosen
+
+
+# Headless commands
+
+def test_kill_of_a_pid_that_is_not_node_is_a_no_match(capsys):
+    assert nsm.cli(['kill', '--pid', str(os.getpid()), '-q']) == nsm.EXIT_NO_MATCH
+    assert '"status": "not_found"' in capsys.readouterr().out
+
+
+def test_kill_usage_errors():
+    assert nsm.cli(['kill']) == nsm.EXIT_USAGE
+    assert nsm.cli(['kill', '--match', '(']) == nsm.EXIT_USAGE